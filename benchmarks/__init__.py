@@ -0,0 +1 @@
+"""Top-level package for benchmarks."""
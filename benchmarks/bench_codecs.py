@@ -0,0 +1,47 @@
+"""
+Benchmark of compressors and filters on a sample of a zarr file.
+
+Reports the compression ratio and encode/decode throughput of a matrix of
+codecs, to choose the `compressor` and `filters` of `create_zarr_file` and
+`re_chunk_zarr_file` per dataset.
+
+Usage
+-----
+    python -m benchmarks.bench_codecs /path/to/file.zarr [sample_size]
+
+The zarr file may be a directory, a zip file, a URL or a zarr file with
+property columns, whose coordinates are sampled.
+"""
+
+import sys
+
+from rechunk_zarr_ds.utils.codecs import benchmark_codecs
+from rechunk_zarr_ds.utils.stores import close_zarr_array, open_zarr_array
+
+SAMPLE_SIZE = 1_000_000
+
+
+def main(argv: list[str]) -> None:
+    """Runs the benchmark on the first points of a zarr file and prints a table."""
+    zarr_ds = open_zarr_array(argv[0])
+    sample_size = int(argv[1]) if len(argv) > 1 else SAMPLE_SIZE
+    try:
+        sample = zarr_ds[:sample_size]
+    finally:
+        close_zarr_array(zarr_ds)
+
+    print(f'Sample of {sample.shape} {sample.dtype} from <{argv[0]}>')
+    print(f'{"compressor":>22} {"filters":>8} {"ratio":>7} '
+          f'{"encode [MB/s]":>14} {"decode [MB/s]":>14}')
+
+    # Column-wise samples show how filters do on single-coordinate chunks
+    for label, data in (('rows', sample), ('columns', sample.T.copy())):
+        print(f'-- {label}')
+        for result in benchmark_codecs(data):
+            print(f'{result["compressor"]:>22} {result["filters"]:>8} '
+                  f'{result["ratio"]:>7.2f} {result["encode_mb_s"]:>14.0f} '
+                  f'{result["decode_mb_s"]:>14.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,104 @@
+"""
+Benchmark of coordinate encodings on synthetic points.
+
+Reports the stored size, the write and read throughput and the largest
+error of each encoding of `create_zarr_file` and `re_chunk_zarr_file`,
+with and without a delta filter, to choose an encoding and a maximum error
+per dataset. Points are random around Potsdam, sorted along a Hilbert curve
+like with `sort='hilbert'`, so neighbouring values are close.
+
+Usage
+-----
+    python -m benchmarks.bench_encoding [n_points] [chunk_rows]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.encoding import (
+    center_encoding, combine_filters, coordinate_range, get_encoding)
+from rechunk_zarr_ds.utils.spatial import sort_points
+
+N_POINTS = 1_000_000
+
+CHUNK_ROWS = 100_000
+
+CASES = (
+    ('float64', None),
+    ('float32', None),
+    ('int32', 1e-5),
+    ('int32', 1e-6),
+    ('int32', 1e-7),
+)
+
+FILTERS = ((), ('delta',))
+
+
+def run_case(
+        points: np.ndarray,
+        chunk_rows: int,
+        encoding: str,
+        max_error: float,
+        filters: tuple[str, ...]) -> dict:
+    """Writes and reads the points with an encoding in a temporary zarr directory."""
+    low, high = coordinate_range(points)
+    codecs = center_encoding(get_encoding(encoding, points.dtype, max_error), low, high)
+
+    path = tempfile.mkdtemp(suffix='.zarr')
+    try:
+        z = zarr.create(
+            shape=points.shape, dtype=points.dtype, chunks=(chunk_rows, 2), store=path,
+            filters=combine_filters(codecs, filters, points.dtype))
+
+        start = time.perf_counter()
+        z[:] = points
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decoded = z[:]
+        read_time = time.perf_counter() - start
+
+        return {
+            'encoding': encoding,
+            'max_error': max_error,
+            'filters': '+'.join(filters) or 'none',
+            'stored_mb': z.nbytes_stored / 1e6,
+            'write_mb_s': points.nbytes / 1e6 / max(write_time, 1e-9),
+            'read_mb_s': points.nbytes / 1e6 / max(read_time, 1e-9),
+            'error': float(np.abs(decoded - points).max()),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main(argv: list[str]) -> None:
+    """Runs the benchmark and prints a table, sizes relative to float64."""
+    n_points = int(float(argv[0])) if argv else N_POINTS
+    chunk_rows = int(argv[1]) if len(argv) > 1 else CHUNK_ROWS
+
+    rng = np.random.default_rng(0)
+    points = sort_points(np.column_stack([
+        rng.uniform(12.9, 13.2, n_points), rng.uniform(52.3, 52.5, n_points)]), 'hilbert')
+
+    print(f'{n_points} points in chunks of {chunk_rows} rows')
+    print(f'{"encoding":>8} {"max error":>9} {"filters":>7} {"size [MB]":>10} '
+          f'{"ratio":>6} {"write [MB/s]":>13} {"read [MB/s]":>12} {"error":>9}')
+
+    results = [
+        run_case(points, chunk_rows, encoding, max_error, filters)
+        for encoding, max_error in CASES for filters in FILTERS]
+    baseline = results[0]['stored_mb']
+    for result in results:
+        print(f'{result["encoding"]:>8} {result["max_error"] or "-":>9} '
+              f'{result["filters"]:>7} {result["stored_mb"]:>10.2f} '
+              f'{result["stored_mb"] / baseline:>6.2f} {result["write_mb_s"]:>13.0f} '
+              f'{result["read_mb_s"]:>12.0f} {result["error"]:>9.1e}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
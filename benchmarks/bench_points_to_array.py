@@ -0,0 +1,66 @@
+"""
+Benchmark of the coordinate extraction in `create_zarr_file`.
+
+Compares the former per-row `iterrows` loop with the vectorized
+`points_to_array` on synthetic point datasets.
+
+Usage
+-----
+    python -m benchmarks.bench_points_to_array [n_points ...]
+"""
+
+import sys
+import timeit
+
+import geopandas as gp
+import numpy as np
+
+from rechunk_zarr_ds.utils.geojson import points_to_array
+
+
+def make_points(n_points: int, seed: int = 0) -> gp.GeoDataFrame:
+    """Creates a GeoDataFrame of random points around Potsdam."""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(12.9, 13.2, n_points)
+    y = rng.uniform(52.3, 52.5, n_points)
+    return gp.GeoDataFrame(geometry=gp.points_from_xy(x, y), crs='EPSG:4326')
+
+
+def iterrows_to_array(gdf: gp.GeoDataFrame) -> np.ndarray:
+    """The per-row extraction used before `points_to_array`."""
+    return np.array(
+        [[row.geometry.x, row.geometry.y] for _, row in gdf.iterrows()])
+
+
+def run(n_points: int, repeat: int = 3) -> dict:
+    """Times both extraction paths and returns the best timings in seconds."""
+    gdf = make_points(n_points)
+    assert np.array_equal(iterrows_to_array(gdf), points_to_array(gdf.geometry))
+
+    iterrows = min(timeit.repeat(
+        lambda: iterrows_to_array(gdf), number=1, repeat=repeat))
+    vectorized = min(timeit.repeat(
+        lambda: points_to_array(gdf.geometry), number=1, repeat=repeat))
+
+    return {
+        'n_points': n_points,
+        'iterrows_s': iterrows,
+        'vectorized_s': vectorized,
+        'speedup': iterrows / vectorized,
+    }
+
+
+def main(argv: list[str]) -> None:
+    """Runs the benchmark and prints a table."""
+    sizes = [int(arg) for arg in argv] or [1_000, 10_000, 100_000]
+
+    print(f'{"points":>10} {"iterrows [s]":>14} {"vectorized [s]":>16} {"speedup":>9}')
+    for n_points in sizes:
+        result = run(n_points)
+        print(
+            f'{result["n_points"]:>10} {result["iterrows_s"]:>14.4f} '
+            f'{result["vectorized_s"]:>16.5f} {result["speedup"]:>8.0f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,306 @@
+"""
+Benchmark suite of `create_zarr_file` and `re_chunk_zarr_file` on synthetic points.
+
+Generates GeoJSON and zarr inputs of random points, then measures the
+throughput, the peak memory and the store operations of ingesting and
+re-chunking them across point counts, chunk sizes, codecs and worker
+counts. Each case runs in its own process, so its peak resident memory is
+not hidden by the previous cases. Inputs are generated once in the work
+directory and reused by later runs. A case that fails, crashes or times out
+is recorded with its error and the suite goes on.
+
+Results are saved as JSON with the environment they were measured in, and
+two result files can be compared to catch regressions.
+
+Usage
+-----
+    python -m benchmarks.bench_suite [--sizes 1e3 1e4 ... 1e8] [--work-dir DIR]
+        [--output FILE] [--timeout SECONDS]
+    python -m benchmarks.bench_suite --compare BASE.json NEW.json
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from queue import Empty
+
+import numpy as np
+import zarr
+
+SIZES = (10**3, 10**4, 10**5, 10**6)
+
+CHUNK_SIZES = (1_000, 100_000)
+
+COMPRESSORS = ('default', 'zstd', 'none')
+
+WORKERS = (1, 4)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+GENERATE_BLOCK = 1_000_000
+
+CASE_TIMEOUT = 3600
+
+POLL_INTERVAL = 1.0
+
+
+def make_geojson(path: str, n_points: int, seed: int = 0) -> None:
+    """Writes a GeoJSON file of random points around Potsdam, block by block."""
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('{"type": "FeatureCollection", "features": [')
+        for start in range(0, n_points, GENERATE_BLOCK):
+            size = min(GENERATE_BLOCK, n_points - start)
+            x = rng.uniform(12.9, 13.2, size)
+            y = rng.uniform(52.3, 52.5, size)
+            file.write(('' if start == 0 else ',') + ','.join(
+                '{"type": "Feature", "properties": {}, "geometry": '
+                f'{{"type": "Point", "coordinates": [{a!r}, {b!r}]}}}}'
+                for a, b in zip(x.tolist(), y.tolist())))
+        file.write(']}')
+
+
+def make_zarr(path: str, n_points: int, chunks: int = 10_000, seed: int = 0) -> None:
+    """Writes a zarr file of random points around Potsdam, block by block."""
+    rng = np.random.default_rng(seed)
+    z = zarr.open_array(
+        path, mode='w', shape=(n_points, 2), chunks=(min(chunks, n_points), 2),
+        dtype='float64')
+    for start in range(0, n_points, GENERATE_BLOCK):
+        size = min(GENERATE_BLOCK, n_points - start)
+        z[start:start + size] = np.column_stack([
+            rng.uniform(12.9, 13.2, size), rng.uniform(52.3, 52.5, size)])
+
+
+def make_cases(sizes: list[int]) -> list[dict]:
+    """Lists the benchmark cases for the point counts."""
+    cases = []
+    for n_points in sizes:
+        cases.append({'function': 'create_zarr_file', 'n_points': n_points,
+                      'chunks': min(100_000, n_points), 'compressor': 'default',
+                      'workers': 1})
+        for chunks, compressor, workers in itertools.product(
+                CHUNK_SIZES, COMPRESSORS, WORKERS):
+            if chunks <= n_points:
+                cases.append({'function': 're_chunk_zarr_file', 'n_points': n_points,
+                              'chunks': chunks, 'compressor': compressor,
+                              'workers': workers})
+    return cases
+
+
+def run_case(case: dict, work_dir: str, timeout: float = CASE_TIMEOUT) -> dict:
+    """Runs a case in a new process and returns its measurements or its error."""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(case, work_dir, queue))
+    process.start()
+
+    deadline = time.monotonic() + timeout
+    result = None
+    try:
+        while result is None:
+            try:
+                result = queue.get(timeout=POLL_INTERVAL)
+            except Empty:
+                if process.exitcode is not None:
+                    result = _last_result(queue) or {
+                        'error': f'The process exited with code {process.exitcode}.'}
+                elif time.monotonic() > deadline:
+                    result = {'error': f'The case timed out after {timeout} s.'}
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+    return {**case, **result}
+
+
+def _last_result(queue) -> dict | None:
+    """Gets a result put in a queue just before its process exited, if any."""
+    try:
+        return queue.get(timeout=POLL_INTERVAL)
+    except Empty:
+        return None
+
+
+def _run_case(case: dict, work_dir: str, queue) -> None:
+    """Runs a case and puts its measurements, or its error, in a queue."""
+    result = {'error': 'The case was interrupted.'}
+    try:
+        result = _measure_case(case, work_dir)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        result = {'error': f'{type(error).__name__}: {error}'}
+    finally:
+        queue.put(result)
+
+
+def _measure_case(case: dict, work_dir: str) -> dict:
+    """Runs a case and measures it."""
+    # pylint: disable=import-outside-toplevel
+    from rechunk_zarr_ds.main import re_chunk_zarr_file
+    from rechunk_zarr_ds.utils.main import create_zarr_file
+
+    n_points = case['n_points']
+    counts = _count_store_operations()
+    output_dir = tempfile.mkdtemp(prefix='bench_', dir=work_dir)
+    baseline_rss = _peak_rss()
+
+    try:
+        if case['function'] == 'create_zarr_file':
+            source = os.path.join(work_dir, f'points_{n_points}.json')
+            start = time.perf_counter()
+            create_zarr_file(
+                source, output_dir, streaming=True, chunks=(case['chunks'],),
+                compressor=case['compressor'])
+        else:
+            source = os.path.join(work_dir, f'points_{n_points}.zarr')
+            start = time.perf_counter()
+            re_chunk_zarr_file(
+                source, case['chunks'], output_dir, max_mem='256MB',
+                executor='thread' if case['workers'] > 1 else None,
+                workers=case['workers'], compressor=case['compressor'])
+        seconds = time.perf_counter() - start
+
+        n_files = sum(len(files) for _, _, files in os.walk(output_dir))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    nbytes = n_points * 2 * 8
+    return {
+        'seconds': seconds,
+        'mb_s': nbytes / 1e6 / seconds,
+        'points_s': n_points / seconds,
+        'peak_rss_mb': _peak_rss() / 1e6,
+        'rss_increase_mb': (_peak_rss() - baseline_rss) / 1e6,
+        'store_reads': counts['reads'],
+        'store_writes': counts['writes'],
+        'files': n_files,
+    }
+
+
+def _count_store_operations() -> dict:
+    """Counts the reads and writes of directory stores in this process."""
+    counts = {'reads': 0, 'writes': 0}
+    store = zarr.storage.DirectoryStore
+    getitem, setitem = store.__getitem__, store.__setitem__
+
+    def counted_getitem(self, key):
+        counts['reads'] += 1
+        return getitem(self, key)
+
+    def counted_setitem(self, key, value):
+        counts['writes'] += 1
+        return setitem(self, key, value)
+
+    store.__getitem__ = counted_getitem
+    store.__setitem__ = counted_setitem
+    return counts
+
+
+def _peak_rss() -> int:
+    """Gets the peak resident memory of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def environment() -> dict:
+    """Describes the environment of a benchmark run."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'zarr': zarr.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(base_path: str, new_path: str) -> None:
+    """Prints the throughput and peak memory ratios of two result files."""
+    with open(base_path, encoding='utf-8') as file:
+        base = {_case_key(r): r for r in json.load(file)['results']}
+    with open(new_path, encoding='utf-8') as file:
+        new = json.load(file)['results']
+
+    print(f'{"case":>60} {"MB/s":>9} {"ratio":>6} {"RSS MB":>8} {"ratio":>6}')
+    for result in new:
+        old = base.get(_case_key(result))
+        if old and 'error' not in old and 'error' not in result:
+            print(f'{" ".join(map(str, _case_key(result))):>60} '
+                  f'{result["mb_s"]:>9.1f} {result["mb_s"] / old["mb_s"]:>6.2f} '
+                  f'{result["peak_rss_mb"]:>8.0f} '
+                  f'{result["peak_rss_mb"] / old["peak_rss_mb"]:>6.2f}')
+
+
+def _case_key(result: dict) -> tuple:
+    """Identifies the case of a result."""
+    return (result['function'], result['n_points'], result['chunks'],
+            result['compressor'], result['workers'])
+
+
+def main(argv: list[str]) -> None:
+    """Runs the benchmark suite, prints a table and saves the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', nargs='+', type=float, default=SIZES)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'rechunk_bench'))
+    parser.add_argument('--output')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'))
+    parser.add_argument('--timeout', type=float, default=CASE_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = [int(size) for size in args.sizes]
+    os.makedirs(args.work_dir, exist_ok=True)
+    for n_points in sizes:
+        json_path = os.path.join(args.work_dir, f'points_{n_points}.json')
+        zarr_path = os.path.join(args.work_dir, f'points_{n_points}.zarr')
+        if not os.path.exists(json_path):
+            make_geojson(json_path, n_points)
+        if not os.path.exists(zarr_path):
+            make_zarr(zarr_path, n_points)
+
+    print(f'{"function":>18} {"points":>10} {"chunks":>7} {"codec":>8} {"workers":>7} '
+          f'{"MB/s":>8} {"points/s":>11} {"RSS MB":>7} {"reads":>7} {"writes":>7}')
+    results = []
+    for case in make_cases(sizes):
+        result = run_case(case, args.work_dir, args.timeout)
+        results.append(result)
+        if 'error' in result:
+            print(f'{result["function"]:>18} {result["n_points"]:>10} {result["chunks"]:>7} '
+                  f'{result["compressor"]:>8} {result["workers"]:>7} {result["error"]}')
+            continue
+        print(f'{result["function"]:>18} {result["n_points"]:>10} {result["chunks"]:>7} '
+              f'{result["compressor"]:>8} {result["workers"]:>7} {result["mb_s"]:>8.1f} '
+              f'{result["points_s"]:>11.0f} {result["peak_rss_mb"]:>7.0f} '
+              f'{result["store_reads"]:>7} {result["store_writes"]:>7}')
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, time.strftime('%Y%m%d_%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump({'environment': environment(), 'results': results}, file, indent=2)
+    print(f'Results saved to <{output}>')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,7 @@
+"""Runs the command line with `python -m rechunk_zarr_ds`."""
+
+import sys
+
+from rechunk_zarr_ds.cli import main
+
+sys.exit(main())
@@ -0,0 +1,417 @@
+"""
+Command line module.
+
+Converts many files at once across a pool of processes, one file per task:
+
+    rechunk-zarr-ds ingest 'extracts/**/*.json' --output-dir zarr/ --workers 8
+    rechunk-zarr-ds rechunk zarr/ --chunks 100000 13 --output-dir re_chunked/
+
+Inputs are globs, files or directories, whose '.json' files, or zarr files,
+are converted. Files whose outputs are complete already are skipped, so an
+interrupted batch can be run again as it is. Outputs are named after their
+source file, so a batch whose files would be written to the same output,
+like 'a/x.json' and 'b/x.json' with `--output-dir`, is refused.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterator, Optional
+
+from rechunk_zarr_ds.main import (
+    PARTIAL_SUFFIX, re_chunk_zarr_file, re_chunk_zarr_file_multi, re_chunked_file_path)
+from rechunk_zarr_ds.utils.codecs import COMPRESSORS
+from rechunk_zarr_ds.utils.encoding import ENCODINGS
+from rechunk_zarr_ds.utils.geojson import BLOCK_SIZE
+from rechunk_zarr_ds.utils.main import create_zarr_file, is_ingested, zarr_file_path
+from rechunk_zarr_ds.utils.metrics import Metrics
+from rechunk_zarr_ds.utils.spatial import CURVES
+from rechunk_zarr_ds.utils.stores import (
+    STORE_FORMATS, ZIP_SUFFIX, close_zarr_array, path_exists, remove_path)
+
+SOURCE_SUFFIXES = ('.json',)
+
+ZARR_SUFFIXES = ('.zarr', '.zarr' + ZIP_SUFFIX)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Runs the `rechunk-zarr-ds` command.
+
+    Parameters
+    ----------
+    argv: Optional[list[str]], None
+        The command line arguments, `sys.argv[1:]` by default.
+
+    Returns
+    -------
+    int
+        The exit status, 1 if a file failed or several files would be
+        written to the same output.
+    """
+    args = _parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(levelname)s %(message)s')
+
+    options = {
+        'output_dir': args.output_dir,
+        'compressor': args.compressor,
+        'filters': args.filters,
+        'store_format': args.store_format,
+        'consolidated': args.consolidated,
+        'max_error': args.max_error,
+    }
+    if args.encoding:
+        options['encoding'] = args.encoding
+    if args.command == 'ingest':
+        task = ingest_file
+        paths = find_files(args.inputs, SOURCE_SUFFIXES)
+        options.update(
+            streaming=args.streaming, block_size=args.block_size,
+            chunks=parse_chunks(args.chunks), sort=args.sort,
+            properties=True if args.properties == [] else args.properties or False)
+    else:
+        task = re_chunk_file
+        paths = find_files(args.inputs, ZARR_SUFFIXES)
+        options.update(
+            data_per_chunk=[parse_chunks(spec) for spec in args.chunks],
+            max_mem=args.max_mem)
+
+    collisions = _output_collisions(task, paths, options)
+    for output_path, sources in collisions.items():
+        err_message = f'Files {sources} would all be written to <{output_path}>. ' + \
+            'Please convert them to separate output directories.'
+        logging.error(err_message)
+    if collisions:
+        return 1
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = []
+    for result in run_batch(task, paths, options, args.workers):
+        results.append(result)
+        print(_result_line(result), flush=True)
+
+    print(_summary_line(results, time.perf_counter() - start))
+    return 1 if any(result['status'] == 'failed' for result in results) else 0
+
+
+def find_files(patterns: list[str], suffixes: tuple[str, ...]) -> list[str]:
+    """
+    Lists the files matching globs, files or directories.
+
+    Parameters
+    ----------
+    patterns: list[str]
+        The globs, like 'extracts/**/*.json', the files or the directories
+        to convert. The files directly in a directory are listed, except for
+        directories that are zarr files themselves.
+    suffixes: tuple[str, ...]
+        The suffixes of the files to convert.
+
+    Returns
+    -------
+    list[str]
+        The files with one of the suffixes, in sorted order for each pattern,
+        each file once.
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern) and not pattern.rstrip('/').endswith(suffixes):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern, recursive=True)
+
+        matches = sorted(path for path in matches if path.rstrip('/').endswith(suffixes))
+        if not matches:
+            logging.warning('No file matching <%s>.', pattern)
+        paths.extend(matches)
+
+    return list(dict.fromkeys(paths))
+
+
+def parse_chunks(spec: str) -> int | tuple[int, ...] | str:
+    """
+    Converts a chunk specification of the command line.
+
+    Parameters
+    ----------
+    spec: str
+        The points per chunk like '1000', a chunk shape like '1000,1',
+        'auto' or a target chunk size like '16MiB'.
+
+    Returns
+    -------
+    int | tuple[int, ...] | str
+        The chunk specification, see `re_chunk_zarr_file`.
+    """
+    try:
+        values = tuple(int(value) for value in spec.split(','))
+    except ValueError:
+        return spec
+    return values[0] if len(values) == 1 else values
+
+
+def run_batch(
+        task: Callable[[str, dict], dict],
+        paths: list[str],
+        options: dict,
+        workers: int) -> Iterator[dict]:
+    """
+    Converts files across a pool of processes.
+
+    Parameters
+    ----------
+    task: Callable[[str, dict], dict]
+        The conversion of a file, `ingest_file` or `re_chunk_file`.
+    paths: list[str]
+        The files to convert.
+    options: dict
+        The options of the conversion.
+    workers: int
+        The number of processes. A single worker converts the files in this
+        process.
+
+    Yields
+    ------
+    dict
+        The results of the files, as they complete.
+    """
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield task(path, options)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        futures = [pool.submit(task, path, options) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def ingest_file(source_path: str, options: dict) -> dict:
+    """
+    Creates the zarr file of a GeoJSON file, unless it is complete already.
+
+    The zarr file is created in a '.partial' directory next to the output
+    and moved to the output when complete. The partial directory of an
+    interrupted run is removed and the file created again. Other existing
+    outputs, like zarr files appended to, are never removed: if they do not
+    record the GeoJSON file in their ingestion manifest, the file fails.
+
+    Parameters
+    ----------
+    source_path: str
+        The path to the GeoJSON file.
+    options: dict
+        The arguments of `create_zarr_file`.
+
+    Returns
+    -------
+    dict
+        The source, the output, the status ('done', 'skipped' or 'failed')
+        and, when done, the record of the run, see `Metrics.to_dict`.
+    """
+    output_path = zarr_file_path(
+        source_path, options['output_dir'], options['store_format'])
+
+    if is_ingested(source_path, output_path):
+        return {'source': source_path, 'output': output_path, 'status': 'skipped'}
+
+    if path_exists(output_path):
+        err_message = f'Output <{output_path}> exists and does not record ' + \
+            f'<{source_path}>. Please remove it or use another output directory.'
+        logging.error(err_message)
+        return {'source': source_path, 'output': output_path, 'status': 'failed',
+                'error': err_message}
+
+    metrics = Metrics()
+    partial_dir = output_path + PARTIAL_SUFFIX
+    try:
+        remove_path(partial_dir)
+        os.makedirs(partial_dir)
+        created_path = create_zarr_file(
+            source_path, metrics=metrics, **{**options, 'output_dir': partial_dir})
+        os.replace(created_path, output_path)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return {'source': source_path, 'output': output_path, 'status': 'failed',
+                'error': str(e)}
+    finally:
+        remove_path(partial_dir)
+
+    return {'source': source_path, 'output': output_path, 'status': 'done',
+            **_record(metrics)}
+
+
+def re_chunk_file(source_path: str, options: dict) -> dict:
+    """
+    Re-chunks a zarr file into each layout whose output does not exist yet.
+
+    Several layouts are written in a single pass over the source.
+    Interrupted re-chunks resume where they stopped.
+
+    Parameters
+    ----------
+    source_path: str
+        The path to the zarr file.
+    options: dict
+        The arguments of `re_chunk_zarr_file`, with the list of chunk
+        specifications as `data_per_chunk`.
+
+    Returns
+    -------
+    dict
+        The source, the outputs, the status ('done', 'skipped' or 'failed')
+        and, when done, the record of the run, see `Metrics.to_dict`.
+    """
+    options = dict(options)
+    metrics = Metrics()
+
+    try:
+        specs = [
+            spec for spec in options.pop('data_per_chunk')
+            if not path_exists(re_chunked_file_path(
+                source_path, spec, options['output_dir'],
+                store_format=options['store_format']))]
+
+        if not specs:
+            return {'source': source_path, 'output': None, 'status': 'skipped'}
+
+        if len(specs) > 1:
+            outputs = re_chunk_zarr_file_multi(source_path, specs, metrics=metrics, **options)
+        else:
+            outputs = [re_chunk_zarr_file(source_path, specs[0], metrics=metrics, **options)]
+
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return {'source': source_path, 'output': None, 'status': 'failed', 'error': str(e)}
+
+    for zarr_ds, _ in outputs:
+        close_zarr_array(zarr_ds)
+
+    return {'source': source_path, 'output': ', '.join(path for _, path in outputs),
+            'status': 'done', **_record(metrics)}
+
+
+def _output_collisions(
+        task: Callable[[str, dict], dict],
+        paths: list[str],
+        options: dict) -> dict[str, list[str]]:
+    """Maps the outputs that several files, or layouts, would be written to to their files."""
+    sources = {}
+    for path in paths:
+        for output_path in _output_paths(task, path, options):
+            sources.setdefault(os.path.abspath(output_path), []).append(path)
+    return {output_path: list(dict.fromkeys(files))
+            for output_path, files in sources.items() if len(files) > 1}
+
+
+def _output_paths(task: Callable[[str, dict], dict], source_path: str, options: dict) -> list[str]:
+    """Lists the outputs of a file, none if its metadata can not be read."""
+    if task is ingest_file:
+        return [zarr_file_path(source_path, options['output_dir'], options['store_format'])]
+
+    try:
+        return [
+            re_chunked_file_path(
+                source_path, spec, options['output_dir'], store_format=options['store_format'])
+            for spec in options['data_per_chunk']]
+    except Exception:  # pylint: disable=broad-exception-caught
+        # The file fails on its own when it is converted
+        return []
+
+
+def _record(metrics: Metrics) -> dict:
+    """Keeps the counters of a run reported by the command line."""
+    record = metrics.to_dict()
+    return {name: record[name] for name in ('points', 'bytes_written', 'seconds')}
+
+
+def _result_line(result: dict) -> str:
+    """Describes the result of a file."""
+    line = f'{result["status"]:>7} {result["source"]}'
+    if result['status'] == 'done':
+        line += f' -> {result["output"]} ({result["points"]} points, ' + \
+            f'{result["seconds"]:.2f} s)'
+    elif result['status'] == 'failed':
+        line += f': {result["error"]}'
+    return line
+
+
+def _summary_line(results: list[dict], seconds: float) -> str:
+    """Sums up the throughput of a batch."""
+    counts = {status: 0 for status in ('done', 'skipped', 'failed')}
+    for result in results:
+        counts[result['status']] += 1
+
+    points = sum(result.get('points', 0) for result in results)
+    megabytes = sum(result.get('bytes_written', 0) for result in results) / 1e6
+    seconds = max(seconds, 1e-9)
+    return f'{counts["done"]} done, {counts["skipped"]} skipped, ' + \
+        f'{counts["failed"]} failed in {seconds:.2f} s: {points} points, ' + \
+        f'{megabytes:.1f} MB written, {points / seconds:.0f} points/s, ' + \
+        f'{megabytes / seconds:.1f} MB/s.'
+
+
+def _parser() -> argparse.ArgumentParser:
+    """Builds the parser of the command line."""
+    parser = argparse.ArgumentParser(
+        prog='rechunk-zarr-ds', description=__doc__.splitlines()[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        'inputs', nargs='+', help='globs, files or directories of files to convert')
+    common.add_argument(
+        '--workers', type=int, default=os.cpu_count() or 1,
+        help='number of files converted at the same time, by separate processes '
+        '(default: number of CPUs)')
+    common.add_argument(
+        '--compressor', choices=list(COMPRESSORS), default='default')
+    common.add_argument(
+        '--filters', nargs='*', metavar='FILTER', help="e.g. 'delta' or 'shuffle'")
+    common.add_argument('--store-format', choices=STORE_FORMATS, default='directory')
+    common.add_argument('--consolidated', action='store_true')
+    common.add_argument(
+        '--encoding', choices=ENCODINGS,
+        help='encoding of the coordinates (default: float64 for ingest, '
+        'that of each source for rechunk)')
+    common.add_argument(
+        '--max-error', type=float,
+        help='maximum error of encoded coordinates, in their unit')
+    common.add_argument('-v', '--verbose', action='store_true', help='log each run')
+
+    ingest = commands.add_parser(
+        'ingest', parents=[common], help='create zarr files from GeoJSON files')
+    ingest.add_argument(
+        '--output-dir', help='directory of the zarr files (default: next to each source)')
+    ingest.add_argument(
+        '--chunks', default='auto',
+        help="points per chunk, chunk shape like '1000,2', 'auto' or a size "
+        "like '16MiB' (default: auto)")
+    ingest.add_argument('--streaming', action='store_true')
+    ingest.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    ingest.add_argument('--sort', choices=CURVES)
+    ingest.add_argument(
+        '--properties', nargs='*', metavar='NAME',
+        help='feature properties to keep, all of them if no name is given')
+
+    rechunk = commands.add_parser(
+        'rechunk', parents=[common], help='re-chunk zarr files')
+    rechunk.add_argument('--output-dir', required=True)
+    rechunk.add_argument(
+        '--chunks', nargs='+', required=True,
+        help='chunk specifications, several are written in a single pass')
+    rechunk.add_argument('--max-mem', help="memory budget of each file like '512MB'")
+
+    return parser
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,97 +1,990 @@
 """The main module."""
 
+import asyncio
 import logging
+import math
 import os
-from typing import Optional
+import shutil
+import tempfile
+from concurrent.futures import as_completed
+from contextlib import nullcontext
+from typing import MutableMapping, Optional
 
+import numpy as np
 import zarr
+from numcodecs.abc import Codec
 
+from rechunk_zarr_ds.utils.cache import ChunkCache
+from rechunk_zarr_ds.utils.checkpoint import Checkpoint
+from rechunk_zarr_ds.utils.chunks import (
+    block_shape, chunks_label, common_chunks, iter_blocks, normalize_chunks, parse_size)
+from rechunk_zarr_ds.utils.codecs import get_compressor
+from rechunk_zarr_ds.utils.encoding import decoded_values, re_chunk_filters
+from rechunk_zarr_ds.utils.executors import get_executor, resolve_workers
+from rechunk_zarr_ds.utils.metrics import Metrics
+from rechunk_zarr_ds.utils.pipeline import copy_block, copy_blocks_async, pipeline_blocks
+from rechunk_zarr_ds.utils.plan import RechunkPlan, plan_rechunk
+from rechunk_zarr_ds.utils.properties import parent_group, re_chunk_properties
+from rechunk_zarr_ds.utils.spatial import BBOX_INDEX_KEY, query_bbox, re_chunk_bbox_index
+from rechunk_zarr_ds.utils.view import RechunkedView
+from rechunk_zarr_ds.utils.stores import (
+    COORDINATES_KEY, check_memory_format, check_store_format, close_store,
+    close_zarr_array, coordinates_array, create_memory_array, create_store, is_url,
+    is_zip_store, open_zarr_array, path_exists, remove_path, store_path,
+    zarr_name)
 
-def re_chunk_zarr_file(
-        file_path: str,
-        data_per_chunk: int,
-        output_dir: Optional[str] = None) -> zarr.Array | tuple[zarr.Array, str]:
+PARTIAL_SUFFIX = '.partial'
+
+CHECKPOINT_KEY = '.checkpoint'
+
+INTERMEDIATE_KEY = '.intermediate'
+
+
+def re_chunk_zarr_file(  # pylint: disable=too-many-arguments,too-many-locals
+        file_path: str | MutableMapping,
+        data_per_chunk: int | tuple[int, ...] | dict[int, int] | str,
+        output_dir: Optional[str] = None,
+        max_mem: Optional[int | str] = None,
+        *,
+        executor: Optional[str] = None,
+        workers: Optional[int] = None,
+        compressor: Optional[str | Codec] = 'default',
+        filters: Optional[list[str | Codec]] = None,
+        store_format: str = 'directory',
+        consolidated: bool = False,
+        storage_options: Optional[dict] = None,
+        cache: Optional[ChunkCache] = None,
+        memory_format: str = 'zarr',
+        encoding: Optional[str] = None,
+        max_error: Optional[float] = None,
+        metrics: Optional[Metrics] = None) -> zarr.Array | np.ndarray | tuple[zarr.Array, str]:
     """
     Re-chunks a zarr file for a given chunk size.
 
+    The bounding-box index of points sorted along a space-filling curve is
+    carried over to the re-chunked zarr array, see `query_zarr_file`. The
+    property columns of a zarr file written with `properties` are re-chunked
+    along the same rows as the coordinates, see
+    `rechunk_zarr_ds.utils.properties.re_chunk_properties`.
+
     Parameters
     ----------
-    file_path: str
-        The path to the zarr file.
-    data_per_chunk: int
-        The data points per chunk in new zarr data.
+    file_path: str | MutableMapping
+        The path to the zarr file, either a directory of chunks or a zip file,
+        the URL of a remote zarr file, like 's3://bucket/file.zarr', or a
+        zarr store like an fsspec mapper. URLs need fsspec and the package
+        of their protocol.
+    data_per_chunk: int | tuple[int, ...] | dict[int, int] | str
+        The data points per chunk in new zarr data, the chunk shape, a
+        mapping from axis to chunk size, 'auto' to plan chunks of about
+        4 MiB or a target chunk size like '16MiB'. A chunk size of -1 spans
+        the whole axis, as do the axes left out, so `(1_000_000, 1)` keeps
+        x and y coordinates in separate chunks.
     output_dir: Optional[str], None
         The directory to save the re-chunked zarr file on disk. If specified,
         it returns the re-chunked `zarr.Array` and the path to the file generated
-        for it.
+        for it. The file is written to a '.partial' path first and renamed
+        when complete. If a run is interrupted, running it again with the
+        same arguments skips the target chunks already committed. A URL
+        writes the file to a remote store directly, without a local copy.
+        Object stores can not rename, so remote files are written in place,
+        removed on failure and not resumed.
+    max_mem: Optional[int | str], None
+        The memory budget used to stream the data, in bytes or as a string
+        like '512MB'. If specified, the source is read in blocks of whole
+        target chunks that fit in the budget and each block is written as
+        soon as it is read. Otherwise, the whole array is loaded at once.
+        With several workers, the budget is shared between them, and with
+        the 'async' executor between all the blocks in flight in the
+        pipeline, see `rechunk_zarr_ds.utils.pipeline.pipeline_blocks`. When the
+        source and target chunks are laid out along different axes, the
+        copy may go through a temporary intermediate array, see
+        `rechunk_zarr_ds.utils.plan.plan_rechunk`.
+    executor: Optional[str], None
+        The executor used to copy independent target chunk regions at the
+        same time, either 'thread', 'process' or 'async'. Threads suit the
+        default Blosc compressor. Processes need `output_dir` to be specified.
+        'async' overlaps reading the source chunks, compressing and writing
+        the target chunks in a pipeline with bounded queues, which suits
+        stores with a high latency, see
+        `rechunk_zarr_ds.utils.pipeline.copy_blocks_async`. It can not be
+        used from a running event loop. It is the default when the source or
+        the output is remote, so upcoming source chunks are prefetched while
+        the previous ones are written.
+    workers: Optional[int], None
+        The number of workers. Defaults to the number of CPUs if `executor`
+        is specified, otherwise to a single worker.
+    compressor: Optional[str | Codec], 'default'
+        The compressor of the re-chunked data, by name (see
+        `rechunk_zarr_ds.utils.codecs.COMPRESSORS`) or as a numcodecs codec.
+        None disables compression.
+    filters: Optional[list[str | Codec]], None
+        The filters applied before compression, by name ('delta', 'shuffle')
+        or as numcodecs codecs.
+    store_format: str, 'directory'
+        The format of the re-chunked zarr file on disk: 'directory' for one
+        file per chunk or 'zip' for all the chunks packed in a single
+        '.zarr.zip' file. Process executors can not write zip files and
+        remote outputs are always directories of chunks.
+    consolidated: bool, False
+        If True, the metadata of the re-chunked zarr file on disk are
+        consolidated in a single '.zmetadata' key.
+    storage_options: Optional[dict], None
+        The options of the fsspec file system of URLs, like credentials.
+    cache: Optional[ChunkCache], None
+        The cache of decoded chunks the source is read through. Sharing a
+        cache between re-chunks of the same source into several layouts
+        reads and decodes each source chunk once, if the cache holds the
+        source. Process executors do not use it.
+    memory_format: str, 'zarr'
+        The format of the result without `output_dir`: 'zarr' for a zarr
+        array compressed in memory, 'numpy' for an uncompressed array or
+        'memmap' for an uncompressed array mapped to a temporary file, see
+        `rechunk_zarr_ds.utils.stores.create_memory_array`. Uncompressed
+        arrays are filled source chunk by source chunk, so the source is
+        never loaded twice and nothing is compressed, and returned
+        in a `RechunkedView` of the target chunks. They hold the coordinates
+        only, without property columns.
+    encoding: Optional[str], None
+        The encoding of the re-chunked values, 'float64', 'float32' or
+        'int32', decoded to the data type of the source on read. By
+        default, the encoding of the source is kept, see
+        `rechunk_zarr_ds.utils.encoding.re_chunk_filters`. `filters` apply
+        to the encoded values.
+    max_error: Optional[float], None
+        The maximum absolute error of the encoded values, see
+        `rechunk_zarr_ds.utils.main.create_zarr_file`.
+    metrics: Optional[Metrics], None
+        The instrumentation of the run, with stage timers, counters, a
+        progress callback and the export of a record per run, see
+        `rechunk_zarr_ds.utils.metrics.Metrics`.
 
     Returns
     -------
-    Union[zarr.Array, tuple[zarr.Array, str]]
-        The re-chunked zarr array or a tuple with the re-chunked zarr array
-        and the path to the re-chunked zarr file.
+    Union[zarr.Array, RechunkedView, tuple[zarr.Array, str]]
+        The re-chunked zarr array, a view of the uncompressed array in the
+        target chunks or a tuple with the re-chunked zarr array and the path
+        to the re-chunked zarr file.
 
     Raises
     ------
     FileNotFoundError
         If the zarr file does not exist.
     ValueError
-        If the zarr file name or extension is incorrect or the chunk size is
-        less than 1.
+        If the zarr file name or extension is incorrect, the chunk size is
+        less than 1, the chunk specification does not match the array, the
+        memory budget is smaller than a target chunk, the executor is not
+        supported, the number of workers is less than 1, a compressor,
+        filter, store format or encoding is not supported, the values can
+        not be encoded within the maximum error or a zip file or process
+        executor is requested for a remote output.
+    ImportError
+        If a URL is given and fsspec is not installed.
     RuntimeError
         If an error occurs during the re-chunking process.
     """
-    if not os.path.exists(file_path):
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.run('re_chunk_zarr_file', file_path):
+        _check_paths(file_path, output_dir, storage_options)
+
+        if max_mem is not None:
+            max_mem = parse_size(max_mem)
+
+        executor, workers = _resolve_executor(
+            file_path, output_dir, executor, workers, store_format)
+        compressor = get_compressor(compressor)
+        check_memory_format(memory_format)
+
+        # Open the zarr file
+        zarr_ds = open_zarr_array(file_path, storage_options)
+
+        try:
+            # Check if the chunk size is valid
+            chunks = normalize_chunks(data_per_chunk, zarr_ds.shape, zarr_ds.dtype)
+            array_kwargs = {
+                'shape': zarr_ds.shape,
+                'dtype': zarr_ds.dtype,
+                'chunks': chunks,
+                'compressor': compressor,
+                'filters': re_chunk_filters(zarr_ds, filters, encoding, max_error),
+            }
+
+            # Uncompressed arrays are not chunked, the source chunks are copied as they
+            # are and the target chunks are those of the view returned
+            uncompressed = not output_dir and memory_format != 'zarr'
+            if not uncompressed:
+                _add_bbox_index(array_kwargs, zarr_ds)
+                _add_properties_layout(array_kwargs, zarr_ds)
+            plan = _plan_re_chunk(
+                zarr_ds, zarr_ds.chunks if uncompressed else chunks, max_mem, executor, workers)
+            logging.info(
+                'Re-chunk plan for <%s>: %d chunk reads and %d chunk writes%s.',
+                file_path, plan.reads, plan.writes,
+                f' through intermediate chunks {plan.intermediate_chunks}'
+                if plan.intermediate_chunks else '')
+
+            # Processes copy the source, the cache would not be shared
+            source = cache.wrap(zarr_ds) if cache is not None and executor != 'process' \
+                else zarr_ds
+
+            # If the output directory is specified, save the re-chunked zarr as a file on disk
+            if output_dir:
+                output_path = _re_chunked_file_path(
+                    file_path, data_per_chunk, chunks, output_dir, zarr_ds.shape,
+                    store_format=store_format, storage_options=storage_options)
+
+                job = {
+                    'source': os.path.abspath(file_path)
+                    if isinstance(file_path, str) and not is_url(file_path)
+                    else str(file_path),
+                    'array': _array_description(array_kwargs),
+                    'plan': [plan.intermediate_chunks, plan.blocks],
+                }
+                _write_re_chunked_file(
+                    output_path, plan, source, array_kwargs, job,
+                    store_format=store_format, consolidated=consolidated,
+                    executor=executor, workers=workers, storage_options=storage_options,
+                    metrics=metrics)
+                metrics.add(points=zarr_ds.shape[0] if zarr_ds.ndim else 1)
+
+                return _open_re_chunked_file(
+                    output_path, store_format, storage_options), output_path
+
+            if uncompressed:
+                zarr_re_chunked = create_memory_array(
+                    zarr_ds.shape, zarr_ds.dtype, memory_format)
+            else:
+                zarr_re_chunked = _create_array(array_kwargs)
+            _execute_plan(
+                plan, source, zarr_re_chunked, executor=executor, workers=workers,
+                metrics=metrics)
+            metrics.add(points=zarr_ds.shape[0] if zarr_ds.ndim else 1)
+            if uncompressed:
+                return RechunkedView(zarr_re_chunked, chunks)
+            _copy_properties(zarr_ds, [zarr_re_chunked], metrics)
+            return zarr_re_chunked
+
+        finally:
+            close_zarr_array(zarr_ds)
+
+
+def re_chunk_zarr_file_multi(  # pylint: disable=too-many-arguments,too-many-locals
+        file_path: str | MutableMapping,
+        data_per_chunk: list[int | tuple[int, ...] | dict[int, int] | str],
+        output_dir: Optional[str] = None,
+        max_mem: Optional[int | str] = None,
+        *,
+        executor: Optional[str] = None,
+        workers: Optional[int] = None,
+        compressor: Optional[str | Codec] = 'default',
+        filters: Optional[list[str | Codec]] = None,
+        store_format: str = 'directory',
+        consolidated: bool = False,
+        storage_options: Optional[dict] = None,
+        encoding: Optional[str] = None,
+        max_error: Optional[float] = None,
+        metrics: Optional[Metrics] = None) -> list[zarr.Array | tuple[zarr.Array, str]]:
+    """
+    Re-chunks a zarr file for several chunk sizes in a single pass.
+
+    The source is read once, block by block, and each block is written to
+    every re-chunked array. Blocks are made of whole chunks of all the
+    layouts, so their rows are a multiple of the least common multiple of
+    the chunk sizes, which must fit in the memory budget. Chunk sizes that
+    are not multiples of each other, like 333, 1000 and 7, may only share
+    whole chunks over the whole array; re-chunk such layouts separately
+    with `re_chunk_zarr_file`. Unlike
+    `re_chunk_zarr_file`, the copy never goes through an intermediate array
+    and interrupted runs start over.
+
+    Parameters
+    ----------
+    file_path: str | MutableMapping
+        The path or URL to the zarr file, or a zarr store, see
+        `re_chunk_zarr_file`.
+    data_per_chunk: list[int | tuple[int, ...] | dict[int, int] | str]
+        The chunk specification of each re-chunked array, see
+        `re_chunk_zarr_file`.
+    output_dir: Optional[str], None
+        The directory or URL to save the re-chunked zarr files to. Each file
+        is named like with `re_chunk_zarr_file`.
+    max_mem: Optional[int | str], None
+        The memory budget used to stream the data, in bytes or as a string
+        like '512MB'. Otherwise, the whole array is loaded at once.
+    executor: Optional[str], None
+        The executor used to copy blocks at the same time, either 'thread',
+        'process' or 'async'.
+    workers: Optional[int], None
+        The number of workers.
+    compressor: Optional[str | Codec], 'default'
+        The compressor of the re-chunked data.
+    filters: Optional[list[str | Codec]], None
+        The filters applied before compression.
+    store_format: str, 'directory'
+        The format of the re-chunked zarr files on disk, 'directory' or 'zip'.
+    consolidated: bool, False
+        If True, the metadata of the re-chunked zarr files on disk are
+        consolidated.
+    storage_options: Optional[dict], None
+        The options of the fsspec file system of URLs.
+    encoding: Optional[str], None
+        The encoding of the re-chunked values, that of the source by
+        default, see `re_chunk_zarr_file`.
+    max_error: Optional[float], None
+        The maximum absolute error of the encoded values.
+    metrics: Optional[Metrics], None
+        The instrumentation of the run, see `re_chunk_zarr_file`.
+
+    Returns
+    -------
+    list[zarr.Array | tuple[zarr.Array, str]]
+        The re-chunked zarr arrays, or tuples with the re-chunked zarr array
+        and the path to the re-chunked zarr file, in the order of
+        `data_per_chunk`.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the zarr file or the output directory does not exist.
+    FileExistsError
+        If a re-chunked zarr file already exists.
+    ValueError
+        If a chunk specification or option is invalid, two chunk
+        specifications give the same chunk shape or the memory budget is
+        smaller than the smallest block of whole chunks of every layout,
+        see `rechunk_zarr_ds.utils.chunks.common_chunks`.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.run('re_chunk_zarr_file_multi', file_path):
+        _check_paths(file_path, output_dir, storage_options)
+
+        if max_mem is not None:
+            max_mem = parse_size(max_mem)
+
+        executor, workers = _resolve_executor(
+            file_path, output_dir, executor, workers, store_format)
+        compressor = get_compressor(compressor)
+
+        zarr_ds = open_zarr_array(file_path, storage_options)
+
+        try:
+            all_chunks = [
+                normalize_chunks(spec, zarr_ds.shape, zarr_ds.dtype) for spec in data_per_chunk]
+
+            if len(set(all_chunks)) < len(all_chunks):
+                err_message = f'Chunk specifications {data_per_chunk} give ' + \
+                    'the same chunk shape twice.'
+                logging.error(err_message)
+                raise ValueError(err_message)
+
+            target_filters = re_chunk_filters(zarr_ds, filters, encoding, max_error)
+            arrays_kwargs = [{
+                'shape': zarr_ds.shape,
+                'dtype': zarr_ds.dtype,
+                'chunks': chunks,
+                'compressor': compressor,
+                'filters': target_filters,
+            } for chunks in all_chunks]
+            for kwargs in arrays_kwargs:
+                _add_bbox_index(kwargs, zarr_ds)
+                _add_properties_layout(kwargs, zarr_ds)
+
+            # Blocks of whole chunks of every layout
+            common = common_chunks(
+                zarr_ds.shape, all_chunks, zarr_ds.dtype.itemsize,
+                max_mem and _worker_budget(zarr_ds, zarr_ds.chunks, max_mem, executor, workers))
+            block = block_shape(
+                zarr_ds.shape, common, zarr_ds.dtype.itemsize,
+                _worker_budget(zarr_ds, common, max_mem, executor, workers), zarr_ds.chunks)
+            logging.info(
+                'Re-chunk <%s> to %d layouts in blocks of %s.',
+                file_path, len(all_chunks), block)
+
+            if not output_dir:
+                targets = [_create_array(kwargs) for kwargs in arrays_kwargs]
+                metrics.blocks_total = _count_blocks(zarr_ds.shape, block)
+                _copy_blocks(zarr_ds, targets, block, executor, workers, metrics=metrics)
+                _copy_properties(zarr_ds, targets, metrics)
+                metrics.add(points=zarr_ds.shape[0] if zarr_ds.ndim else 1)
+                return targets
+
+            paths = [
+                _re_chunked_file_path(
+                    file_path, spec, chunks, output_dir, zarr_ds.shape,
+                    store_format=store_format, storage_options=storage_options)
+                for spec, chunks in zip(data_per_chunk, all_chunks)]
+
+            metrics.blocks_total = _count_blocks(zarr_ds.shape, block)
+            _write_re_chunked_files(
+                paths, block, zarr_ds, arrays_kwargs,
+                store_format=store_format, consolidated=consolidated,
+                executor=executor, workers=workers, storage_options=storage_options,
+                metrics=metrics)
+            metrics.add(points=zarr_ds.shape[0] if zarr_ds.ndim else 1)
+
+            return [
+                (_open_re_chunked_file(path, store_format, storage_options), path)
+                for path in paths]
+
+        finally:
+            close_zarr_array(zarr_ds)
+
+
+def open_re_chunked_view(
+        file_path: str | MutableMapping,
+        data_per_chunk: int | tuple[int, ...] | dict[int, int] | str,
+        *,
+        storage_options: Optional[dict] = None,
+        cache: Optional[ChunkCache] = None) -> RechunkedView:
+    """
+    Opens a zarr file as a lazy view split in new chunks.
+
+    No re-chunked copy is written: each chunk of the view is read from the
+    source chunks it overlaps when it is requested. Iterating over the view
+    yields batches of `data_per_chunk` points as soon as the file is open.
+
+    Parameters
+    ----------
+    file_path: str | MutableMapping
+        The path or URL to the zarr file, or a zarr store, see
+        `re_chunk_zarr_file`.
+    data_per_chunk: int | tuple[int, ...] | dict[int, int] | str
+        The chunk specification of the view, see `re_chunk_zarr_file`.
+    storage_options: Optional[dict], None
+        The options of the fsspec file system of URLs.
+    cache: Optional[ChunkCache], None
+        The cache of decoded chunks the source is read through, so source
+        chunks shared by several chunks of the view are decoded once.
+
+    Returns
+    -------
+    RechunkedView
+        The lazy view. Close it, or use it as a context manager, to close
+        zip files.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the zarr file does not exist.
+    ValueError
+        If the chunk specification is invalid.
+    """
+    _check_paths(file_path, None, storage_options)
+    zarr_ds = open_zarr_array(file_path, storage_options)
+
+    try:
+        chunks = normalize_chunks(data_per_chunk, zarr_ds.shape, zarr_ds.dtype)
+    except ValueError:
+        close_zarr_array(zarr_ds)
+        raise
+
+    return RechunkedView(cache.wrap(zarr_ds) if cache is not None else zarr_ds, chunks)
+
+
+def query_zarr_file(
+        file_path: str | MutableMapping,
+        bbox: tuple[float, float, float, float],
+        *,
+        storage_options: Optional[dict] = None,
+        cache: Optional[ChunkCache] = None) -> np.ndarray:
+    """
+    Selects the points of a zarr file in a bounding box.
+
+    If the file was written with points sorted along a space-filling curve,
+    see `rechunk_zarr_ds.utils.main.create_zarr_file`, only the chunks whose
+    bounding box intersects the query are read. Re-chunked copies of such
+    files keep their index.
+
+    Parameters
+    ----------
+    file_path: str | MutableMapping
+        The path or URL to the zarr file, or a zarr store, see
+        `re_chunk_zarr_file`.
+    bbox: tuple[float, float, float, float]
+        The query box as (xmin, ymin, xmax, ymax), bounds included.
+    storage_options: Optional[dict], None
+        The options of the fsspec file system of URLs.
+    cache: Optional[ChunkCache], None
+        The cache of decoded chunks the file is read through, so chunks
+        shared by successive queries are decoded once.
+
+    Returns
+    -------
+    np.ndarray
+        The (M, 2) array of the points in the box.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the zarr file does not exist.
+    ValueError
+        If the box is not made of 4 ordered bounds.
+    """
+    _check_paths(file_path, None, storage_options)
+    zarr_ds = open_zarr_array(file_path, storage_options)
+
+    try:
+        return query_bbox(cache.wrap(zarr_ds) if cache is not None else zarr_ds, bbox)
+    finally:
+        close_zarr_array(zarr_ds)
+
+
+def re_chunked_file_path(
+        file_path: str | MutableMapping,
+        data_per_chunk: int | tuple[int, ...] | dict[int, int] | str,
+        output_dir: str,
+        *,
+        store_format: str = 'directory',
+        storage_options: Optional[dict] = None) -> str:
+    """
+    Builds the path of the zarr file `re_chunk_zarr_file` writes.
+
+    Only the metadata of the source are read, to resolve the chunk shape.
+
+    Parameters
+    ----------
+    file_path: str | MutableMapping
+        The path or URL to the zarr file, or a zarr store, see
+        `re_chunk_zarr_file`.
+    data_per_chunk: int | tuple[int, ...] | dict[int, int] | str
+        The chunk specification, see `re_chunk_zarr_file`.
+    output_dir: str
+        The directory of the re-chunked zarr file.
+    store_format: str, 'directory'
+        The format of the re-chunked zarr file, 'directory' or 'zip'.
+    storage_options: Optional[dict], None
+        The options of the fsspec file system of URLs.
+
+    Returns
+    -------
+    str
+        The path to the re-chunked zarr file, which may exist already.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the zarr file does not exist.
+    ValueError
+        If the chunk specification is invalid.
+    """
+    _check_paths(file_path, None, storage_options)
+    zarr_ds = open_zarr_array(file_path, storage_options)
+
+    try:
+        chunks = normalize_chunks(data_per_chunk, zarr_ds.shape, zarr_ds.dtype)
+        return _re_chunked_path(file_path, chunks, zarr_ds.shape, output_dir, store_format)
+    finally:
+        close_zarr_array(zarr_ds)
+
+
+def _check_paths(
+        file_path: str | MutableMapping,
+        output_dir: Optional[str],
+        storage_options: Optional[dict]) -> None:
+    """Checks that the zarr file and the output directory exist."""
+    if isinstance(file_path, str) and not path_exists(file_path, storage_options):
         err_message = f'Zarr file <{file_path}> not found.'
         logging.error(err_message)
         raise FileNotFoundError(err_message)
 
-    if os.path.isfile(file_path):
+    if isinstance(file_path, str) and os.path.isfile(file_path) and \
+            not is_zip_store(file_path):
         err_message = 'Zarr file is not a file but directory of chunks.'
         logging.error(err_message)
         raise FileNotFoundError(err_message)
 
-    # Check if the chunk size is valid
-    if data_per_chunk < 1:
-        err_message = 'Chunk size must be greater than 0.'
-        logging.error(err_message)
-        raise ValueError(err_message)
-
     # Check if the output directory exists
-    if output_dir and not os.path.isdir(output_dir):
+    if output_dir and not is_url(output_dir) and not os.path.isdir(output_dir):
         err_message = f'Output directory <{output_dir}> not found.'
         logging.error(err_message)
         raise FileNotFoundError(err_message)
 
-    # Open the zarr file
-    read_mode = 'r+' if output_dir else 'r'
-    zarr_ds = zarr.open_array(file_path, mode=read_mode)
-    zarr_ds_array = zarr_ds[:]
-
-    # If the output directory is specified, save the re-chunked zarr as a file on disk
-    if output_dir:
-        re_chunked_file_path = os.path.join(
-            output_dir,
-            os.path.splitext(os.path.basename(file_path))[0] +
-            f'_re_chunked__to__{data_per_chunk}.zarr')
-
-        if os.path.exists(re_chunked_file_path):
-            err_message = f'Re-chunked zarr file for source file <{file_path}> ' + \
-                f'and chunk size <{data_per_chunk}> already exists.'
-            logging.error(err_message)
-            raise FileExistsError(err_message)
-
-        shape = zarr_ds_array.shape
-
-        zarr_ds.resize(shape)  # Make sure that it hase the same shape.
-        zarr_ds = zarr.create(
-            shape=shape,
-            dtype=zarr_ds_array.dtype,
-            chunks=(data_per_chunk,),
-            store=re_chunked_file_path)
-
-        zarr_ds[:] = zarr_ds_array
-        return zarr_ds, re_chunked_file_path
-
-    zarr_re_chunked = zarr.array(zarr_ds_array, chunks=(data_per_chunk,))
-    return zarr_re_chunked
+
+def _resolve_executor(
+        file_path: str | MutableMapping,
+        output_dir: Optional[str],
+        executor: Optional[str],
+        workers: Optional[int],
+        store_format: str) -> tuple[Optional[str], int]:
+    """Validates the executor and store format for the source and the outputs."""
+    # Remote stores prefetch the source chunks through the async pipeline
+    remote = not isinstance(file_path, str) or is_url(file_path) or is_url(output_dir)
+    if remote and executor is None and workers is None:
+        executor = 'async'
+
+    executor, workers = resolve_workers(executor, workers)
+    check_store_format(store_format)
+
+    if executor == 'process' and (not output_dir or store_format == 'zip'):
+        err_message = 'Process executor needs an output directory to write to.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    if is_url(output_dir) and (executor == 'process' or store_format == 'zip'):
+        err_message = 'Remote outputs can only be written as directories ' + \
+            'of chunks by threads.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    return executor, workers
+
+
+def _re_chunked_file_path(  # pylint: disable=too-many-arguments
+        file_path: str | MutableMapping,
+        data_per_chunk: int | tuple[int, ...] | dict[int, int] | str,
+        chunks: tuple[int, ...],
+        output_dir: str,
+        shape: tuple[int, ...],
+        *,
+        store_format: str,
+        storage_options: Optional[dict]) -> str:
+    """Builds the path of a re-chunked zarr file and checks that it does not exist."""
+    path = _re_chunked_path(file_path, chunks, shape, output_dir, store_format)
+
+    if path_exists(path, storage_options):
+        err_message = f'Re-chunked zarr file for source file <{file_path}> ' + \
+            f'and chunk size <{data_per_chunk}> already exists.'
+        logging.error(err_message)
+        raise FileExistsError(err_message)
+
+    return path
+
+
+def _re_chunked_path(
+        file_path: str | MutableMapping,
+        chunks: tuple[int, ...],
+        shape: tuple[int, ...],
+        output_dir: str,
+        store_format: str) -> str:
+    """Builds the path of a re-chunked zarr file from its chunk shape."""
+    return store_path(
+        output_dir,
+        zarr_name(file_path) + f'_re_chunked__to__{chunks_label(chunks, shape)}',
+        store_format)
+
+
+def _open_re_chunked_file(
+        path: str,
+        store_format: str,
+        storage_options: Optional[dict]) -> zarr.Array:
+    """Opens the coordinates array of a re-chunked zarr file once written."""
+    if is_url(path):
+        return coordinates_array(
+            zarr.open(create_store(path, store_format, storage_options), mode='r+'))
+    if store_format == 'zip':
+        return open_zarr_array(path)
+    return coordinates_array(zarr.open(path, mode='r+'))
+
+
+def _plan_re_chunk(
+        source: zarr.Array,
+        chunks: tuple[int, ...],
+        max_mem: Optional[int],
+        executor: Optional[str],
+        workers: int) -> RechunkPlan:
+    """Plans the re-chunk of the source with the memory budget of each worker."""
+    return plan_rechunk(
+        shape=source.shape,
+        itemsize=source.dtype.itemsize,
+        source_chunks=source.chunks,
+        target_chunks=chunks,
+        max_mem=_worker_budget(source, chunks, max_mem, executor, workers))
+
+
+def _worker_budget(
+        source: zarr.Array,
+        chunks: tuple[int, ...],
+        max_mem: Optional[int],
+        executor: Optional[str],
+        workers: int) -> Optional[int]:
+    """Computes the memory budget of the block copied by each worker."""
+    if max_mem is not None and executor == 'async':
+        return max_mem // pipeline_blocks(workers)
+    if max_mem is not None:
+        return max_mem // workers
+
+    if not executor:
+        return None
+
+    # Split the array so that every worker gets a few blocks.
+    chunk_bytes = math.prod(
+        min(c, s) for c, s in zip(chunks, source.shape)) * source.dtype.itemsize
+    return max(chunk_bytes, math.ceil(source.nbytes / (workers * 4)))
+
+
+def _write_re_chunked_file(  # pylint: disable=too-many-arguments,too-many-locals
+        path: str,
+        plan: RechunkPlan,
+        source: zarr.Array,
+        array_kwargs: dict,
+        job: dict,
+        *,
+        store_format: str,
+        consolidated: bool,
+        executor: Optional[str],
+        workers: int,
+        storage_options: Optional[dict] = None,
+        metrics: Optional[Metrics] = None) -> None:
+    """Writes the re-chunked zarr file to a partial path and renames it when complete."""
+    metrics = metrics if metrics is not None else Metrics()
+    partial_path = path + PARTIAL_SUFFIX
+
+    if store_format == 'zip' or is_url(path):
+        # Zip files and remote files can not be resumed, they are written
+        # again from scratch. Object stores can not rename either, so remote
+        # files are written in place.
+        write_path = path if is_url(path) else partial_path
+        remove_path(write_path, storage_options)
+
+        temp_dir = tempfile.mkdtemp(
+            prefix='.intermediate_', dir=None if is_url(path) else os.path.dirname(path))
+        store = create_store(write_path, store_format, storage_options)
+        try:
+            target = _create_array(array_kwargs, store)
+            _execute_plan(
+                plan, source, target, executor=executor, workers=workers,
+                intermediate_store=temp_dir, metrics=metrics)
+            _copy_properties(source, [target], metrics)
+        except BaseException:
+            close_store(store)
+            remove_path(write_path, storage_options)
+            raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        with metrics.stage('finalize'):
+            close_store(store, consolidated=consolidated)
+            if write_path != path:
+                os.replace(write_path, path)
+        return
+
+    checkpoint = Checkpoint(os.path.join(partial_path, CHECKPOINT_KEY), job)
+
+    if checkpoint.resumed:
+        target = zarr.open_array(partial_path, mode='r+', path=array_kwargs.get('path'))
+    else:
+        shutil.rmtree(partial_path, ignore_errors=True)
+        os.makedirs(partial_path)
+        target = _create_array(array_kwargs, partial_path)
+
+    intermediate_store = os.path.join(partial_path, INTERMEDIATE_KEY)
+    with checkpoint:
+        _execute_plan(
+            plan, source, target, executor=executor, workers=workers,
+            intermediate_store=intermediate_store, checkpoint=checkpoint,
+            metrics=metrics)
+        _copy_properties(source, [target], metrics)
+
+    with metrics.stage('finalize'):
+        shutil.rmtree(intermediate_store, ignore_errors=True)
+        checkpoint.remove()
+        close_store(zarr.DirectoryStore(partial_path), consolidated=consolidated)
+        os.replace(partial_path, path)
+
+
+def _write_re_chunked_files(  # pylint: disable=too-many-arguments,too-many-locals
+        paths: list[str],
+        block: tuple[int, ...],
+        source: zarr.Array,
+        arrays_kwargs: list[dict],
+        *,
+        store_format: str,
+        consolidated: bool,
+        executor: Optional[str],
+        workers: int,
+        storage_options: Optional[dict] = None,
+        metrics: Optional[Metrics] = None) -> None:
+    """Writes several re-chunked zarr files from a single pass over the source."""
+    # Object stores can not rename, so remote files are written in place.
+    write_paths = [path if is_url(path) else path + PARTIAL_SUFFIX for path in paths]
+    stores = []
+    try:
+        for write_path in write_paths:
+            remove_path(write_path, storage_options)
+            stores.append(create_store(write_path, store_format, storage_options))
+
+        targets = [
+            _create_array(kwargs, store)
+            for store, kwargs in zip(stores, arrays_kwargs)]
+        _copy_blocks(source, targets, block, executor, workers, metrics=metrics)
+        _copy_properties(source, targets, metrics)
+    except BaseException:
+        for store in stores:
+            close_store(store)
+        for write_path in write_paths:
+            remove_path(write_path, storage_options)
+        raise
+
+    for store, write_path, path in zip(stores, write_paths, paths):
+        with metrics.stage('finalize'):
+            close_store(store, consolidated=consolidated)
+            if write_path != path:
+                os.replace(write_path, path)
+
+
+def _add_bbox_index(array_kwargs: dict, source: zarr.Array) -> None:
+    """Carries the bounding-box index of a source of points over to a target array."""
+    if source.ndim != 2:
+        return
+    index = re_chunk_bbox_index(source, array_kwargs['chunks'][0])
+    if index:
+        # The boxes bound the values of the target, which another encoding rounds
+        index['bboxes'] = decoded_values(
+            array_kwargs['filters'], np.asarray(index['bboxes']).reshape(-1, 4)).tolist()
+        array_kwargs['attrs'] = {BBOX_INDEX_KEY: index}
+
+
+def _add_properties_layout(array_kwargs: dict, source: zarr.Array) -> None:
+    """Puts a target array in a group, like its source, to hold its property columns."""
+    if parent_group(source) is not None:
+        array_kwargs['path'] = COORDINATES_KEY
+
+
+def _copy_properties(
+        source: zarr.Array,
+        targets: list[zarr.Array],
+        metrics: Metrics) -> None:
+    """Re-chunks the property columns of a source, if any, next to each target."""
+    if parent_group(source) is None:
+        return
+    with metrics.stage('properties'):
+        for target in targets:
+            re_chunk_properties(source, target)
+
+
+def _create_array(
+        array_kwargs: dict,
+        store: Optional[str | MutableMapping] = None) -> zarr.Array:
+    """Creates a target array with the attributes of its description, if any."""
+    kwargs = dict(array_kwargs)
+    attrs = kwargs.pop('attrs', None)
+    z = zarr.create(store=store, **kwargs)
+    if attrs:
+        z.attrs.update(attrs)
+    return z
+
+
+def _array_description(array_kwargs: dict) -> dict:
+    """Describes the target array of a job in a JSON serializable way."""
+    compressor = array_kwargs['compressor']
+    return {
+        'shape': array_kwargs['shape'],
+        'dtype': str(array_kwargs['dtype']),
+        'chunks': array_kwargs['chunks'],
+        'compressor': compressor.get_config()
+        if isinstance(compressor, Codec) else compressor,
+        'filters': [codec.get_config() for codec in array_kwargs['filters'] or []],
+    }
+
+
+def _execute_plan(  # pylint: disable=too-many-arguments
+        plan: RechunkPlan,
+        source: zarr.Array,
+        target: zarr.Array,
+        *,
+        executor: Optional[str] = None,
+        workers: int = 1,
+        intermediate_store: Optional[str] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        metrics: Optional[Metrics] = None) -> None:
+    """Copies the source into the target following a re-chunk plan."""
+    metrics = metrics if metrics is not None else Metrics()
+    metrics.blocks_total = sum(_count_blocks(source.shape, block) for block in plan.blocks)
+
+    if plan.intermediate_chunks is None:
+        _copy_blocks(
+            source, target, plan.blocks[0], executor, workers, checkpoint=checkpoint,
+            metrics=metrics)
+        return
+
+    # The intermediate array is kept in memory unless a store is given, and
+    # reopened when resuming a job.
+    intermediate = zarr.open_array(
+        intermediate_store if intermediate_store else zarr.MemoryStore(),
+        mode='a',
+        shape=source.shape,
+        dtype=source.dtype,
+        chunks=plan.intermediate_chunks)
+
+    _copy_blocks(
+        source, intermediate, plan.blocks[0], executor, workers,
+        checkpoint=checkpoint, stage=0, metrics=metrics)
+    _copy_blocks(
+        intermediate, target, plan.blocks[1], executor, workers,
+        checkpoint=checkpoint, stage=1, metrics=metrics)
+
+
+def _copy_blocks(  # pylint: disable=too-many-arguments,too-many-locals
+        source: zarr.Array,
+        target: zarr.Array | list[zarr.Array],
+        block: tuple[int, ...],
+        executor: Optional[str] = None,
+        workers: int = 1,
+        *,
+        checkpoint: Optional[Checkpoint] = None,
+        stage: int = 0,
+        metrics: Optional[Metrics] = None) -> None:
+    """Copies the source into the target block by block, skipping committed blocks."""
+    metrics = metrics if metrics is not None else Metrics()
+    targets = target if isinstance(target, list) else [target]
+    all_blocks = list(iter_blocks(source.shape, block))
+    blocks = {
+        f'{stage}:{index}': selection
+        for index, selection in enumerate(all_blocks)
+        if not checkpoint or not checkpoint.is_done(f'{stage}:{index}')}
+    metrics.add(blocks=len(all_blocks) - len(blocks))
+
+    def commit(key: str, counted: bool = False) -> None:
+        if checkpoint:
+            checkpoint.commit(key)
+        nbytes = _selection_size(blocks[key]) * source.dtype.itemsize
+        metrics.commit_block(
+            bytes_read=0 if counted else nbytes,
+            bytes_written=nbytes * len(targets),
+            chunks_written=sum(
+                _count_blocks([s.stop - s.start for s in blocks[key]], array.chunks)
+                for array in targets if hasattr(array, 'chunks')))
+
+    # Arrays without a store, like numpy arrays, are filled by threads
+    if executor == 'async' and not all(isinstance(array, zarr.Array) for array in targets):
+        executor = 'thread'
+
+    if executor == 'async':
+        asyncio.run(copy_blocks_async(
+            source, target, blocks.items(), workers=workers, on_commit=commit,
+            metrics=metrics))
+        return
+
+    # Processes copy the arrays, their reads and writes are not timed
+    if executor != 'process':
+        source = metrics.wrap(source)
+        target = [metrics.wrap(array) for array in targets] \
+            if isinstance(target, list) else metrics.wrap(target)
+
+    if not executor:
+        for key, selection in blocks.items():
+            copy_block(source, target, selection)
+            commit(key, counted=True)
+        return
+
+    # Reads and writes of threads are timed in their stages already
+    copy_stage = metrics.stage('copy') if executor == 'process' else nullcontext()
+    with copy_stage, get_executor(executor, workers) as pool:
+        # Blocks cover whole target chunks, so no chunk is written twice.
+        futures = {
+            pool.submit(copy_block, source, target, selection): key
+            for key, selection in blocks.items()}
+
+        for future in as_completed(futures):
+            future.result()
+            commit(futures[future], counted=executor != 'process')
+
+
+def _count_blocks(shape: tuple[int, ...], block: tuple[int, ...]) -> int:
+    """Counts the blocks, or chunks, of an array."""
+    return math.prod(math.ceil(s / b) for s, b in zip(shape, block))
+
+
+def _selection_size(selection: tuple[slice, ...]) -> int:
+    """Counts the items of a selection of slices."""
+    return math.prod(s.stop - s.start for s in selection)
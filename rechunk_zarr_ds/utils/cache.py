@@ -0,0 +1,285 @@
+"""Chunk cache module."""
+
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.chunks import parse_size
+
+# Tokens of the stores without a path, by the id of the living store
+_STORE_TOKENS: dict[int, tuple[weakref.ref, int]] = {}
+_STORE_TOKENS_LOCK = threading.RLock()
+_NEXT_TOKEN = itertools.count()
+
+
+class ChunkCache:
+    """
+    Least recently used cache of decoded zarr chunks with a size limit.
+
+    A cache can be shared by several re-chunks of the same source and by
+    readers of their outputs, so chunks read again are neither fetched nor
+    decoded again. Chunks are identified by the path of their store, so a
+    cache must be cleared when a cached array is modified. Chunks of stores
+    without a path, like in-memory stores, are cached for the lifetime of
+    the store object. Reading a source
+    larger than the cache in order evicts every chunk before it is read
+    again; size the cache with the `hits` and `misses` counters.
+
+    Parameters
+    ----------
+    max_bytes: int | str
+        The size limit of the decoded chunks, in bytes or as a string like
+        '2GB'.
+
+    Attributes
+    ----------
+    hits: int
+        The number of chunks read from the cache.
+    misses: int
+        The number of chunks read from their array.
+    nbytes: int
+        The size of the cached chunks in bytes.
+    """
+
+    def __init__(self, max_bytes: int | str):
+        self.max_bytes = parse_size(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._chunks: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def wrap(self, array: zarr.Array) -> 'CachedArray':
+        """
+        Wraps an array so that its reads go through the cache.
+
+        Parameters
+        ----------
+        array: zarr.Array
+            The zarr array.
+
+        Returns
+        -------
+        CachedArray
+            The array reading its chunks through the cache.
+        """
+        return CachedArray(array, self)
+
+    def read(self, array: zarr.Array, selection: Any) -> np.ndarray:
+        """
+        Reads a selection of an array through the cache.
+
+        Each run of consecutive chunks missing from the cache is read with a
+        single selection of the array, then cached one by one. Selections
+        other than integers and slices with a step of 1, and arrays whose
+        store can not be identified, are read from the array directly.
+
+        Parameters
+        ----------
+        array: zarr.Array
+            The zarr array.
+        selection: Any
+            The basic selection, like `(slice(0, 10), 1)`.
+
+        Returns
+        -------
+        np.ndarray
+            The selected data.
+        """
+        region = _normalize_selection(selection, array.shape)
+        array_key = _array_key(array)
+        if region is None or array_key is None:
+            return array[selection]
+
+        slices, squeeze = region
+        indices = list(itertools.product(*[
+            range(s.start // c, (s.stop - 1) // c + 1) if s.stop > s.start else range(0)
+            for s, c in zip(slices, array.chunks)]))
+
+        chunks = {index: self._get((array_key, index)) for index in indices}
+        missing = [index for index, chunk in chunks.items() if chunk is None]
+
+        with self._lock:
+            self.hits += len(indices) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            chunks.update(self._load(array, array_key, missing))
+
+        out = np.empty(tuple(s.stop - s.start for s in slices), dtype=array.dtype)
+        for index, chunk in chunks.items():
+            chunk_starts = [i * c for i, c in zip(index, array.chunks)]
+            overlap = [
+                (max(s.start, start), min(s.stop, start + size))
+                for s, start, size in zip(slices, chunk_starts, chunk.shape)]
+            out[tuple(slice(a - s.start, b - s.start) for (a, b), s in zip(overlap, slices))] = \
+                chunk[tuple(slice(a - start, b - start)
+                            for (a, b), start in zip(overlap, chunk_starts))]
+
+        return out.reshape([n for n, drop in zip(out.shape, squeeze) if not drop])
+
+    def clear(self) -> None:
+        """Removes all the chunks from the cache and resets the counters."""
+        with self._lock:
+            self._chunks.clear()
+            self.hits = self.misses = self.nbytes = 0
+
+    def _load(
+            self,
+            array: zarr.Array,
+            array_key: tuple,
+            indices: list[tuple[int, ...]]) -> dict[tuple[int, ...], np.ndarray]:
+        """Reads chunks with a single selection per run of consecutive chunks and caches them."""
+        chunks = {}
+        for run in _chunk_runs(indices):
+            origin = np.array(run[0]) * array.chunks
+            data = array[tuple(
+                slice(o, min((i + 1) * c, n))
+                for o, i, c, n in zip(origin, run[-1], array.chunks, array.shape))]
+
+            for index in run:
+                chunks[index] = np.array(data[tuple(
+                    slice(i * c - o, (i + 1) * c - o)
+                    for i, c, o in zip(index, array.chunks, origin))])
+                self._put((array_key, index), chunks[index])
+
+        return chunks
+
+    def _get(self, key: tuple) -> Optional[np.ndarray]:
+        """Gets a chunk from the cache and marks it as recently used."""
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                self._chunks.move_to_end(key)
+            return chunk
+
+    def _put(self, key: tuple, chunk: np.ndarray) -> None:
+        """Adds a chunk to the cache and evicts the least recently used ones."""
+        if chunk.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._chunks:
+                return
+            self._chunks[key] = chunk
+            self.nbytes += chunk.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._chunks.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+
+class CachedArray:
+    """
+    Zarr array reading its chunks through a chunk cache.
+
+    Indexing with integers and slices reads through the cache, other
+    attributes are the ones of the wrapped array.
+
+    Parameters
+    ----------
+    array: zarr.Array
+        The zarr array.
+    cache: ChunkCache
+        The chunk cache.
+    """
+
+    def __init__(self, array: zarr.Array, cache: ChunkCache):
+        self.array = array
+        self.cache = cache
+
+    def __getitem__(self, selection: Any) -> np.ndarray:
+        return self.cache.read(self.array, selection)
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ('array', 'cache'):
+            raise AttributeError(name)
+        return getattr(self.array, name)
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+
+def _array_key(array: zarr.Array) -> Optional[tuple]:
+    """Identifies an array by the path of its store, or the store object in memory."""
+    # Consolidated metadata stores wrap the underlying store.
+    store = getattr(array.store, 'store', array.store)
+    root = getattr(store, 'path', None)
+    if not isinstance(root, str):
+        root = _store_token(store)
+        if root is None:
+            return None
+    return (type(store).__name__, root, array.path)
+
+
+def _store_token(store: Any) -> Optional[int]:
+    """Gets a token never reused for another store, or None if the store can not be tracked."""
+    # Ids are reused once an object is collected, so tokens are bound to the living store.
+    key = id(store)
+    with _STORE_TOKENS_LOCK:
+        entry = _STORE_TOKENS.get(key)
+        if entry is not None and entry[0]() is store:
+            return entry[1]
+        try:
+            ref = weakref.ref(store, lambda _: _forget_store(key))
+        except TypeError:
+            return None
+        _STORE_TOKENS[key] = (ref, next(_NEXT_TOKEN))
+        return _STORE_TOKENS[key][1]
+
+
+def _forget_store(key: int) -> None:
+    """Removes the token of a collected store."""
+    with _STORE_TOKENS_LOCK:
+        entry = _STORE_TOKENS.get(key)
+        if entry is not None and entry[0]() is None:
+            del _STORE_TOKENS[key]
+
+
+def _chunk_runs(indices: list[tuple[int, ...]]) -> list[list[tuple[int, ...]]]:
+    """Groups chunk indices into runs of consecutive chunks along the first axis."""
+    runs = []
+    for index in sorted(indices, key=lambda i: (i[1:], i[:1])):
+        if runs and index and runs[-1][-1][1:] == index[1:] \
+                and runs[-1][-1][0] + 1 == index[0]:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+    return runs
+
+
+def _normalize_selection(
+        selection: Any,
+        shape: tuple[int, ...]) -> Optional[tuple[tuple[slice, ...], tuple[bool, ...]]]:
+    """Converts a basic selection to slices and the axes to squeeze, or None if not basic."""
+    if not isinstance(selection, tuple):
+        selection = (selection,)
+    if len(selection) > len(shape):
+        return None
+
+    slices = []
+    squeeze = []
+    for item, n in itertools.zip_longest(selection, shape, fillvalue=slice(None)):
+        if isinstance(item, (int, np.integer)):
+            index = int(item) + n if item < 0 else int(item)
+            if not 0 <= index < n:
+                return None
+            slices.append(slice(index, index + 1))
+            squeeze.append(True)
+        elif isinstance(item, slice):
+            start, stop, step = item.indices(n)
+            if step != 1:
+                return None
+            slices.append(slice(start, max(start, stop)))
+            squeeze.append(False)
+        else:
+            return None
+
+    return tuple(slices), tuple(squeeze)
@@ -0,0 +1,92 @@
+"""Checkpoint module."""
+
+import json
+import logging
+import os
+from typing import Optional, TextIO
+
+
+class Checkpoint:
+    """
+    Journal of the blocks committed by a re-chunk job.
+
+    The journal is a text file whose first line describes the job and whose
+    other lines are the keys of the committed blocks. A journal written for
+    another job is ignored, so a changed job starts over.
+
+    Parameters
+    ----------
+    path: str
+        The path to the journal file.
+    job: dict
+        The JSON serializable description of the job.
+    """
+
+    def __init__(self, path: str, job: dict):
+        self.path = path
+        self.job = json.loads(json.dumps(job))
+        self.done: set[str] = set()
+        self.resumed = False
+        self._file: Optional[TextIO] = None
+
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as file:
+                lines = file.read().splitlines()
+
+            try:
+                self.resumed = bool(lines) and json.loads(lines[0]) == self.job
+            except json.JSONDecodeError:
+                self.resumed = False
+
+            if self.resumed:
+                self.done = set(lines[1:])
+                logging.info(
+                    'Resuming job of <%s> with %d committed blocks.',
+                    path, len(self.done))
+
+    def __enter__(self) -> 'Checkpoint':
+        if self.resumed:
+            self._file = open(self.path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')  # pylint: disable=consider-using-with
+            self._file.write(json.dumps(self.job) + '\n')
+            self._file.flush()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._file.close()
+        self._file = None
+
+    def is_done(self, key: str) -> bool:
+        """
+        Checks whether a block was committed.
+
+        Parameters
+        ----------
+        key: str
+            The key of the block.
+
+        Returns
+        -------
+        bool
+            True if the block was committed.
+        """
+        return key in self.done
+
+    def commit(self, key: str) -> None:
+        """
+        Records a block as committed.
+
+        Parameters
+        ----------
+        key: str
+            The key of the block.
+        """
+        self.done.add(key)
+        self._file.write(key + '\n')
+        self._file.flush()
+
+    def remove(self) -> None:
+        """Removes the journal file once the job is complete."""
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,342 @@
+"""Chunk layout module."""
+
+import itertools
+import logging
+import math
+import re
+from typing import Iterator, Optional
+
+import numpy as np
+
+DEFAULT_CHUNK_BYTES = 4 * 2 ** 20
+
+ACCESS_PATTERNS = ('row', 'column')
+
+SIZE_UNITS = {
+    'b': 1,
+    'kb': 10 ** 3,
+    'mb': 10 ** 6,
+    'gb': 10 ** 9,
+    'tb': 10 ** 12,
+    'kib': 2 ** 10,
+    'mib': 2 ** 20,
+    'gib': 2 ** 30,
+    'tib': 2 ** 40,
+}
+
+
+def parse_size(size: int | str) -> int:
+    """
+    Converts a memory size to a number of bytes.
+
+    Parameters
+    ----------
+    size: int | str
+        The size as a number of bytes or as a string with a unit
+        like '512MB' or '1 GiB'.
+
+    Returns
+    -------
+    int
+        The size in bytes.
+
+    Raises
+    ------
+    ValueError
+        If the size can not be parsed or is less than 1.
+    """
+    if isinstance(size, str):
+        match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*', size)
+        unit = match.group(2).lower() if match else None
+
+        if not match or (unit and unit not in SIZE_UNITS):
+            err_message = f'Unable to parse memory size <{size}>.'
+            logging.error(err_message)
+            raise ValueError(err_message)
+
+        size = int(float(match.group(1)) * SIZE_UNITS.get(unit, 1))
+
+    if size < 1:
+        err_message = 'Memory size must be greater than 0.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    return int(size)
+
+
+def plan_chunks(
+        shape: tuple[int, ...],
+        dtype: np.dtype | str,
+        target_bytes: int | str = DEFAULT_CHUNK_BYTES,
+        access: str = 'row') -> tuple[int, ...]:
+    """
+    Plans a chunk shape from a target chunk size in bytes.
+
+    Parameters
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array. Axes of length 0, like the first axis of
+        an array that grows by appending, are not used to clip the chunks.
+    dtype: np.dtype | str
+        The data type of the array.
+    target_bytes: int | str, DEFAULT_CHUNK_BYTES
+        The target chunk size, in bytes or as a string like '16MiB'.
+    access: str, 'row'
+        The expected access pattern. With 'row', chunks span whole rows,
+        for example all the coordinates of a point. With 'column', chunks
+        hold a single column, for example only the x coordinates.
+
+    Returns
+    -------
+    tuple[int, ...]
+        The chunk shape.
+
+    Raises
+    ------
+    ValueError
+        If the access pattern is not supported or the target size is
+        less than 1 byte.
+    """
+    if access not in ACCESS_PATTERNS:
+        err_message = f'Access pattern <{access}> is not supported. ' + \
+            f'Please use one of {list(ACCESS_PATTERNS)}.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    target_bytes = parse_size(target_bytes)
+    itemsize = np.dtype(dtype).itemsize
+
+    inner = tuple(shape[1:]) if access == 'row' else (1,) * (len(shape) - 1)
+    rows = max(1, target_bytes // (itemsize * math.prod(inner)))
+
+    if shape[0]:
+        rows = min(rows, shape[0])
+
+    return (rows,) + inner
+
+
+def normalize_chunks(
+        chunks: int | tuple[int, ...] | dict[int, int] | str,
+        shape: tuple[int, ...],
+        dtype: np.dtype | str) -> tuple[int, ...]:
+    """
+    Converts a chunk specification to a chunk shape.
+
+    Parameters
+    ----------
+    chunks: int | tuple[int, ...] | dict[int, int] | str
+        The number of rows per chunk, a chunk shape, a mapping from axis
+        to chunk size, 'auto' to plan chunks of DEFAULT_CHUNK_BYTES or a
+        target chunk size like '16MiB'. A chunk size of -1 spans the whole
+        axis, as do the axes left out of a chunk shape or mapping.
+    shape: tuple[int, ...]
+        The shape of the array.
+    dtype: np.dtype | str
+        The data type of the array.
+
+    Returns
+    -------
+    tuple[int, ...]
+        The chunk shape, with one item per axis.
+
+    Raises
+    ------
+    ValueError
+        If a chunk size is less than 1 and not -1, the specification has
+        axes the array does not have or the target chunk size can not be
+        parsed.
+    """
+    if isinstance(chunks, str):
+        target_bytes = DEFAULT_CHUNK_BYTES if chunks == 'auto' else chunks
+        return plan_chunks(shape, dtype, target_bytes)
+
+    if isinstance(chunks, int):
+        chunks = (chunks,)
+
+    if isinstance(chunks, dict):
+        axes = list(chunks)
+        chunks = tuple(chunks.get(axis, -1) for axis in range(len(shape)))
+    else:
+        axes = list(range(len(chunks)))
+
+    if any(not 0 <= axis < len(shape) for axis in axes):
+        err_message = f'Chunk specification has axes {axes} but the ' + \
+            f'array has {len(shape)} axes.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    if any(c < 1 and c != -1 for c in chunks):
+        err_message = 'Chunk size must be greater than 0.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    chunks = tuple(chunks) + (-1,) * (len(shape) - len(chunks))
+    return tuple(max(s, 1) if c == -1 else c for c, s in zip(chunks, shape))
+
+
+def chunks_label(chunks: tuple[int, ...], shape: tuple[int, ...]) -> str:
+    """
+    Names a chunk shape, for example in the name of a re-chunked file.
+
+    Parameters
+    ----------
+    chunks: tuple[int, ...]
+        The chunk shape.
+    shape: tuple[int, ...]
+        The shape of the array.
+
+    Returns
+    -------
+    str
+        The number of rows per chunk if the chunks span all the other axes,
+        otherwise the chunk sizes joined by 'x', like '1000000x1'.
+    """
+    if all(c >= s for c, s in zip(chunks[1:], shape[1:])):
+        return str(chunks[0])
+
+    return 'x'.join(str(c) for c in chunks)
+
+
+def block_shape(
+        shape: tuple[int, ...],
+        chunks: tuple[int, ...],
+        itemsize: int,
+        max_mem: Optional[int] = None,
+        source_chunks: Optional[tuple[int, ...]] = None) -> tuple[int, ...]:
+    """
+    Computes the shape of the blocks used to copy an array chunk by chunk.
+
+    Each block is made of whole target chunks, so writing a block never
+    touches a target chunk twice. Blocks grow axis by axis, starting with
+    the last one, as long as they fit in the memory budget. Where the
+    budget allows it, they are also aligned with the source chunks so
+    every source chunk is read only once.
+
+    Parameters
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array.
+    chunks: tuple[int, ...]
+        The target chunk shape.
+    itemsize: int
+        The size of one array item in bytes.
+    max_mem: Optional[int], None
+        The memory budget of one block in bytes. If not specified, the
+        block covers the whole array.
+    source_chunks: Optional[tuple[int, ...]], None
+        The source chunk shape.
+
+    Returns
+    -------
+    tuple[int, ...]
+        The block shape.
+
+    Raises
+    ------
+    ValueError
+        If a single target chunk does not fit in the memory budget.
+    """
+    if max_mem is None or 0 in shape:
+        return tuple(shape)
+
+    block = [min(c, s) for c, s in zip(chunks, shape)]
+
+    if math.prod(block) * itemsize > max_mem:
+        err_message = f'Memory budget <{max_mem}> bytes is smaller than ' + \
+            f'a single target chunk <{math.prod(block) * itemsize}> bytes.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    for axis in reversed(range(len(shape))):
+        other_bytes = math.prod(block) // block[axis] * itemsize
+        n_chunks = max(1, max_mem // (other_bytes * chunks[axis]))
+        extent = min(shape[axis], n_chunks * chunks[axis])
+
+        if source_chunks and extent < shape[axis]:
+            aligned = math.lcm(chunks[axis], source_chunks[axis])
+            if extent >= aligned:
+                extent = extent // aligned * aligned
+
+        block[axis] = extent
+
+        # Growing an outer axis only helps if this one spans the array.
+        if extent < shape[axis]:
+            break
+
+    return tuple(block)
+
+
+def common_chunks(
+        shape: tuple[int, ...],
+        all_chunks: list[tuple[int, ...]],
+        itemsize: int,
+        max_mem: Optional[int] = None) -> tuple[int, ...]:
+    """
+    Computes the smallest block made of whole chunks of several layouts.
+
+    Along each axis, the block spans the least common multiple of the chunk
+    sizes, up to the whole axis. Chunk sizes that are not multiples of each
+    other, like 333, 1000 and 7, quickly reach the whole axis.
+
+    Parameters
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array.
+    all_chunks: list[tuple[int, ...]]
+        The chunk shape of each layout.
+    itemsize: int
+        The size of one array item in bytes.
+    max_mem: Optional[int], None
+        The memory budget of one block in bytes.
+
+    Returns
+    -------
+    tuple[int, ...]
+        The block shape.
+
+    Raises
+    ------
+    ValueError
+        If the block does not fit in the memory budget.
+    """
+    common = tuple(
+        min(n, math.lcm(*sizes)) for n, sizes in zip(shape, zip(*all_chunks)))
+
+    nbytes = math.prod(common) * itemsize
+    if max_mem is not None and nbytes > max_mem:
+        err_message = f'Chunk layouts {all_chunks} only share whole chunks ' + \
+            f'in blocks of {common} that take <{nbytes}> bytes, more than the ' + \
+            f'memory budget <{max_mem}> bytes. Please use chunk sizes that are ' + \
+            'multiples of each other or re-chunk the layouts separately.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    return common
+
+
+def iter_blocks(
+        shape: tuple[int, ...],
+        block: tuple[int, ...]) -> Iterator[tuple[slice, ...]]:
+    """
+    Iterates over the regions of an array split in blocks.
+
+    Parameters
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array.
+    block: tuple[int, ...]
+        The block shape.
+
+    Yields
+    ------
+    tuple[slice, ...]
+        The selection of each block, in C order.
+    """
+    if 0 in shape:
+        return
+
+    ranges = [range(0, s, b) for s, b in zip(shape, block)]
+    for starts in itertools.product(*ranges):
+        yield tuple(
+            slice(start, min(start + b, s))
+            for start, b, s in zip(starts, block, shape))
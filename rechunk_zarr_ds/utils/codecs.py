@@ -0,0 +1,195 @@
+"""Codecs module."""
+
+import logging
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+from numcodecs import LZ4, Blosc, Delta, Shuffle, Zlib, Zstd
+from numcodecs.abc import Codec
+
+COMPRESSORS = {
+    'default': 'default',
+    'none': None,
+    'blosc-lz4': Blosc(cname='lz4', clevel=5, shuffle=Blosc.SHUFFLE),
+    'blosc-lz4-bitshuffle': Blosc(cname='lz4', clevel=5, shuffle=Blosc.BITSHUFFLE),
+    'blosc-zstd': Blosc(cname='zstd', clevel=5, shuffle=Blosc.SHUFFLE),
+    'blosc-zstd-bitshuffle': Blosc(cname='zstd', clevel=5, shuffle=Blosc.BITSHUFFLE),
+    'zstd': Zstd(level=5),
+    'lz4': LZ4(),
+    'zlib': Zlib(level=5),
+}
+
+FILTERS = ('delta', 'shuffle')
+
+
+def get_compressor(compressor: Optional[str | Codec] = 'default') -> Optional[str | Codec]:
+    """
+    Gets a compressor from its name.
+
+    Parameters
+    ----------
+    compressor: Optional[str | Codec], 'default'
+        The name of the compressor in COMPRESSORS, a numcodecs codec or
+        None for no compression. 'default' keeps the zarr default, Blosc
+        with lz4 and byte shuffle.
+
+    Returns
+    -------
+    Optional[str | Codec]
+        The compressor to pass to `zarr.create`.
+
+    Raises
+    ------
+    ValueError
+        If the compressor name is not supported.
+    """
+    if not isinstance(compressor, str):
+        return compressor
+
+    if compressor not in COMPRESSORS:
+        err_message = f'Compressor <{compressor}> is not supported. ' + \
+            f'Please use one of {list(COMPRESSORS)}.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    return COMPRESSORS[compressor]
+
+
+def get_filters(
+        filters: Optional[Iterable[str | Codec]],
+        dtype: np.dtype | str) -> Optional[list[Codec]]:
+    """
+    Gets filters from their names.
+
+    'delta' stores the difference between consecutive values, computed on
+    their bits viewed as integers, so it is lossless for float coordinates
+    too. It suits sorted coordinates in column chunks, like `(n, 1)`.
+    'shuffle' groups the bytes of the values by significance.
+
+    Parameters
+    ----------
+    filters: Optional[Iterable[str | Codec]]
+        The names of the filters in FILTERS or numcodecs codecs, applied in
+        order, or None for no filters.
+    dtype: np.dtype | str
+        The data type of the array.
+
+    Returns
+    -------
+    Optional[list[Codec]]
+        The filters to pass to `zarr.create`.
+
+    Raises
+    ------
+    ValueError
+        If a filter name is not supported.
+    """
+    if not filters:
+        return None
+
+    dtype = np.dtype(dtype)
+    codecs = []
+
+    for codec in filters:
+        if not isinstance(codec, str):
+            codecs.append(codec)
+        elif codec == 'delta':
+            codecs.append(Delta(dtype=f'<i{dtype.itemsize}'))
+        elif codec == 'shuffle':
+            codecs.append(Shuffle(elementsize=dtype.itemsize))
+        else:
+            err_message = f'Filter <{codec}> is not supported. ' + \
+                f'Please use one of {list(FILTERS)}.'
+            logging.error(err_message)
+            raise ValueError(err_message)
+
+    return codecs
+
+
+def benchmark_codecs(
+        data: np.ndarray,
+        compressors: Optional[Iterable[str]] = None,
+        filters: Optional[Iterable[Optional[tuple[str, ...]]]] = None,
+        repeat: int = 3) -> list[dict]:
+    """
+    Measures the compression ratio and throughput of codec combinations.
+
+    Parameters
+    ----------
+    data: np.ndarray
+        A sample of the data, for example one or a few chunks.
+    compressors: Optional[Iterable[str]], None
+        The names of the compressors to try. Defaults to all COMPRESSORS.
+    filters: Optional[Iterable[Optional[tuple[str, ...]]]], None
+        The filter chains to try. Defaults to no filters, 'delta' and
+        'shuffle'.
+    repeat: int, 3
+        The number of timings, of which the best is kept.
+
+    Returns
+    -------
+    list[dict]
+        One record per combination with the compressor and filter names,
+        the compression ratio and the encode and decode throughput in MB/s,
+        sorted by decreasing compression ratio.
+    """
+    data = np.ascontiguousarray(data)
+    compressors = list(compressors or COMPRESSORS)
+    filters = list(filters or [(), ('delta',), ('shuffle',)])
+
+    results = []
+    for compressor_name in compressors:
+        compressor = get_compressor(compressor_name)
+        if isinstance(compressor, str):
+            compressor = Blosc()
+
+        for filter_names in filters:
+            codecs = (get_filters(filter_names, data.dtype) or []) + \
+                ([compressor] if compressor else [])
+
+            encode_time, encoded = _best_time(
+                lambda codecs=codecs: _encode(codecs, data), repeat)
+            decode_time, decoded = _best_time(
+                lambda codecs=codecs, encoded=encoded: _decode(codecs, encoded), repeat)
+            if decoded != data.tobytes():
+                err_message = f'Codecs <{compressor_name}> and <{filter_names}> ' + \
+                    'do not round-trip the data.'
+                logging.error(err_message)
+                raise RuntimeError(err_message)
+
+            results.append({
+                'compressor': compressor_name,
+                'filters': '+'.join(filter_names or ()) or 'none',
+                'ratio': data.nbytes / len(encoded),
+                'encode_mb_s': data.nbytes / 1e6 / encode_time,
+                'decode_mb_s': data.nbytes / 1e6 / decode_time,
+            })
+
+    return sorted(results, key=lambda result: -result['ratio'])
+
+
+def _encode(codecs: list[Codec], data: np.ndarray) -> bytes:
+    """Encodes data through a codec pipeline."""
+    buffer = data
+    for codec in codecs:
+        buffer = codec.encode(buffer)
+    return bytes(buffer)
+
+
+def _decode(codecs: list[Codec], buffer: bytes) -> bytes:
+    """Decodes data through a codec pipeline."""
+    for codec in reversed(codecs):
+        buffer = codec.decode(buffer)
+    return bytes(buffer)
+
+
+def _best_time(function, repeat: int) -> tuple[float, object]:
+    """Returns the best run time of a function and its result."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return max(best, 1e-9), result
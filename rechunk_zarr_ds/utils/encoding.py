@@ -0,0 +1,338 @@
+"""Coordinate encoding module."""
+
+import logging
+import math
+from typing import Iterable, Optional
+
+import numpy as np
+import zarr
+from numcodecs import AsType, FixedScaleOffset
+from numcodecs.abc import Codec
+
+from rechunk_zarr_ds.utils.codecs import get_filters
+from rechunk_zarr_ds.utils.spatial import BBOX_INDEX_KEY
+
+ENCODINGS = ('float64', 'float32', 'int32')
+
+MAX_ERROR = 1e-6
+
+RANGE_BLOCK_ROWS = 2 ** 20
+
+
+def get_encoding(
+        encoding: str,
+        dtype: np.dtype | str = 'float64',
+        max_error: Optional[float] = None) -> list[Codec]:
+    """
+    Gets the filters storing coordinates with a reduced precision.
+
+    'float64' stores the coordinates as they are. 'float32' rounds them to
+    single precision, which halves their size and keeps about 7 significant
+    digits. 'int32' stores them as fixed-point integers with a
+    `numcodecs.FixedScaleOffset` filter, with a scale of the power of ten
+    that keeps the rounding error within `max_error`. Both are decoded to
+    the data type of the array on read, so readers do not notice them.
+
+    Parameters
+    ----------
+    encoding: str
+        The encoding in ENCODINGS.
+    dtype: np.dtype | str, 'float64'
+        The data type of the array, which reads return.
+    max_error: Optional[float], None
+        The maximum absolute error of the coordinates, in their unit. It
+        sets the scale of 'int32', MAX_ERROR by default, about 0.1 m in
+        degrees. 'float32' is not checked against it unless it is given,
+        see `check_encoding`.
+
+    Returns
+    -------
+    list[Codec]
+        The filters, the first of the filter chain of the array. The offset
+        of 'int32' is 0 until it is centred on the data with `center_encoding`.
+
+    Raises
+    ------
+    ValueError
+        If the encoding is not supported or the maximum error is not positive.
+    """
+    if encoding not in ENCODINGS:
+        err_message = f'Encoding <{encoding}> is not supported. ' + \
+            f'Please use one of {list(ENCODINGS)}.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    if max_error is not None and not max_error > 0:
+        err_message = f'Maximum error <{max_error}> must be positive.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    dtype = np.dtype(dtype).str
+    if encoding == 'float32':
+        return [AsType(encode_dtype='<f4', decode_dtype=dtype)]
+    if encoding == 'int32':
+        # Rounding to the nearest step errs by half a step at most
+        scale = 10.0 ** math.ceil(math.log10(0.5 / (max_error or MAX_ERROR)))
+        return [FixedScaleOffset(offset=0, scale=scale, dtype=dtype, astype='<i4')]
+    return []
+
+
+def combine_filters(
+        encoding: list[Codec],
+        filters: Optional[Iterable[str | Codec]],
+        dtype: np.dtype | str) -> Optional[list[Codec]]:
+    """
+    Chains the filters of an encoding with filters by name.
+
+    Parameters
+    ----------
+    encoding: list[Codec]
+        The filters of the encoding, see `get_encoding`.
+    filters: Optional[Iterable[str | Codec]]
+        The names of the filters or numcodecs codecs applied after the
+        encoding, see `rechunk_zarr_ds.utils.codecs.get_filters`. They apply
+        to the encoded values, so 'delta' works on fixed-point integers.
+    dtype: np.dtype | str
+        The data type of the array.
+
+    Returns
+    -------
+    Optional[list[Codec]]
+        The filters to pass to `zarr.create`, None if there are none.
+    """
+    for codec in encoding:
+        dtype = codec.encode_dtype if isinstance(codec, AsType) else codec.astype
+    return (encoding + (get_filters(filters, dtype) or [])) or None
+
+
+def re_chunk_filters(
+        source: zarr.Array,
+        filters: Optional[Iterable[str | Codec]],
+        encoding: Optional[str] = None,
+        max_error: Optional[float] = None) -> Optional[list[Codec]]:
+    """
+    Gets the filters of a re-chunked copy of an array.
+
+    Parameters
+    ----------
+    source: zarr.Array
+        The source array.
+    filters: Optional[Iterable[str | Codec]]
+        The filters applied after the encoding, see `combine_filters`.
+    encoding: Optional[str], None
+        The encoding of the copy, see `get_encoding`. By default, the
+        encoding of the source is kept. Otherwise, the range of the source
+        is read, from its bounding-box index if it has one, to centre
+        'int32' and check the error.
+    max_error: Optional[float], None
+        The maximum absolute error of the encoded values.
+
+    Returns
+    -------
+    Optional[list[Codec]]
+        The filters to pass to `zarr.create`.
+
+    Raises
+    ------
+    ValueError
+        If the encoding is not supported or the values can not be encoded
+        within the maximum error.
+    """
+    if encoding is None:
+        return combine_filters(encoding_filters(source.filters), filters, source.dtype)
+
+    codecs = get_encoding(encoding, source.dtype, max_error)
+    if codecs:
+        index = source.attrs.get(BBOX_INDEX_KEY)
+        if index and index['bboxes']:
+            bboxes = np.asarray(index['bboxes'], dtype=np.float64)
+            low, high = float(np.nanmin(bboxes[:, :2])), float(np.nanmax(bboxes[:, 2:]))
+        else:
+            low, high = coordinate_range(source)
+        codecs = center_encoding(codecs, low, high)
+        check_encoding(codecs, low, high, max_error)
+    return combine_filters(codecs, filters, source.dtype)
+
+
+def encoding_filters(filters: Optional[Iterable[Codec]]) -> list[Codec]:
+    """
+    Gets the encoding filters of a filter chain, to store a copy with the same encoding.
+
+    Parameters
+    ----------
+    filters: Optional[Iterable[Codec]]
+        The filters of a zarr array.
+
+    Returns
+    -------
+    list[Codec]
+        The 'float32' and 'int32' filters, see `get_encoding`.
+    """
+    return [codec for codec in filters or [] if isinstance(codec, (AsType, FixedScaleOffset))]
+
+
+def center_encoding(encoding: list[Codec], low: float, high: float) -> list[Codec]:
+    """
+    Centres the offset of fixed-point filters on a range of coordinates.
+
+    The range of int32 then spans the widest area around the data.
+
+    Parameters
+    ----------
+    encoding: list[Codec]
+        The filters of the encoding, see `get_encoding`.
+    low: float
+        The smallest coordinate.
+    high: float
+        The largest coordinate.
+
+    Returns
+    -------
+    list[Codec]
+        The filters, with the offset rounded to an integer.
+    """
+    offset = round((low + high) / 2) if math.isfinite(low + high) else 0
+    return [
+        FixedScaleOffset(
+            offset=offset, scale=codec.scale, dtype=codec.dtype, astype=codec.astype)
+        if isinstance(codec, FixedScaleOffset) else codec
+        for codec in encoding]
+
+
+def encoding_error(filters: Optional[Iterable[Codec]], low: float, high: float) -> float:
+    """
+    Bounds the error of storing coordinates of a range with encoding filters.
+
+    Parameters
+    ----------
+    filters: Optional[Iterable[Codec]]
+        The filters of a zarr array.
+    low: float
+        The smallest coordinate.
+    high: float
+        The largest coordinate.
+
+    Returns
+    -------
+    float
+        The maximum absolute error: half a step for fixed-point integers and
+        half a unit in the last place of the largest coordinate for 'float32'.
+        It is infinite if the coordinates overflow the integers.
+    """
+    error = 0.0
+    for codec in encoding_filters(filters):
+        if isinstance(codec, AsType):
+            # Half the spacing of the floats near 1, relative to the largest value
+            error += max(abs(low), abs(high)) * \
+                float(np.spacing(np.array(1, dtype=codec.encode_dtype))) / 2
+            continue
+
+        limits = np.iinfo(codec.astype)
+        steps = np.round((np.array([low, high]) - codec.offset) * codec.scale)
+        if steps.min() < limits.min or steps.max() > limits.max:
+            return math.inf
+        error += 0.5 / codec.scale
+
+    return error
+
+
+def check_encoding(
+        filters: Optional[Iterable[Codec]],
+        low: float,
+        high: float,
+        max_error: Optional[float] = None) -> None:
+    """
+    Checks that coordinates of a range can be stored with encoding filters.
+
+    Parameters
+    ----------
+    filters: Optional[Iterable[Codec]]
+        The filters of a zarr array.
+    low: float
+        The smallest coordinate.
+    high: float
+        The largest coordinate.
+    max_error: Optional[float], None
+        The maximum absolute error. By default, only fixed-point integers are
+        checked not to overflow.
+
+    Raises
+    ------
+    ValueError
+        If the error bound, see `encoding_error`, is larger than the maximum
+        error or the coordinates overflow fixed-point integers.
+    """
+    if not math.isfinite(low + high):
+        return
+
+    error = encoding_error(filters, low, high)
+    # Leave room for the rounding of float64 itself
+    if math.isinf(error) or max_error is not None and \
+            error > max_error + 4 * np.spacing(max(abs(low), abs(high))):
+        err_message = f'Coordinates between <{low}> and <{high}> can not be stored ' + \
+            ('in the range of the encoding' if max_error is None
+             else f'within a maximum error of <{max_error}>') + \
+            '. Please increase the maximum error or use another encoding.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+
+def decoded_values(filters: Optional[Iterable[Codec]], data: np.ndarray) -> np.ndarray:
+    """
+    Gets the values an array with encoding filters returns for data written to it.
+
+    The encodings round each value on its own and never swap two values, so
+    the decoded bounding boxes of chunks, see
+    `rechunk_zarr_ds.utils.spatial.chunk_bboxes`, are their boxes decoded.
+
+    Parameters
+    ----------
+    filters: Optional[Iterable[Codec]]
+        The filters of a zarr array.
+    data: np.ndarray
+        The values written.
+
+    Returns
+    -------
+    np.ndarray
+        The values read back, not a number where the data are not a number.
+    """
+    codecs = encoding_filters(filters)
+    if not codecs:
+        return data
+
+    # Missing values, like the boxes of empty chunks, can not be encoded as integers
+    decoded = np.nan_to_num(data)
+    for codec in codecs:
+        decoded = codec.decode(codec.encode(decoded)).reshape(data.shape)
+    return np.where(np.isnan(data), data, decoded)
+
+
+def coordinate_range(data: np.ndarray | zarr.Array) -> tuple[float, float]:
+    """
+    Gets the smallest and largest coordinates of an array.
+
+    Parameters
+    ----------
+    data: np.ndarray | zarr.Array
+        The array. Zarr arrays are read in blocks of whole chunks.
+
+    Returns
+    -------
+    tuple[float, float]
+        The smallest and largest values, not a number for an empty array.
+    """
+    if isinstance(data, np.ndarray) or data.ndim == 0:
+        data = np.asarray(data[...], dtype=np.float64)
+        if data.size == 0:
+            return math.nan, math.nan
+        return float(np.nanmin(data)), float(np.nanmax(data))
+
+    # Blocks of whole chunks of about RANGE_BLOCK_ROWS rows
+    rows = data.chunks[0] * max(1, RANGE_BLOCK_ROWS // data.chunks[0])
+    ranges = np.array([
+        coordinate_range(data[start:start + rows])
+        for start in range(0, data.shape[0], rows)]).reshape(-1, 2)
+    if np.isnan(ranges).all():
+        return math.nan, math.nan
+    return float(np.nanmin(ranges[:, 0])), float(np.nanmax(ranges[:, 1]))
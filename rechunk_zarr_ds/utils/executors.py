@@ -0,0 +1,82 @@
+"""Executors module."""
+
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+EXECUTORS = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor,
+    # The asyncio pipeline runs its decode and encode stage in threads.
+    'async': ThreadPoolExecutor,
+}
+
+
+def resolve_workers(
+        executor: Optional[str] = None,
+        workers: Optional[int] = None) -> tuple[Optional[str], int]:
+    """
+    Validates the executor type and the number of workers.
+
+    Parameters
+    ----------
+    executor: Optional[str], None
+        The executor type, either 'thread', 'process' or 'async'. If not
+        specified and more than one worker is requested, threads are used.
+    workers: Optional[int], None
+        The number of workers. If not specified and an executor is
+        requested, it is the number of CPUs.
+
+    Returns
+    -------
+    tuple[Optional[str], int]
+        The executor type, or None to run serially, and the number of workers.
+
+    Raises
+    ------
+    ValueError
+        If the executor type is not supported or the number of workers
+        is less than 1.
+    """
+    if executor is not None and executor not in EXECUTORS:
+        err_message = f'Executor <{executor}> is not supported. ' + \
+            f'Please use one of {list(EXECUTORS)}.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    if workers is not None and workers < 1:
+        err_message = 'Number of workers must be greater than 0.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if executor else 1
+
+    if executor is None and workers > 1:
+        executor = 'thread'
+
+    return executor, workers
+
+
+def get_executor(executor: str, workers: int) -> Executor:
+    """
+    Creates a pool executor.
+
+    Threads suit the Blosc codecs, which release the GIL while compressing.
+    Processes suit pure-Python or filter-heavy codec pipelines. For 'async',
+    it is the pool of the decode and encode stage.
+
+    Parameters
+    ----------
+    executor: str
+        The executor type, either 'thread', 'process' or 'async'.
+    workers: int
+        The number of workers.
+
+    Returns
+    -------
+    concurrent.futures.Executor
+        The pool executor.
+    """
+    return EXECUTORS[executor](max_workers=workers)
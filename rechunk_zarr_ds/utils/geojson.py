@@ -0,0 +1,232 @@
+"""GeoJSON module."""
+
+import json
+import logging
+from typing import Any, Iterable, Iterator
+
+import geopandas as gp
+import numpy as np
+
+READ_SIZE = 2 ** 16
+BLOCK_SIZE = 2 ** 16
+
+
+def points_to_array(geometry: gp.GeoSeries) -> np.ndarray:
+    """
+    Extracts the coordinates of point geometries.
+
+    The coordinates are read in a single vectorized pass over the geometry
+    column, without building a Python object per feature.
+
+    Parameters
+    ----------
+    geometry: gp.GeoSeries
+        The point geometries.
+
+    Returns
+    -------
+    np.ndarray
+        The (N, 2) float64 array of x and y coordinates.
+    """
+    return geometry.get_coordinates().to_numpy(dtype=np.float64)
+
+
+def iter_features(source_path: str, read_size: int = READ_SIZE) -> Iterator[dict]:
+    """
+    Iterates over the features of a GeoJSON FeatureCollection.
+
+    The file is read and parsed incrementally, so only one feature and a
+    read buffer are held in memory at a time.
+
+    Parameters
+    ----------
+    source_path: str
+        The path to the GeoJSON file.
+    read_size: int, READ_SIZE
+        The number of characters read from the file at a time.
+
+    Yields
+    ------
+    dict
+        The features, in file order.
+
+    Raises
+    ------
+    IOError
+        If the file is not a valid GeoJSON FeatureCollection.
+    """
+    with open(source_path, encoding='utf-8') as file:
+        stream = _JsonStream(file, read_size)
+        try:
+            stream.expect('{')
+            while stream.peek() != '}':
+                key = stream.decode()
+                stream.expect(':')
+
+                if key == 'features':
+                    yield from _iter_array(stream)
+                    return
+
+                stream.decode()
+                if stream.peek() == ',':
+                    stream.expect(',')
+
+        except (json.JSONDecodeError, _JsonStreamError) as e:
+            err_message = f'Failed to read source file. {str(e)}'
+            logging.error(err_message)
+            raise IOError(err_message) from e
+
+    err_message = 'Failed to read source file. No "features" array found.'
+    logging.error(err_message)
+    raise IOError(err_message)
+
+
+def iter_point_blocks(
+        features: Iterable[dict],
+        block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Groups the coordinates of point features in fixed-size blocks.
+
+    Features without a geometry, or with an empty one, are skipped with a
+    warning, like when the whole file is read with GeoPandas.
+
+    Parameters
+    ----------
+    features: Iterable[dict]
+        The GeoJSON features.
+    block_size: int, BLOCK_SIZE
+        The number of points per block.
+
+    Yields
+    ------
+    np.ndarray
+        The (block_size, 2) float64 blocks of x and y coordinates. The
+        last block may be shorter.
+
+    Raises
+    ------
+    ValueError
+        If a feature has no point geometry.
+    """
+    block = np.empty((block_size, 2), dtype=np.float64)
+    size = 0
+    geom_type = None
+    skipped = 0
+
+    for feature in features:
+        geometry = feature.get('geometry')
+        if not geometry or not geometry.get('coordinates'):
+            skipped += 1
+            continue
+
+        if geometry['type'] != geom_type:
+            _check_geom_type(geometry['type'], geom_type)
+            geom_type = geometry['type']
+
+        block[size] = geometry['coordinates'][:2]
+        size += 1
+
+        if size == block_size:
+            yield block
+            block = np.empty((block_size, 2), dtype=np.float64)
+            size = 0
+
+    if skipped:
+        logging.warning('Skipped %d features without geometry.', skipped)
+    if size:
+        yield block[:size]
+
+
+def _check_geom_type(geom_type: str, previous_geom_type: str | None) -> None:
+    """Checks that all the geometries are points."""
+    if previous_geom_type is not None:
+        err_message = "Multiple geometry types found in file. " + \
+            "Pleas use <Point> geometry."
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    if geom_type != 'Point':
+        err_message = "Pleas use <Point> geometry. " + \
+            f'Geometry of type <{geom_type}> is not supported.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+
+def _iter_array(stream: '_JsonStream') -> Iterator[Any]:
+    """Iterates over the items of the JSON array at the stream position."""
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+
+    while True:
+        yield stream.decode()
+        if stream.peek() == ']':
+            return
+        stream.expect(',')
+
+
+class _JsonStreamError(ValueError):
+    """Error raised when the JSON stream does not have the expected structure."""
+
+
+class _JsonStream:
+    """Buffered reader decoding JSON values one at a time."""
+
+    def __init__(self, file, read_size: int):
+        self._file = file
+        self._read_size = read_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _read(self) -> bool:
+        """Reads more characters into the buffer, returns False at the end of file."""
+        if self._eof:
+            return False
+
+        data = self._file.read(self._read_size)
+        if not data:
+            self._eof = True
+            return False
+
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+
+            if not self._read():
+                raise _JsonStreamError('Unexpected end of file.')
+
+    def expect(self, char: str) -> None:
+        """Consumes the next non-whitespace character, which must be `char`."""
+        if self.peek() != char:
+            raise _JsonStreamError(
+                f'Expected <{char}> at character {self._pos} of the read buffer.')
+        self._pos += 1
+
+    def decode(self) -> Any:
+        """Decodes the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._read():
+                    continue
+                raise
+
+            # A number at the end of the buffer may continue in the file.
+            if end == len(self._buffer) and self._read():
+                continue
+
+            self._pos = end
+            return value
@@ -1,40 +1,154 @@
 """Main module."""
 
+import hashlib
 import logging
 import os
 import pathlib
+import shutil
+import tempfile
+import zipfile
+from typing import Optional
 
 import geopandas as gp
 import numpy as np
+import pandas as pd
 import zarr
+from numcodecs.abc import Codec
 
+from rechunk_zarr_ds.utils.chunks import normalize_chunks
+from rechunk_zarr_ds.utils.codecs import get_compressor
+from rechunk_zarr_ds.utils.encoding import (
+    center_encoding, check_encoding, combine_filters, coordinate_range, decoded_values,
+    get_encoding)
+from rechunk_zarr_ds.utils.geojson import (
+    BLOCK_SIZE, iter_features, iter_point_blocks, points_to_array)
+from rechunk_zarr_ds.utils.metrics import Metrics
+from rechunk_zarr_ds.utils.properties import select_properties, write_properties
+from rechunk_zarr_ds.utils.spatial import (
+    BBOX_INDEX_KEY, bbox_index, check_curve, chunk_bboxes, sort_order,
+    sort_points, update_bbox_index)
+from rechunk_zarr_ds.utils.stores import (
+    COORDINATES_KEY, ZIP_SUFFIX, check_store_format, close_store, close_zarr_array,
+    create_store, is_zip_store, open_zarr_array, pack_store)
 
-def create_zarr_file(
+MANIFEST_KEY = 'ingested'
+
+
+def create_zarr_file(  # pylint: disable=too-many-arguments,too-many-locals
         source_path: str,
-        output_dir: str = None) -> str:
+        output_dir: str = None,
+        streaming: bool = False,
+        block_size: int = BLOCK_SIZE,
+        chunks: int | tuple[int, ...] | str = (1,),
+        *,
+        compressor: Optional[str | Codec] = 'default',
+        filters: Optional[list[str | Codec]] = None,
+        store_format: str = 'directory',
+        consolidated: bool = False,
+        append_to: Optional[str] = None,
+        sort: Optional[str] = None,
+        properties: bool | list[str] = False,
+        encoding: str = 'float64',
+        max_error: Optional[float] = None,
+        metrics: Optional[Metrics] = None) -> str:
     """
     Creates a zarr file from a source file.
 
+    Each source file written to a zarr file is recorded in an ingestion
+    manifest, stored in the MANIFEST_KEY attribute of the array with the
+    SHA-256 digest of the file and the rows it filled.
+
     Parameters:
     -----------
     source_path: str
         The path to the source file.
     output_dir: Optional[str], None
         The directory to save the zarr file in.
+    streaming: bool, False
+        If True, the features are parsed incrementally and their coordinates
+        are appended to the zarr file in blocks, without loading the source
+        file in a GeoDataFrame. The memory used does not depend on the size
+        of the source file.
+    block_size: int, BLOCK_SIZE
+        The number of points appended at a time in streaming mode, rounded
+        up to whole chunks so that no chunk is written twice.
+    chunks: int | tuple[int, ...] | str, (1,)
+        The points per chunk or the chunk shape. Use 'auto' to plan chunks
+        of about 4 MiB or a target chunk size like '16MiB'.
+    compressor: Optional[str | Codec], 'default'
+        The compressor, by name (see `rechunk_zarr_ds.utils.codecs.COMPRESSORS`)
+        or as a numcodecs codec. None disables compression.
+    filters: Optional[list[str | Codec]], None
+        The filters applied before compression, by name ('delta', 'shuffle')
+        or as numcodecs codecs.
+    store_format: str, 'directory'
+        The format of the zarr file: 'directory' for one file per chunk or
+        'zip' for all the chunks packed in a single '.zarr.zip' file.
+    consolidated: bool, False
+        If True, the metadata are consolidated in a single '.zmetadata' key.
+    append_to: Optional[str], None
+        The path to an existing zarr directory to append the points of the
+        source file to, instead of creating a new zarr file. The array is
+        resized and only the new points are written, starting with the last
+        partial chunk. If the source file is already in the ingestion
+        manifest, nothing is written. `output_dir`, `chunks`, `compressor`,
+        `filters`, `store_format`, `consolidated`, `sort`, `properties`,
+        `encoding` and `max_error` are not used, the points are stored with
+        the encoding of the array and the metadata are consolidated again
+        if they were. If the array has
+        a bounding-box index, it is updated and, without `streaming`, the
+        points of the batch are sorted along the curve of the index.
+    sort: Optional[str], None
+        The space-filling curve the points are sorted along before they are
+        written, 'hilbert' or 'zorder', so each chunk covers a small area.
+        The bounding box of each chunk is then stored in the BBOX_INDEX_KEY
+        attribute, for `rechunk_zarr_ds.utils.spatial.query_bbox` to read
+        only the chunks intersecting a query. Sorting needs all the points
+        in memory, so it can not be combined with `streaming`.
+    properties: bool | list[str], False
+        The feature properties to keep, True for all of them or a list of
+        names. The zarr file is then a group with the coordinates in its
+        COORDINATES_KEY array and one array per property, chunked along the
+        same rows, see `rechunk_zarr_ds.utils.properties.write_properties`.
+        Strings are stored as UTF-8 bytes, dictionary encoded or with a
+        fixed width, `rechunk_zarr_ds.utils.properties.read_properties`
+        decodes them.
+        Properties need all the features in memory, so they can not be
+        combined with `streaming`.
+    encoding: str, 'float64'
+        The encoding of the coordinates: 'float64', 'float32' for single
+        precision or 'int32' for fixed-point integers, which halve the size
+        of the coordinates and are decoded to float64 on read, see
+        `rechunk_zarr_ds.utils.encoding.get_encoding`. `filters` apply to
+        the encoded values. In streaming mode, the fixed-point offset is 0
+        instead of the centre of the coordinates.
+    max_error: Optional[float], None
+        The maximum absolute error of the encoded coordinates, in their
+        unit. It sets the step of 'int32', about 0.1 m in degrees by
+        default, and checks the rounding of 'float32' when given.
+    metrics: Optional[Metrics], None
+        The instrumentation of the run, with the time spent parsing the
+        source file, extracting the coordinates and writing them, see
+        `rechunk_zarr_ds.utils.metrics.Metrics`.
 
     Returns:
     --------
     str
-        The path to the created zarr file.
+        The path to the created zarr file, or `append_to`.
 
     Raises:
     -------
     FileNotFoundError
         If the source file is not found.
     ValueError
-        If the source file format is not '.json' or if the output directory is not found.
+        If the source file format is not '.json', if the output directory is not found,
+        if the compressor, filters, store format, curve or encoding are not
+        supported, if sorting or properties are requested in streaming mode,
+        if a property is not found or if the coordinates can not be encoded
+        within the maximum error.
     FileNotFoundError
-        If the output file already exists.
+        If the output file already exists or the zarr file to append to
+        is not found.
     RuntimeError
         If there is no point geometry in the source file or if failed to read the source file.
     RuntimeError
@@ -42,50 +156,241 @@ def create_zarr_file(
     IOError
         If the source file is not a valid JSON file.
     """
-    if not os.path.isfile(source_path):
-        err_message = f'Source file <{source_path}> not found.'
-        logging.error(err_message)
-        raise FileNotFoundError(err_message)
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.run('create_zarr_file', source_path):
+        if not os.path.isfile(source_path):
+            err_message = f'Source file <{source_path}> not found.'
+            logging.error(err_message)
+            raise FileNotFoundError(err_message)
 
-    source_format = pathlib.Path(source_path).suffix
+        source_format = pathlib.Path(source_path).suffix
 
-    if not source_format:
-        err_message = 'Unable to specify the format of the source file. ' + \
-            'Please use ".json" format.'
-        logging.error(err_message)
-        raise ValueError(err_message)
+        if not source_format:
+            err_message = 'Unable to specify the format of the source file. ' + \
+                'Please use ".json" format.'
+            logging.error(err_message)
+            raise ValueError(err_message)
 
-    if source_format != '.json':
-        err_message = f'Format <{source_format}> is not supported. ' + \
-            'Please use ".json" format.'
-        logging.error(err_message)
-        raise ValueError(err_message)
+        if source_format != '.json':
+            err_message = f'Format <{source_format}> is not supported. ' + \
+                'Please use ".json" format.'
+            logging.error(err_message)
+            raise ValueError(err_message)
 
-    if not output_dir:
-        output_dir = os.path.dirname(source_path)
+        metrics.add(bytes_read=os.path.getsize(source_path))
 
-    elif not os.path.isdir(output_dir):
-        err_message = f'Output directory <{output_dir}> not found.'
-        logging.error(err_message)
-        raise FileNotFoundError(err_message)
+        if append_to:
+            return _append_zarr_file(
+                source_path, append_to, streaming, block_size, metrics=metrics)
 
-    output_path = os.path.join(
-        output_dir,
-        os.path.basename(source_path).replace('.json', '.zarr'))
+        if not output_dir:
+            output_dir = os.path.dirname(source_path)
 
-    if os.path.exists(output_path):
-        err_message = f'File <{output_path}> already exists.'
-        logging.error(err_message)
-        raise FileExistsError(err_message)
+        elif not os.path.isdir(output_dir):
+            err_message = f'Output directory <{output_dir}> not found.'
+            logging.error(err_message)
+            raise FileNotFoundError(err_message)
+
+        check_store_format(store_format)
+
+        if sort is not None:
+            check_curve(sort)
+
+        if streaming and (sort is not None or properties):
+            err_message = f'Option <{"sort" if sort is not None else "properties"}> ' + \
+                'is not supported in streaming mode.'
+            logging.error(err_message)
+            raise ValueError(err_message)
+
+        output_path = zarr_file_path(source_path, output_dir, store_format)
+
+        if os.path.exists(output_path):
+            err_message = f'File <{output_path}> already exists.'
+            logging.error(err_message)
+            raise FileExistsError(err_message)
+
+        array_kwargs = {
+            'compressor': get_compressor(compressor),
+            'filters': combine_filters(
+                get_encoding(encoding, 'float64', max_error), filters, 'float64'),
+        }
+
+        if streaming:
+            if store_format == 'directory':
+                _create_zarr_file_streaming(
+                    source_path, output_path, block_size, chunks, array_kwargs,
+                    max_error=max_error, metrics=metrics)
+                with metrics.stage('finalize'):
+                    close_store(zarr.DirectoryStore(output_path), consolidated)
+                return output_path
+
+            # Appending rewrites keys, which zip files do not support.
+            directory_path = tempfile.mkdtemp(prefix='.', suffix='.zarr', dir=output_dir)
+            _create_zarr_file_streaming(
+                source_path, directory_path, block_size, chunks, array_kwargs,
+                max_error=max_error, metrics=metrics)
+            with metrics.stage('finalize'):
+                pack_store(directory_path, output_path, consolidated)
+            return output_path
+
+        _create_zarr_file(
+            source_path, output_path, chunks, array_kwargs,
+            store_format=store_format, consolidated=consolidated, sort=sort,
+            properties=properties, max_error=max_error, metrics=metrics)
+        return output_path
+
+
+def zarr_file_path(
+        source_path: str,
+        output_dir: Optional[str] = None,
+        store_format: str = 'directory') -> str:
+    """
+    Builds the path of the zarr file created from a source file.
+
+    Parameters
+    ----------
+    source_path: str
+        The path to the source file.
+    output_dir: Optional[str], None
+        The directory of the zarr file, the directory of the source file by default.
+    store_format: str, 'directory'
+        The format of the zarr file, 'directory' or 'zip'.
+
+    Returns
+    -------
+    str
+        The path to the zarr file, see `create_zarr_file`.
+    """
+    return os.path.join(
+        output_dir or os.path.dirname(source_path),
+        os.path.basename(source_path).replace('.json', '.zarr') +
+        (ZIP_SUFFIX if store_format == 'zip' else ''))
+
+
+def is_ingested(source_path: str, zarr_path: str) -> bool:
+    """
+    Checks whether a source file was completely written to a zarr file.
+
+    A source file is recorded in the ingestion manifest once all its points
+    are written, so a zarr file left behind by an interrupted run does not
+    count.
+
+    Parameters
+    ----------
+    source_path: str
+        The path to the source file.
+    zarr_path: str
+        The path to the zarr file, a directory of chunks or a zip file.
+
+    Returns
+    -------
+    bool
+        True if the SHA-256 digest of the source file is in the manifest.
+    """
+    if not os.path.exists(zarr_path):
+        return False
+
+    try:
+        z = open_zarr_array(zarr_path)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # Zip files of an interrupted run can not be opened
+        return False
 
     try:
-        gdf = gp.read_file(source_path)
+        manifest = z.attrs.get(MANIFEST_KEY, [])
+    finally:
+        close_zarr_array(z)
+
+    digest = _file_digest(source_path)
+    return any(entry['sha256'] == digest for entry in manifest)
+
+
+def _create_zarr_file(  # pylint: disable=too-many-arguments,too-many-locals
+        source_path: str,
+        output_path: str,
+        chunks: int | tuple[int, ...] | str,
+        array_kwargs: dict,
+        *,
+        store_format: str,
+        consolidated: bool,
+        sort: Optional[str],
+        properties: bool | list[str],
+        max_error: Optional[float],
+        metrics: Metrics) -> None:
+    """Writes the point coordinates of the source file, read at once, to a new zarr file."""
+    gdf = _read_file(source_path, metrics)
+    with metrics.stage('extract'):
+        points_np = points_to_array(gdf.geometry)
+        frame = select_properties(
+            pd.DataFrame(gdf.drop(columns=gdf.geometry.name)), properties) \
+            if properties else None
+
+    if sort is not None:
+        with metrics.stage('sort'):
+            order = sort_order(points_np, sort)
+            points_np = points_np[order]
+            if frame is not None:
+                frame = frame.iloc[order]
+
+    # Fixed-point integers span the widest area around the points
+    low, high = coordinate_range(points_np)
+    array_kwargs = {**array_kwargs, 'filters': center_encoding(
+        array_kwargs['filters'] or [], low, high) or None}
+    check_encoding(array_kwargs['filters'], low, high, max_error)
+
+    # With properties, the coordinates are an array of a group
+    store = create_store(output_path, store_format)
+    z = zarr.create(
+        shape=points_np.shape,
+        dtype=points_np.dtype,
+        chunks=normalize_chunks(chunks, points_np.shape, points_np.dtype),
+        store=store,
+        path=COORDINATES_KEY if frame is not None else None,
+        **array_kwargs)
+
+    with metrics.stage('write'):
+        z[:] = points_np
+        nbytes = points_np.nbytes
+        if frame is not None:
+            nbytes += write_properties(z, frame, array_kwargs['compressor'])
+    metrics.commit_block(
+        points=len(points_np), bytes_written=nbytes, chunks_written=z.nchunks)
+
+    with metrics.stage('finalize'):
+        # Attributes are written at once, zip files can not overwrite keys. The
+        # boxes bound the stored values, which the encoding may have rounded.
+        _record_ingestion(z, source_path, 0, attrs={
+            BBOX_INDEX_KEY: bbox_index(
+                sort, z.chunks[0],
+                decoded_values(z.filters, chunk_bboxes(points_np, z.chunks[0])))
+        } if sort is not None else None)
+        close_store(store, consolidated)
+
+
+def _read_points(source_path: str, metrics: Metrics) -> np.ndarray:
+    """Reads the point coordinates of the source file with GeoPandas."""
+    gdf = _read_file(source_path, metrics)
+    with metrics.stage('extract'):
+        return points_to_array(gdf.geometry)
+
+
+def _read_file(source_path: str, metrics: Metrics) -> gp.GeoDataFrame:
+    """Reads the source file with GeoPandas and checks that its geometries are points."""
+    try:
+        with metrics.stage('parse'):
+            gdf = gp.read_file(source_path)
 
     except Exception as e:
         err_message = f'Failed to read source file. {str(e)}'
         logging.error(err_message)
         raise IOError(err_message) from e
 
+    # Like streaming reads, features without a geometry are skipped
+    missing = gdf.geometry.isna() | gdf.geometry.is_empty
+    if missing.any():
+        logging.warning('Skipped %d features without geometry.', missing.sum())
+        gdf = gdf[~missing].reset_index(drop=True)
+
     geom_type = gdf.geom_type.unique()
 
     if len(geom_type) == 0:
@@ -106,23 +411,150 @@ def create_zarr_file(
         logging.error(err_message)
         raise ValueError(err_message)
 
-    points_np = \
-        np.array(
-            [[row.geometry.x, row.geometry.y] for id, row in gdf.iterrows()])
+    return gdf
+
 
+def _create_zarr_file_streaming(  # pylint: disable=too-many-arguments
+        source_path: str,
+        output_path: str,
+        block_size: int,
+        chunks: int | tuple[int, ...] | str,
+        array_kwargs: dict,
+        *,
+        max_error: Optional[float],
+        metrics: Metrics) -> None:
+    """Appends the point coordinates of the source file to a growable zarr file."""
     z = zarr.create(
-        shape=points_np.shape,
-        dtype=points_np.dtype,
-        chunks=(1,),
-        store=output_path)
+        shape=(0, 2),
+        dtype='float64',
+        chunks=normalize_chunks(chunks, (0, 2), 'float64'),
+        store=output_path,
+        **array_kwargs)
+
+    try:
+        _append_points(
+            z, source_path, True, block_size, max_error=max_error, metrics=metrics)
+
+    except (IOError, ValueError):
+        # Do not leave a partial zarr file behind.
+        shutil.rmtree(output_path, ignore_errors=True)
+        raise
+
+    _record_ingestion(z, source_path, 0)
+
+
+def _append_zarr_file(
+        source_path: str,
+        append_to: str,
+        streaming: bool,
+        block_size: int,
+        *,
+        metrics: Metrics) -> str:
+    """Appends the point coordinates of the source file to an existing zarr file."""
+    if is_zip_store(append_to):
+        err_message = 'Appending to zarr zip files is not supported.'
+        logging.error(err_message)
+        raise ValueError(err_message)
 
-    z[:] = points_np
+    if not os.path.isdir(append_to):
+        err_message = f'Zarr file <{append_to}> not found.'
+        logging.error(err_message)
+        raise FileNotFoundError(err_message)
+
+    if zarr.storage.contains_group(zarr.DirectoryStore(append_to)):
+        err_message = 'Appending to zarr files with properties is not supported.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    z = zarr.open_array(append_to, mode='r+')
+    digest = _file_digest(source_path)
+
+    if any(entry['sha256'] == digest for entry in z.attrs.get(MANIFEST_KEY, [])):
+        logging.info('Source file <%s> already ingested in <%s>.', source_path, append_to)
+        return append_to
+
+    start = z.shape[0]
+    try:
+        _append_points(z, source_path, streaming, block_size, metrics=metrics)
+
+    except BaseException:
+        # Drop the points of a partial batch so that it can be run again.
+        z.resize((start,) + z.shape[1:])
+        raise
+
+    with metrics.stage('finalize'):
+        if BBOX_INDEX_KEY in z.attrs:
+            update_bbox_index(z, start)
+        _record_ingestion(z, source_path, start, digest)
+
+        if '.zmetadata' in z.store:
+            zarr.consolidate_metadata(z.store)
+
+    return append_to
+
+
+def _append_points(  # pylint: disable=too-many-arguments
+        z: zarr.Array,
+        source_path: str,
+        streaming: bool,
+        block_size: int,
+        *,
+        max_error: Optional[float] = None,
+        metrics: Metrics) -> None:
+    """Appends the point coordinates of the source file to a zarr array, checking their encoding."""
+    start = z.shape[0]
+
+    if not streaming:
+        points = _read_points(source_path, metrics)
+        curve = z.attrs.get(BBOX_INDEX_KEY, {}).get('curve')
+        if curve:
+            with metrics.stage('sort'):
+                points = sort_points(points, curve)
+        blocks = [points]
+    else:
+        # Whole chunks per block, partial chunks would be read and written again
+        block_size = -(-block_size // z.chunks[0]) * z.chunks[0]
+        # Points are extracted while parsing, each block is timed at once
+        blocks = metrics.iterate(
+            'parse', iter_point_blocks(iter_features(source_path), block_size))
+
+    chunk_rows = z.chunks[0]
+    for block in blocks:
+        check_encoding(z.filters, *coordinate_range(block), max_error)
+        first_chunk = z.shape[0] // chunk_rows
+        with metrics.stage('write'):
+            z.append(block)
+        metrics.commit_block(
+            points=len(block), bytes_written=block.nbytes,
+            chunks_written=-(-z.shape[0] // chunk_rows) - first_chunk)
+
+    if z.shape[0] == start:
+        err_message = 'There is no point geometry in the source file.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+
+def _record_ingestion(
+        z: zarr.Array,
+        source_path: str,
+        start: int,
+        digest: Optional[str] = None,
+        attrs: Optional[dict] = None) -> None:
+    """Records a source file and the rows it filled in the manifest, with other attributes."""
+    manifest = z.attrs.get(MANIFEST_KEY, [])
+    manifest.append({
+        'source': os.path.basename(source_path),
+        'sha256': digest or _file_digest(source_path),
+        'start': start,
+        'stop': z.shape[0],
+    })
+    z.attrs.update({MANIFEST_KEY: manifest, **(attrs or {})})
 
-    # print("Zarr Array Info (Saved to File):")
-    # print(type(z))
-    # print(z.info)
-    # print("\nData from Zarr array (Read from File):")
-    # for i in range(gdf.geometry.size):
-    #     print(f"Chunk {i+1}: {z[i]}")
 
-    return output_path
+def _file_digest(path: str) -> str:
+    """Computes the SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,340 @@
+"""Metrics module."""
+
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+COUNTERS = ('points', 'blocks', 'bytes_read', 'bytes_written', 'chunks_written')
+
+
+class Metrics:  # pylint: disable=too-many-instance-attributes
+    """
+    Instrumentation of an ingestion or re-chunk run.
+
+    Pass an instance as the `metrics` argument of `create_zarr_file`,
+    `re_chunk_zarr_file` or `re_chunk_zarr_file_multi` to time the stages of
+    the run and count what it processed. Stage timers are exclusive: the
+    time of a stage nested in another, like parsing inside geometry
+    extraction, is not counted twice. Stages run by several threads add up,
+    so their total may exceed the run time. Stages of process executors are
+    not timed, their blocks are counted in the 'copy' stage.
+
+    The stages are 'parse' and 'extract' for reading the source GeoJSON
+    file, 'sort' for ordering points along a space-filling curve, 'read'
+    and 'write' for zarr blocks, 'transcode' for decoding and encoding
+    chunks in the async pipeline, 'copy' for process executors,
+    'properties' for re-chunking property columns and 'finalize' for
+    metadata, indexes, packing and renaming. Streaming reads extract the
+    points while parsing and are timed per block, so both count in 'parse'.
+
+    Parameters
+    ----------
+    progress: Optional[Callable[[Metrics], None]], None
+        Called with the metrics after each block is written, for example
+        to report `fraction` or `mb_s`. It is called from the thread that
+        started the run.
+    export_path: Optional[str], None
+        The path of a JSON lines file to which the record of each run is
+        appended when it ends, see `to_dict`.
+
+    Attributes
+    ----------
+    function: Optional[str]
+        The name of the instrumented function.
+    source: Optional[str]
+        The source of the run.
+    stages: dict[str, float]
+        The time spent in each stage in seconds.
+    points: int
+        The number of points ingested or re-chunked.
+    blocks: int
+        The number of blocks written.
+    blocks_total: Optional[int]
+        The number of blocks of the run, if known in advance.
+    bytes_read: int
+        The uncompressed size of the data read.
+    bytes_written: int
+        The uncompressed size of the data written.
+    chunks_written: int
+        The number of chunks written.
+    seconds: Optional[float]
+        The duration of the run once it ended.
+    peak_rss_bytes: Optional[int]
+        The peak resident memory of the process once the run ended, where
+        the operating system reports it.
+    error: Optional[str]
+        The error the run failed with.
+    """
+
+    def __init__(
+            self,
+            progress: Optional[Callable[['Metrics'], None]] = None,
+            export_path: Optional[str] = None):
+        self.progress = progress
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self, function: Optional[str] = None, source: Optional[str] = None) -> None:
+        """
+        Clears the metrics for a new run.
+
+        Parameters
+        ----------
+        function: Optional[str], None
+            The name of the instrumented function.
+        source: Optional[str], None
+            The source of the run.
+        """
+        self.function = function
+        self.source = source
+        self.stages: dict[str, float] = {}
+        self.points = 0
+        self.blocks = 0
+        self.blocks_total: Optional[int] = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.chunks_written = 0
+        self.started: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self.peak_rss_bytes: Optional[int] = None
+        self.error: Optional[str] = None
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """The fraction of the blocks written, if their number is known."""
+        if not self.blocks_total:
+            return None
+        return self.blocks / self.blocks_total
+
+    @property
+    def mb_s(self) -> Optional[float]:
+        """The throughput of the data written in MB/s so far."""
+        if self.started is None:
+            return None
+        seconds = self.seconds or time.perf_counter() - self.started
+        return self.bytes_written / 1e6 / max(seconds, 1e-9)
+
+    @contextmanager
+    def run(self, function: str, source: Any) -> Iterator['Metrics']:
+        """
+        Measures a run, then logs and exports its record.
+
+        Parameters
+        ----------
+        function: str
+            The name of the instrumented function.
+        source: Any
+            The source of the run, converted to a string.
+
+        Yields
+        ------
+        Metrics
+            The metrics.
+        """
+        self.reset(function, str(source))
+        self.started = time.perf_counter()
+        try:
+            yield self
+        except BaseException as e:
+            self.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            self.seconds = time.perf_counter() - self.started
+            self.peak_rss_bytes = _peak_rss()
+            logging.info(
+                '%s of <%s> took %.3f s, %d points, %.1f MB/s, stages %s.',
+                self.function, self.source, self.seconds, self.points,
+                self.mb_s, {k: round(v, 3) for k, v in self.stages.items()})
+            if self.export_path:
+                with open(self.export_path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(self.to_dict()) + '\n')
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Times a stage, excluding the stages nested in it.
+
+        Parameters
+        ----------
+        name: str
+            The name of the stage.
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+
+    def timed(self, name: str, function: Callable, *args) -> Any:
+        """
+        Calls a function within a stage.
+
+        Parameters
+        ----------
+        name: str
+            The name of the stage.
+        function: Callable
+            The function.
+        *args
+            The arguments of the function.
+
+        Returns
+        -------
+        Any
+            The result of the function.
+        """
+        with self.stage(name):
+            return function(*args)
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Iterates within a stage, timing the production of each item.
+
+        Parameters
+        ----------
+        name: str
+            The name of the stage.
+        iterable: Iterable
+            The items, typically a generator doing the work of the stage.
+
+        Yields
+        ------
+        Any
+            The items.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add(self, **counters: int) -> None:
+        """
+        Increments counters, like `points=10`.
+
+        Parameters
+        ----------
+        **counters: int
+            The increments of the counters in COUNTERS.
+        """
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def commit_block(self, **counters: int) -> None:
+        """
+        Counts a written block and reports the progress.
+
+        Parameters
+        ----------
+        **counters: int
+            The other counters of the block, like `bytes_written`.
+        """
+        self.add(blocks=1, **counters)
+        if self.progress:
+            self.progress(self)
+
+    def wrap(self, array: Any) -> 'InstrumentedArray':
+        """
+        Wraps an array so that its reads and writes are timed and counted.
+
+        Parameters
+        ----------
+        array: Any
+            The zarr or numpy array.
+
+        Returns
+        -------
+        InstrumentedArray
+            The instrumented array.
+        """
+        return InstrumentedArray(array, self)
+
+    def to_dict(self) -> dict:
+        """
+        Exports the record of the run.
+
+        Returns
+        -------
+        dict
+            The JSON serializable record with the function, the source, the
+            duration, the throughput, the stages, the counters, the peak
+            memory and the error of the run.
+        """
+        return {
+            'function': self.function,
+            'source': self.source,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds': self.seconds,
+            'mb_s': self.mb_s,
+            'stages': dict(self.stages),
+            **{name: getattr(self, name) for name in COUNTERS},
+            'blocks_total': self.blocks_total,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'error': self.error,
+        }
+
+
+class InstrumentedArray:
+    """
+    Array whose reads and writes are timed in the 'read' and 'write' stages.
+
+    Parameters
+    ----------
+    array: Any
+        The zarr or numpy array.
+    metrics: Metrics
+        The metrics of the run.
+    """
+
+    def __init__(self, array: Any, metrics: Metrics):
+        self.array = array
+        self.metrics = metrics
+
+    def __getitem__(self, selection: Any) -> np.ndarray:
+        with self.metrics.stage('read'):
+            data = self.array[selection]
+        self.metrics.add(bytes_read=data.nbytes)
+        return data
+
+    def __setitem__(self, selection: Any, data: np.ndarray) -> None:
+        with self.metrics.stage('write'):
+            self.array[selection] = data
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ('array', 'metrics'):
+            raise AttributeError(name)
+        return getattr(self.array, name)
+
+
+def _peak_rss() -> Optional[int]:
+    """Gets the peak resident memory of the process in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -0,0 +1,227 @@
+"""Block copy and asynchronous re-chunk pipeline module."""
+
+import asyncio
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, MutableMapping, Optional
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.chunks import iter_blocks
+from rechunk_zarr_ds.utils.metrics import Metrics
+
+QUEUE_SIZE = 4
+
+
+def copy_block(
+        source: Any,
+        target: Any | list[Any],
+        selection: tuple[slice, ...]) -> None:
+    """
+    Copies a block of the source into the target, or into several targets.
+
+    The block is read at once and written to each target. Numpy and
+    memory-mapped targets are filled source chunk by source chunk instead,
+    so only one source chunk is held besides the targets.
+
+    Parameters
+    ----------
+    source: Any
+        The source array, a zarr array or a wrapper of one.
+    target: Any | list[Any]
+        The target array, or several target arrays.
+    selection: tuple[slice, ...]
+        The selection of the block.
+    """
+    targets = target if isinstance(target, list) else [target]
+    parts = [selection]
+    # Wrapped arrays keep the wrapped array in their `array` attribute
+    if all(isinstance(getattr(array, 'array', array), np.ndarray) for array in targets):
+        parts = [
+            tuple(slice(s.start + p.start, s.start + p.stop) for s, p in zip(selection, part))
+            for part in iter_blocks(tuple(s.stop - s.start for s in selection), source.chunks)]
+
+    for part in parts:
+        data = source[part]
+        for array in targets:
+            array[part] = data
+
+
+def pipeline_blocks(workers: int = 1, queue_size: int = QUEUE_SIZE) -> int:
+    """
+    Counts the blocks held in memory at once by `copy_blocks_async`.
+
+    Each task of the read, transcode and write stages holds one block and
+    each of the two queues between them holds up to `queue_size` blocks.
+
+    Parameters
+    ----------
+    workers: int, 1
+        The number of concurrent tasks of each stage.
+    queue_size: int, QUEUE_SIZE
+        The maximum number of blocks waiting between two stages.
+
+    Returns
+    -------
+    int
+        The maximum number of blocks in flight.
+    """
+    return 3 * workers + 2 * queue_size
+
+
+async def copy_blocks_async(  # pylint: disable=too-many-arguments,too-many-locals
+        source: zarr.Array,
+        target: zarr.Array | list[zarr.Array],
+        blocks: Iterable[tuple[str, tuple[slice, ...]]],
+        *,
+        workers: int = 1,
+        queue_size: int = QUEUE_SIZE,
+        on_commit: Optional[Callable[[str], None]] = None,
+        metrics: Optional[Metrics] = None) -> None:
+    """
+    Copies blocks of the source into the target with overlapping stages.
+
+    Reading the source chunks, decoding and encoding them, and writing the
+    target chunks run concurrently, so the latency of the stores overlaps
+    with the compression work. Reads and writes run in threads against the
+    zarr stores, whether local or remote. The stages are connected by
+    bounded queues, so a slow stage holds back the previous ones and at
+    most `queue_size` blocks wait between two stages. At most
+    `pipeline_blocks(workers, queue_size)` blocks are in flight at once.
+
+    Parameters
+    ----------
+    source: zarr.Array
+        The source array. Arrays that are not zarr arrays, like cached
+        arrays, are read decoded by the read stage.
+    target: zarr.Array | list[zarr.Array]
+        The target array, or several target arrays written from the same
+        read of the source. Each block must cover whole target chunks.
+    blocks: Iterable[tuple[str, tuple[slice, ...]]]
+        The keys and selections of the blocks to copy.
+    workers: int, 1
+        The number of concurrent tasks of each stage.
+    queue_size: int, QUEUE_SIZE
+        The maximum number of blocks waiting between two stages.
+    on_commit: Optional[Callable[[str], None]], None
+        Called with the key of each block once it is written.
+    metrics: Optional[Metrics], None
+        The metrics timing the 'read', 'transcode' and 'write' stages.
+    """
+    timed = metrics.timed if metrics is not None else _call
+    read_queue = asyncio.Queue(maxsize=queue_size)
+    write_queue = asyncio.Queue(maxsize=queue_size)
+    blocks = iter(blocks)
+    source_meta = _array_meta(source) if isinstance(source, zarr.Array) else None
+    targets = [
+        (array, _array_meta(array))
+        for array in (target if isinstance(target, list) else [target])]
+
+    async def read() -> None:
+        for key, selection in blocks:
+            if source_meta is None:
+                raw = await asyncio.to_thread(timed, 'read', source.__getitem__, selection)
+            else:
+                raw = await asyncio.to_thread(
+                    timed, 'read', _read_chunks, source, source_meta, selection)
+            await read_queue.put((key, selection, raw))
+
+    async def transcode(pool: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while (item := await read_queue.get()) is not None:
+            key, selection, raw = item
+            encoded = await loop.run_in_executor(
+                pool, timed, 'transcode', _transcode, (source, source_meta), targets,
+                selection, raw)
+            await write_queue.put((key, encoded))
+
+    async def write() -> None:
+        while (item := await write_queue.get()) is not None:
+            key, encoded = item
+            for store, chunks in encoded:
+                await asyncio.to_thread(timed, 'write', _write_chunks, store, chunks)
+            if on_commit:
+                on_commit(key)
+
+    async def close(queue: asyncio.Queue, tasks: list) -> None:
+        await asyncio.gather(*tasks)
+        for _ in range(workers):
+            await queue.put(None)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        await asyncio.gather(
+            close(read_queue, [read() for _ in range(workers)]),
+            close(write_queue, [transcode(pool) for _ in range(workers)]),
+            *[write() for _ in range(workers)])
+
+
+def _call(_: str, function: Callable, *args) -> Any:
+    """Calls a function, in place of `Metrics.timed` without metrics."""
+    return function(*args)
+
+
+def _array_meta(array: zarr.Array) -> tuple[str, bytes, str]:
+    """Gets the key prefix, the raw metadata and the dimension separator of an array."""
+    prefix = array.path + '/' if array.path else ''
+    meta = array.store[prefix + '.zarray']
+    separator = json.loads(meta).get('dimension_separator') or '.'
+    return prefix, meta, separator
+
+
+def _chunk_keys(
+        array: zarr.Array,
+        meta: tuple[str, bytes, str],
+        selection: tuple[slice, ...]) -> list[str]:
+    """Lists the keys of the chunks of an array that overlap a selection."""
+    prefix, _, separator = meta
+    ranges = [
+        range(s.start // c, (s.stop - 1) // c + 1)
+        for s, c in zip(selection, array.chunks)]
+    return [
+        prefix + separator.join(str(i) for i in index)
+        for index in itertools.product(*ranges)]
+
+
+def _read_chunks(
+        array: zarr.Array,
+        meta: tuple[str, bytes, str],
+        selection: tuple[slice, ...]) -> dict[str, bytes]:
+    """Reads the encoded chunks of an array that overlap a selection."""
+    keys = _chunk_keys(array, meta, selection)
+    if hasattr(array.store, 'getitems'):
+        return array.store.getitems(keys, contexts={})
+    return {key: array.store[key] for key in keys if key in array.store}
+
+
+def _transcode(
+        source: tuple[zarr.Array, Optional[tuple[str, bytes, str]]],
+        targets: list[tuple[zarr.Array, tuple[str, bytes, str]]],
+        selection: tuple[slice, ...],
+        raw: dict[str, bytes] | np.ndarray) -> list[tuple[MutableMapping, dict[str, bytes]]]:
+    """Decodes source chunks and encodes the chunks of a block for each target."""
+    source, source_meta = source
+    if isinstance(raw, np.ndarray):
+        data = raw
+    else:
+        source_store = {source_meta[0] + '.zarray': source_meta[1], **raw}
+        data = zarr.open_array(source_store, mode='r', path=source.path)[selection]
+
+    encoded = []
+    for target, target_meta in targets:
+        target_store = {target_meta[0] + '.zarray': target_meta[1]}
+        zarr.open_array(target_store, mode='r+', path=target.path)[selection] = data
+        del target_store[target_meta[0] + '.zarray']
+        encoded.append((target.store, target_store))
+
+    return encoded
+
+
+def _write_chunks(store: MutableMapping, encoded: dict[str, bytes]) -> None:
+    """Writes encoded chunks to a store."""
+    if hasattr(store, 'setitems'):
+        store.setitems(encoded)
+        return
+    for key, value in encoded.items():
+        store[key] = value
@@ -0,0 +1,248 @@
+"""Re-chunk plan module."""
+
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from rechunk_zarr_ds.utils.chunks import block_shape
+
+
+@dataclass(frozen=True)
+class RechunkPlan:  # pylint: disable=too-many-instance-attributes
+    """
+    Plan of a re-chunk operation.
+
+    Attributes
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array.
+    source_chunks: tuple[int, ...]
+        The chunk shape of the source array.
+    target_chunks: tuple[int, ...]
+        The chunk shape of the target array.
+    intermediate_chunks: Optional[tuple[int, ...]]
+        The chunk shape of the intermediate array, or None for a direct copy.
+    blocks: tuple[tuple[int, ...], ...]
+        The block shape of each copy stage: source to target, or source to
+        intermediate and intermediate to target.
+    reads: int
+        The estimated number of chunk reads.
+    writes: int
+        The estimated number of chunk writes.
+    bytes_read: int
+        The estimated size of the chunks read, decoded.
+    bytes_written: int
+        The estimated size of the chunks written, before encoding.
+    """
+
+    shape: tuple[int, ...]
+    source_chunks: tuple[int, ...]
+    target_chunks: tuple[int, ...]
+    intermediate_chunks: Optional[tuple[int, ...]]
+    blocks: tuple[tuple[int, ...], ...]
+    reads: int
+    writes: int
+    bytes_read: int = 0
+    bytes_written: int = 0
+
+    @property
+    def operations(self) -> int:
+        """The estimated number of chunk reads and writes."""
+        return self.reads + self.writes
+
+    @property
+    def cost(self) -> int:
+        """The estimated size of the chunks read and written, which the plans are compared on."""
+        return self.bytes_read + self.bytes_written
+
+
+def plan_rechunk(
+        shape: tuple[int, ...],
+        itemsize: int,
+        source_chunks: tuple[int, ...],
+        target_chunks: tuple[int, ...],
+        max_mem: Optional[int] = None) -> RechunkPlan:
+    """
+    Plans the copy of an array to a new chunk shape within a memory budget.
+
+    A direct copy reads the source in blocks of whole target chunks. When
+    the source and target chunks are laid out along different axes, the
+    blocks cut across source chunks which are then read many times. In that
+    case, like the rechunker algorithm, the copy goes through an intermediate
+    array whose chunks are compatible with both layouts: the first stage
+    reads the source in blocks of consolidated read chunks and the second
+    writes the target in blocks of consolidated write chunks, so that each
+    stage reads every chunk about once. The plan that reads and writes the
+    fewest bytes of chunks, each decoded or encoded as a whole, is returned.
+
+    Parameters
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array.
+    itemsize: int
+        The size of one array item in bytes.
+    source_chunks: tuple[int, ...]
+        The chunk shape of the source array.
+    target_chunks: tuple[int, ...]
+        The chunk shape of the target array.
+    max_mem: Optional[int], None
+        The memory budget of one block in bytes. If not specified, the
+        whole array is copied at once.
+
+    Returns
+    -------
+    RechunkPlan
+        The re-chunk plan.
+
+    Raises
+    ------
+    ValueError
+        If a single target chunk does not fit in the memory budget.
+    """
+    source_chunks = tuple(source_chunks)
+    target_chunks = tuple(target_chunks)
+
+    block = block_shape(shape, target_chunks, itemsize, max_mem, source_chunks)
+    direct = _plan(
+        shape, itemsize, source_chunks, target_chunks,
+        intermediate_chunks=None, blocks=(block,))
+
+    if max_mem is None or 0 in shape:
+        return direct
+
+    write_chunks = consolidate_chunks(
+        shape, target_chunks, itemsize, max_mem, limits=source_chunks)
+    read_chunks = consolidate_chunks(
+        shape, source_chunks, itemsize, max_mem, limits=write_chunks)
+    intermediate_chunks = tuple(
+        min(r, w) for r, w in zip(read_chunks, write_chunks))
+
+    if intermediate_chunks in (source_chunks, target_chunks):
+        return direct
+
+    # Read chunks made of whole intermediate chunks, write chunks are made of
+    # whole target chunks already
+    first_block = tuple(r // i * i for r, i in zip(read_chunks, intermediate_chunks))
+    if math.prod(first_block) * itemsize > max_mem:
+        first_block = block_shape(shape, intermediate_chunks, itemsize, max_mem, read_chunks)
+    second_block = write_chunks
+    if math.prod(second_block) * itemsize > max_mem:
+        second_block = block_shape(shape, target_chunks, itemsize, max_mem, intermediate_chunks)
+    staged = _plan(
+        shape, itemsize, source_chunks, target_chunks,
+        intermediate_chunks=intermediate_chunks, blocks=(first_block, second_block))
+
+    return staged if staged.cost < direct.cost else direct
+
+
+def _plan(  # pylint: disable=too-many-arguments,too-many-locals
+        shape: tuple[int, ...],
+        itemsize: int,
+        source_chunks: tuple[int, ...],
+        target_chunks: tuple[int, ...],
+        *,
+        intermediate_chunks: Optional[tuple[int, ...]],
+        blocks: tuple[tuple[int, ...], ...]) -> RechunkPlan:
+    """Estimates the chunk operations of copying an array in stages of blocks."""
+    layouts = [source_chunks, target_chunks] if intermediate_chunks is None \
+        else [source_chunks, intermediate_chunks, target_chunks]
+    reads = writes = bytes_read = bytes_written = 0
+    for block, read_layout, write_layout in zip(blocks, layouts, layouts[1:]):
+        n_reads = count_chunks(shape, read_layout, block)
+        n_writes = count_chunks(shape, write_layout, block)
+        reads += n_reads
+        writes += n_writes
+        bytes_read += n_reads * _chunk_bytes(shape, read_layout, itemsize)
+        bytes_written += n_writes * _chunk_bytes(shape, write_layout, itemsize)
+
+    return RechunkPlan(
+        shape=tuple(shape),
+        source_chunks=source_chunks,
+        target_chunks=target_chunks,
+        intermediate_chunks=intermediate_chunks,
+        blocks=tuple(blocks),
+        reads=reads,
+        writes=writes,
+        bytes_read=bytes_read,
+        bytes_written=bytes_written)
+
+
+def _chunk_bytes(shape: tuple[int, ...], chunks: tuple[int, ...], itemsize: int) -> int:
+    """Computes the size of a chunk, at most the size of the array."""
+    return math.prod(min(c, s) for c, s in zip(chunks, shape)) * itemsize
+
+
+def consolidate_chunks(
+        shape: tuple[int, ...],
+        chunks: tuple[int, ...],
+        itemsize: int,
+        max_mem: int,
+        limits: tuple[int, ...]) -> tuple[int, ...]:
+    """
+    Grows chunks by whole multiples towards limits within a memory budget.
+
+    Parameters
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array.
+    chunks: tuple[int, ...]
+        The chunk shape to grow.
+    itemsize: int
+        The size of one array item in bytes.
+    max_mem: int
+        The memory budget in bytes.
+    limits: tuple[int, ...]
+        The chunk sizes not to grow beyond, per axis.
+
+    Returns
+    -------
+    tuple[int, ...]
+        The grown chunk shape. Chunks already larger than the limits are
+        kept as they are.
+    """
+    grown = [min(c, s) for c, s in zip(chunks, shape)]
+
+    for axis in reversed(range(len(shape))):
+        limit = max(grown[axis], min(limits[axis], shape[axis]))
+        other_bytes = math.prod(grown) // grown[axis] * itemsize
+        n_chunks = max(1, min(
+            limit // grown[axis],
+            max_mem // (other_bytes * grown[axis])))
+        grown[axis] = min(shape[axis], n_chunks * grown[axis])
+
+    return tuple(grown)
+
+
+def count_chunks(
+        shape: tuple[int, ...],
+        chunks: tuple[int, ...],
+        block: tuple[int, ...]) -> int:
+    """
+    Counts the chunk operations of copying an array block by block.
+
+    Parameters
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array.
+    chunks: tuple[int, ...]
+        The chunk shape of the array read or written.
+    block: tuple[int, ...]
+        The block shape.
+
+    Returns
+    -------
+    int
+        The number of chunks touched, summed over all blocks.
+    """
+    if 0 in shape:
+        return 0
+
+    total = 1
+    for s, c, b in zip(shape, chunks, block):
+        starts = np.arange(0, s, b)
+        stops = np.minimum(starts + b, s)
+        total *= int(((stops - 1) // c - starts // c + 1).sum())
+
+    return total
@@ -0,0 +1,323 @@
+"""Property columns module."""
+
+import logging
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import zarr
+from numcodecs.abc import Codec
+
+from rechunk_zarr_ds.utils.stores import COORDINATES_KEY
+
+PROPERTIES_KEY = 'properties'
+
+MAX_CATEGORIES = 2 ** 16
+
+CATEGORY_RATIO = 0.5
+
+
+def select_properties(frame: pd.DataFrame, properties: bool | list[str]) -> pd.DataFrame:
+    """
+    Selects the property columns to write.
+
+    Parameters
+    ----------
+    frame: pd.DataFrame
+        The properties of the features, without the geometry.
+    properties: bool | list[str]
+        True for every column, False for none or the names of the columns.
+
+    Returns
+    -------
+    pd.DataFrame
+        The selected columns.
+
+    Raises
+    ------
+    ValueError
+        If a column is not found.
+    """
+    if properties is True:
+        return frame
+    if not properties:
+        return frame[[]]
+
+    missing = [name for name in properties if name not in frame.columns]
+    if missing:
+        err_message = f'Properties {missing} not found in the source file.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    return frame[list(properties)]
+
+
+def encode_column(values: pd.Series) -> tuple[np.ndarray, str, dict]:
+    """
+    Encodes a property column as a numpy array.
+
+    Numbers, booleans and dates of numpy data types are kept as they are.
+    Nullable numbers and booleans of pandas are 'masked': missing values
+    are replaced with a fill value that no other value takes, booleans
+    stored as 0 and 1 bytes. Dates with a time zone are stored as UTC
+    'datetime64[ns]' dates. Other values are converted to strings, missing
+    values to empty strings, and encoded in UTF-8 bytes, as wide as the
+    longest value. Strings with few distinct values are dictionary encoded
+    as one or two byte codes into their sorted labels. `read_properties`
+    decodes all of them.
+
+    Parameters
+    ----------
+    values: pd.Series
+        The values of the column.
+
+    Returns
+    -------
+    tuple[np.ndarray, str, dict]
+        The values, the encoding ('raw', 'masked', 'datetime', 'categorical'
+        or 'fixed') and what decodes them: the pandas data type and the
+        fill value of 'masked', the time zone of 'datetime' and the labels
+        of the codes of 'categorical'.
+    """
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufmM':
+        return values.to_numpy(), 'raw', {}
+
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        data = values.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy('datetime64[ns]')
+        return data, 'datetime', {'timezone': str(values.dt.tz)}
+
+    numpy_dtype = getattr(values.dtype, 'numpy_dtype', None)
+    if values.dtype.kind in 'biuf' and numpy_dtype is not None:
+        dtype = np.dtype('i1' if values.dtype.kind == 'b' else numpy_dtype)
+        present = values.dropna().to_numpy(dtype=dtype)
+        dtype, fill = _free_value(present, dtype)
+        data = values.to_numpy(dtype=dtype, na_value=fill)
+        return data, 'masked', {'dtype': str(values.dtype), 'fill_value': fill}
+
+    strings = values.astype(object).where(values.notna(), '').astype(str).to_numpy(dtype=str)
+    data = np.char.encode(strings, 'utf-8')
+    data = data.astype(f'S{max(1, data.dtype.itemsize)}')
+    labels = np.unique(data)
+
+    if len(labels) > MAX_CATEGORIES or len(labels) > CATEGORY_RATIO * len(data):
+        return data, 'fixed', {}
+
+    codes = np.searchsorted(labels, data).astype('u1' if len(labels) <= 2 ** 8 else 'u2')
+    return codes, 'categorical', {'labels': np.char.decode(labels, 'utf-8').tolist()}
+
+
+def write_properties(
+        z: zarr.Array,
+        frame: pd.DataFrame,
+        compressor: Optional[Codec]) -> int:
+    """
+    Writes property columns next to the coordinates array of a zarr group.
+
+    Each column is an array of the group chunked along the same rows as the
+    coordinates, so row-aligned reads touch one chunk per column. Column
+    names are made safe for every store, the original names are listed in
+    the PROPERTIES_KEY attribute of the group with the encoding of each
+    column, see `encode_column`, and what decodes it, like the labels of
+    categorical columns.
+
+    Parameters
+    ----------
+    z: zarr.Array
+        The coordinates array, at the COORDINATES_KEY path of a group.
+    frame: pd.DataFrame
+        The property columns, with a row per point.
+    compressor: Optional[Codec]
+        The compressor of the columns.
+
+    Returns
+    -------
+    int
+        The uncompressed size of the columns.
+    """
+    group = parent_group(z, mode='r+')
+    columns = []
+    nbytes = 0
+    for name in frame.columns:
+        data, encoding, decoding = encode_column(frame[name])
+        array_name = _array_name(name, group)
+        column = group.create_dataset(
+            array_name, shape=data.shape, chunks=(z.chunks[0],), dtype=data.dtype,
+            compressor=compressor)
+        column[:] = data
+        nbytes += data.nbytes
+        columns.append(
+            {'name': name, 'array': array_name, 'encoding': encoding, **decoding})
+
+    group.attrs[PROPERTIES_KEY] = columns
+    return nbytes
+
+
+def property_columns(z: zarr.Array) -> dict[str, zarr.Array]:
+    """
+    Gets the property columns stored next to a coordinates array.
+
+    The arrays hold the encoded values, see `encode_column`, which
+    `read_properties` decodes.
+
+    Parameters
+    ----------
+    z: zarr.Array
+        The coordinates array.
+
+    Returns
+    -------
+    dict[str, zarr.Array]
+        The column arrays by property name, empty for a zarr file without
+        property columns.
+    """
+    group = parent_group(z)
+    if group is None:
+        return {}
+    return {column['name']: group[column['array']]
+            for column in group.attrs.get(PROPERTIES_KEY, [])}
+
+
+def read_properties(
+        z: zarr.Array,
+        rows: slice = slice(None),
+        columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """
+    Reads the property columns of rows of a coordinates array.
+
+    Parameters
+    ----------
+    z: zarr.Array
+        The coordinates array.
+    rows: slice, slice(None)
+        The rows to read.
+    columns: Optional[list[str]], None
+        The names of the columns to read, all of them by default.
+
+    Returns
+    -------
+    pd.DataFrame
+        The properties, with one row per point. Strings, nullable columns
+        and dates with a time zone are decoded.
+
+    Raises
+    ------
+    ValueError
+        If a column is not found.
+    """
+    group = parent_group(z)
+    entries = {column['name']: column for column in group.attrs.get(PROPERTIES_KEY, [])} \
+        if group is not None else {}
+    names = list(entries) if columns is None else columns
+
+    missing = [name for name in names if name not in entries]
+    if missing:
+        err_message = f'Properties {missing} not found in the zarr file.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    start, stop, _ = rows.indices(z.shape[0])
+    return pd.DataFrame(
+        {name: _decode_column(group[entries[name]['array']][rows], entries[name])
+         for name in names},
+        index=pd.RangeIndex(start, max(start, stop)))
+
+
+def re_chunk_properties(source: zarr.Array, target: zarr.Array) -> None:
+    """
+    Copies the property columns of a source into the group of its re-chunked copy.
+
+    The columns are chunked along the same rows as the target coordinates
+    and keep their encoding. The compressor of the target is used.
+
+    Parameters
+    ----------
+    source: zarr.Array
+        The source coordinates array.
+    target: zarr.Array
+        The re-chunked coordinates array, at the COORDINATES_KEY path of a group.
+    """
+    source_group = parent_group(source)
+    if source_group is None:
+        return
+
+    target_group = parent_group(target, mode='r+')
+    chunk_rows = target.chunks[0]
+    columns = source_group.attrs.get(PROPERTIES_KEY, [])
+    for column in columns:
+        array = source_group[column['array']]
+        target_column = target_group.create_dataset(
+            column['array'], shape=array.shape, chunks=(chunk_rows,), dtype=array.dtype,
+            compressor=target.compressor, filters=array.filters, overwrite=True)
+
+        # Whole target chunks covering whole source chunks, read once each
+        rows = chunk_rows * max(1, array.chunks[0] // chunk_rows)
+        for start in range(0, array.shape[0], rows):
+            target_column[start:start + rows] = array[start:start + rows]
+
+    target_group.attrs[PROPERTIES_KEY] = columns
+
+
+def parent_group(z: zarr.Array, mode: str = 'r') -> Optional[zarr.Group]:
+    """
+    Gets the group of a coordinates array.
+
+    Parameters
+    ----------
+    z: zarr.Array
+        The coordinates array.
+    mode: str, 'r'
+        The mode the group is opened in.
+
+    Returns
+    -------
+    Optional[zarr.Group]
+        The group, or None if the array is not the COORDINATES_KEY array of a group.
+    """
+    parent, _, name = z.path.rpartition('/')
+    if name != COORDINATES_KEY or not zarr.storage.contains_group(z.store, parent):
+        return None
+    return zarr.open_group(z.store, mode=mode, path=parent)
+
+
+def _decode_column(data: np.ndarray, column: dict) -> np.ndarray | pd.api.extensions.ExtensionArray:
+    """Decodes the values of a property column read from its array."""
+    if column['encoding'] == 'categorical':
+        return np.asarray(column['labels'], dtype=str)[data]
+    if column['encoding'] == 'fixed':
+        return np.char.decode(data, 'utf-8')
+    if column['encoding'] == 'datetime':
+        return pd.DatetimeIndex(data).tz_localize('UTC').tz_convert(column['timezone']).array
+    if column['encoding'] == 'masked':
+        dtype = pd.api.types.pandas_dtype(column['dtype'])
+        values = pd.array(data.astype(dtype.numpy_dtype), dtype=dtype)
+        values[data == column['fill_value']] = pd.NA
+        return values
+    return data
+
+
+def _free_value(data: np.ndarray, dtype: np.dtype) -> tuple[np.dtype, int | float]:
+    """Finds a value that the data do not take, in a wider data type if they take them all."""
+    values = np.unique(data)
+    while True:
+        info = np.iinfo(dtype) if dtype.kind in 'iu' else np.finfo(dtype)
+        for fill in (info.min, info.max):
+            if fill not in values:
+                return dtype, fill.item() if isinstance(fill, np.generic) else fill
+
+        # Both ends are taken, look for a gap between two values
+        above = np.nextafter(values[:-1], np.inf) if dtype.kind == 'f' else values[:-1] + 1
+        free = above[above < values[1:]]
+        if len(free):
+            return dtype, free[0].item()
+        dtype = np.dtype(f'{dtype.kind}{dtype.itemsize * 2}')
+
+
+def _array_name(name: str, group: zarr.Group) -> str:
+    """Makes a column name safe for the keys of every store and unique in the group."""
+    array_name = re.sub(r'[^\w@.-]', '_', str(name)).lstrip('.') or '_'
+    base, index = array_name, 1
+    while array_name in group:
+        array_name = f'{base}_{index}'
+        index += 1
+    return array_name
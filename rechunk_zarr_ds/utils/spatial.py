@@ -0,0 +1,318 @@
+"""Spatial layout module."""
+
+import logging
+import math
+from typing import Optional
+
+import numpy as np
+import zarr
+
+CURVES = ('hilbert', 'zorder')
+
+CURVE_BITS = 16
+
+BBOX_INDEX_KEY = 'bbox_index'
+
+
+def check_curve(curve: str) -> None:
+    """
+    Checks that a space-filling curve is supported.
+
+    Parameters
+    ----------
+    curve: str
+        The name of the curve.
+
+    Raises
+    ------
+    ValueError
+        If the curve is not in CURVES.
+    """
+    if curve not in CURVES:
+        err_message = f'Curve <{curve}> is not supported. ' + \
+            f'Please use one of {list(CURVES)}.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+
+def curve_keys(points: np.ndarray, curve: str, bits: int = CURVE_BITS) -> np.ndarray:
+    """
+    Computes the positions of points along a space-filling curve.
+
+    The points are snapped to a grid of 2 ** bits cells along each axis
+    spanning their bounding box, then numbered along a Hilbert or Z-order
+    (Morton) curve. Points close on the curve are close in space, Hilbert
+    keys more so than Z-order keys.
+
+    Parameters
+    ----------
+    points: np.ndarray
+        The (N, 2) array of x and y coordinates.
+    curve: str
+        The curve, 'hilbert' or 'zorder'.
+    bits: int, CURVE_BITS
+        The number of bits of the grid along each axis, at most 32.
+
+    Returns
+    -------
+    np.ndarray
+        The uint64 keys of the points.
+
+    Raises
+    ------
+    ValueError
+        If the curve is not supported.
+    """
+    check_curve(curve)
+    x, y = _grid_coordinates(points, bits)
+
+    if curve == 'zorder':
+        return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+    keys = np.zeros(len(points), dtype=np.uint64)
+    side = np.uint64(1 << bits)
+    level = side >> np.uint64(1)
+    while level > 0:
+        rx = (x & level) > 0
+        ry = (y & level) > 0
+        keys += level * level * ((np.uint64(3) * rx) ^ ry)
+
+        # Rotate the quadrant so that the curve stays continuous
+        flip = rx & ~ry
+        x = np.where(flip, side - np.uint64(1) - x, x)
+        y = np.where(flip, side - np.uint64(1) - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        level >>= np.uint64(1)
+
+    return keys
+
+
+def sort_order(points: np.ndarray, curve: str) -> np.ndarray:
+    """
+    Orders points along a space-filling curve, see `curve_keys`.
+
+    Parameters
+    ----------
+    points: np.ndarray
+        The (N, 2) array of x and y coordinates.
+    curve: str
+        The curve, 'hilbert' or 'zorder'.
+
+    Returns
+    -------
+    np.ndarray
+        The indices of the points in curve order, to reorder other columns
+        of the points the same way. Points in the same grid cell keep their order.
+    """
+    return np.argsort(curve_keys(points, curve), kind='stable')
+
+
+def sort_points(points: np.ndarray, curve: str) -> np.ndarray:
+    """
+    Sorts points along a space-filling curve, see `sort_order`.
+
+    Parameters
+    ----------
+    points: np.ndarray
+        The (N, 2) array of x and y coordinates.
+    curve: str
+        The curve, 'hilbert' or 'zorder'.
+
+    Returns
+    -------
+    np.ndarray
+        The sorted points.
+    """
+    return points[sort_order(points, curve)]
+
+
+def chunk_bboxes(points: np.ndarray, chunk_rows: int) -> np.ndarray:
+    """
+    Computes the bounding box of each chunk of points.
+
+    Parameters
+    ----------
+    points: np.ndarray
+        The (N, 2) array of x and y coordinates.
+    chunk_rows: int
+        The number of points per chunk.
+
+    Returns
+    -------
+    np.ndarray
+        The (ceil(N / chunk_rows), 4) array of boxes, as
+        (xmin, ymin, xmax, ymax) rows.
+    """
+    if len(points) == 0:
+        return np.empty((0, 4), dtype=np.float64)
+
+    starts = np.arange(0, len(points), chunk_rows)
+    return np.hstack([
+        np.fmin.reduceat(points, starts, axis=0),
+        np.fmax.reduceat(points, starts, axis=0)]).astype(np.float64)
+
+
+def bbox_index(curve: Optional[str], chunk_rows: int, bboxes: np.ndarray) -> dict:
+    """
+    Builds the bounding-box index stored in the BBOX_INDEX_KEY attribute.
+
+    Parameters
+    ----------
+    curve: Optional[str]
+        The curve the points are sorted along, if any.
+    chunk_rows: int
+        The number of points per chunk.
+    bboxes: np.ndarray
+        The boxes of the chunks, see `chunk_bboxes`.
+
+    Returns
+    -------
+    dict
+        The JSON serializable index.
+    """
+    return {'curve': curve, 'chunk_rows': chunk_rows, 'bboxes': bboxes.tolist()}
+
+
+def update_bbox_index(z: zarr.Array, start: int = 0) -> None:
+    """
+    Updates the bounding-box index of an array after rows were appended.
+
+    The boxes of the chunks from the one holding row `start` on are
+    computed again from the array, the boxes before it are kept.
+
+    Parameters
+    ----------
+    z: zarr.Array
+        The array of points, with or without an index.
+    start: int, 0
+        The first row that changed.
+    """
+    index = z.attrs.get(BBOX_INDEX_KEY) or bbox_index(None, z.chunks[0], np.empty((0, 4)))
+    chunk_rows = index['chunk_rows']
+    first_chunk = min(start // chunk_rows, len(index['bboxes']))
+
+    bboxes = _read_bboxes(z, chunk_rows, first_chunk * chunk_rows)
+    index['bboxes'] = index['bboxes'][:first_chunk] + bboxes.tolist()
+    z.attrs[BBOX_INDEX_KEY] = index
+
+
+def re_chunk_bbox_index(source: zarr.Array, chunk_rows: int) -> Optional[dict]:
+    """
+    Builds the bounding-box index of a source re-chunked along its rows.
+
+    When the new chunks hold a whole number of indexed source chunks, their
+    boxes are merged from the source index without reading any point.
+    Otherwise the source is read once to compute them.
+
+    Parameters
+    ----------
+    source: zarr.Array
+        The source array.
+    chunk_rows: int
+        The number of points per new chunk.
+
+    Returns
+    -------
+    Optional[dict]
+        The index of the re-chunked array, or None if the source is not indexed.
+    """
+    index = source.attrs.get(BBOX_INDEX_KEY)
+    if not index:
+        return None
+
+    source_rows = index['chunk_rows']
+    if chunk_rows % source_rows:
+        return bbox_index(index['curve'], chunk_rows, _read_bboxes(source, chunk_rows))
+
+    bboxes = np.asarray(index['bboxes'], dtype=np.float64).reshape(-1, 4)
+    starts = np.arange(0, len(bboxes), chunk_rows // source_rows)
+    if len(bboxes) > 0:
+        bboxes = np.hstack([
+            np.fmin.reduceat(bboxes[:, :2], starts, axis=0),
+            np.fmax.reduceat(bboxes[:, 2:], starts, axis=0)])
+    return bbox_index(index['curve'], chunk_rows, bboxes)
+
+
+def query_bbox(z: zarr.Array, bbox: tuple[float, float, float, float]) -> np.ndarray:
+    """
+    Selects the points in a bounding box, reading only the chunks that intersect it.
+
+    Without an index every chunk is read.
+
+    Parameters
+    ----------
+    z: zarr.Array
+        The array of points, or an array reading through a chunk cache.
+    bbox: tuple[float, float, float, float]
+        The query box as (xmin, ymin, xmax, ymax), bounds included.
+
+    Returns
+    -------
+    np.ndarray
+        The (M, 2) array of the points in the box, in array order.
+
+    Raises
+    ------
+    ValueError
+        If the box is not made of 4 ordered bounds.
+    """
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        err_message = f'Bounding box {bbox} must be (xmin, ymin, xmax, ymax).'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    index = z.attrs.get(BBOX_INDEX_KEY)
+    if index:
+        chunk_rows = index['chunk_rows']
+        bboxes = np.asarray(index['bboxes'], dtype=np.float64).reshape(-1, 4)
+        hits = np.flatnonzero(
+            (bboxes[:, 0] <= bbox[2]) & (bboxes[:, 2] >= bbox[0]) &
+            (bboxes[:, 1] <= bbox[3]) & (bboxes[:, 3] >= bbox[1]))
+    else:
+        chunk_rows = z.chunks[0]
+        hits = np.arange(math.ceil(z.shape[0] / chunk_rows))
+
+    # Sorted points put neighbouring chunks in runs read at once
+    selected = [np.empty((0, 2), dtype=z.dtype)]
+    for run in np.split(hits, np.flatnonzero(np.diff(hits) > 1) + 1):
+        if len(run) == 0:
+            continue
+        points = z[run[0] * chunk_rows:(run[-1] + 1) * chunk_rows]
+        selected.append(points[
+            (points[:, 0] >= bbox[0]) & (points[:, 0] <= bbox[2]) &
+            (points[:, 1] >= bbox[1]) & (points[:, 1] <= bbox[3])])
+
+    return np.concatenate(selected)
+
+
+def _read_bboxes(z: zarr.Array, chunk_rows: int, start: int = 0) -> np.ndarray:
+    """Computes the boxes of the chunks of an array from row `start`, reading whole chunks."""
+    rows = chunk_rows * max(1, z.chunks[0] // chunk_rows)
+    return np.concatenate([np.empty((0, 4))] + [
+        chunk_bboxes(z[offset:offset + rows], chunk_rows)
+        for offset in range(start, z.shape[0], rows)])
+
+
+def _grid_coordinates(points: np.ndarray, bits: int) -> tuple[np.ndarray, np.ndarray]:
+    """Snaps points to a grid of 2 ** bits cells along each axis over their bounding box."""
+    if len(points) == 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64)
+
+    low = np.nanmin(points, axis=0)
+    span = np.nanmax(points, axis=0) - low
+    cells = (1 << bits) - 1
+    grid = np.nan_to_num(
+        (points - low) / np.where(span > 0, span, 1) * cells, nan=0.0)
+    grid = np.clip(np.rint(grid), 0, cells).astype(np.uint64)
+    return grid[:, 0], grid[:, 1]
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """Inserts a zero bit after each of the 32 low bits of the values."""
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in (
+            (16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+            (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333),
+            (1, 0x5555555555555555)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
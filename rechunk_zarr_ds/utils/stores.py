@@ -0,0 +1,432 @@
+"""Stores module."""
+
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import MutableMapping, Optional
+
+import numpy as np
+import zarr
+
+STORE_FORMATS = ('directory', 'zip')
+
+MEMORY_FORMATS = ('zarr', 'numpy', 'memmap')
+
+ZIP_SUFFIX = '.zip'
+
+COORDINATES_KEY = 'coordinates'
+
+
+def check_store_format(store_format: str) -> None:
+    """
+    Checks that a store format is supported.
+
+    Parameters
+    ----------
+    store_format: str
+        The store format, either 'directory' for one file per chunk or
+        'zip' for all the chunks packed in a single zip file.
+
+    Raises
+    ------
+    ValueError
+        If the store format is not supported.
+    """
+    if store_format not in STORE_FORMATS:
+        err_message = f'Store format <{store_format}> is not supported. ' + \
+            f'Please use one of {list(STORE_FORMATS)}.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+
+def check_memory_format(memory_format: str) -> None:
+    """
+    Checks that an in-memory format is supported.
+
+    Parameters
+    ----------
+    memory_format: str
+        The in-memory format, either 'zarr' for a compressed zarr array,
+        'numpy' for an uncompressed array or 'memmap' for an uncompressed
+        array mapped to a temporary file.
+
+    Raises
+    ------
+    ValueError
+        If the in-memory format is not supported.
+    """
+    if memory_format not in MEMORY_FORMATS:
+        err_message = f'Memory format <{memory_format}> is not supported. ' + \
+            f'Please use one of {list(MEMORY_FORMATS)}.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+
+def create_memory_array(
+        shape: tuple[int, ...],
+        dtype: np.dtype | str,
+        memory_format: str) -> np.ndarray:
+    """
+    Creates an uncompressed array to re-chunk into without an output file.
+
+    Parameters
+    ----------
+    shape: tuple[int, ...]
+        The shape of the array.
+    dtype: np.dtype | str
+        The data type of the array.
+    memory_format: str
+        Either 'numpy' for an array in memory or 'memmap' for an array
+        mapped to an anonymous temporary file, which the operating system
+        pages out instead of keeping it in memory. The file is removed when
+        the array is released.
+
+    Returns
+    -------
+    np.ndarray
+        The empty array, a `np.memmap` for 'memmap'.
+    """
+    # Empty files can not be mapped.
+    if memory_format == 'numpy' or 0 in shape:
+        return np.empty(shape, dtype=dtype)
+
+    with tempfile.TemporaryFile(prefix='rechunk_zarr_ds_') as file:
+        return np.memmap(file, mode='w+', dtype=dtype, shape=shape)
+
+
+def is_zip_store(path: str) -> bool:
+    """
+    Checks whether a path is a zarr file packed in a zip file.
+
+    Parameters
+    ----------
+    path: str
+        The path to the zarr file.
+
+    Returns
+    -------
+    bool
+        True if the path is a zip file.
+    """
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+
+def is_url(path: str | MutableMapping) -> bool:
+    """
+    Checks whether a path is the URL of a remote zarr file, like 's3://...'.
+
+    Parameters
+    ----------
+    path: str | MutableMapping
+        The path to the zarr file or a zarr store.
+
+    Returns
+    -------
+    bool
+        True if the path is a URL.
+    """
+    return isinstance(path, str) and '://' in path
+
+
+def get_filesystem(url: str, storage_options: Optional[dict] = None) -> tuple:
+    """
+    Gets the fsspec file system of a URL.
+
+    fsspec caches file system instances by protocol and options, so all the
+    stores of a re-chunk share the same file system and its connection pool.
+
+    Parameters
+    ----------
+    url: str
+        The URL, like 's3://bucket/path'.
+    storage_options: Optional[dict], None
+        The options of the file system, like credentials.
+
+    Returns
+    -------
+    tuple[fsspec.AbstractFileSystem, str]
+        The file system and the path of the URL within it.
+
+    Raises
+    ------
+    ImportError
+        If fsspec is not installed.
+    """
+    try:
+        import fsspec  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        err_message = 'Remote zarr files need fsspec. Please install the ' + \
+            "'remote' extra, like `pip install rechunk-zarr-ds[remote]`, " + \
+            'and the package of the protocol, like s3fs.'
+        logging.error(err_message)
+        raise ImportError(err_message) from e
+
+    return fsspec.core.url_to_fs(url, **(storage_options or {}))
+
+
+def path_exists(path: str, storage_options: Optional[dict] = None) -> bool:
+    """
+    Checks whether a local path or a URL exists.
+
+    Parameters
+    ----------
+    path: str
+        The local path or the URL.
+    storage_options: Optional[dict], None
+        The options of the file system of URLs.
+
+    Returns
+    -------
+    bool
+        True if the path exists.
+    """
+    if is_url(path):
+        fs, fs_path = get_filesystem(path, storage_options)
+        return fs.exists(fs_path)
+    return os.path.exists(path)
+
+
+def remove_path(path: str, storage_options: Optional[dict] = None) -> None:
+    """
+    Removes a local file or directory or a URL with everything below it.
+
+    Parameters
+    ----------
+    path: str
+        The local path or the URL.
+    storage_options: Optional[dict], None
+        The options of the file system of URLs.
+    """
+    if is_url(path):
+        fs, fs_path = get_filesystem(path, storage_options)
+        if fs.exists(fs_path):
+            fs.rm(fs_path, recursive=True)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def zarr_name(path: str | MutableMapping) -> str:
+    """
+    Gets the name of a zarr file without its '.zarr' and '.zip' extensions.
+
+    Parameters
+    ----------
+    path: str | MutableMapping
+        The path or URL to the zarr file, or an fsspec mapper or zarr store
+        with a root path.
+
+    Returns
+    -------
+    str
+        The name of the zarr file.
+    """
+    if not isinstance(path, str):
+        path = getattr(path, 'root', None) or getattr(path, 'path', None) or 'zarr'
+
+    name = os.path.basename(os.path.normpath(path.rstrip('/')))
+    if name.endswith(ZIP_SUFFIX):
+        name = name[:-len(ZIP_SUFFIX)]
+    return os.path.splitext(name)[0]
+
+
+def store_path(output_dir: str, name: str, store_format: str) -> str:
+    """
+    Builds the path of a zarr file in a store format.
+
+    Parameters
+    ----------
+    output_dir: str
+        The directory or the URL of the directory of the zarr file.
+    name: str
+        The name of the zarr file without extension.
+    store_format: str
+        The store format, either 'directory' or 'zip'.
+
+    Returns
+    -------
+    str
+        The path ending with '.zarr' or '.zarr.zip'.
+    """
+    suffix = '.zarr' + (ZIP_SUFFIX if store_format == 'zip' else '')
+    if is_url(output_dir):
+        return output_dir.rstrip('/') + '/' + name + suffix
+    return os.path.join(output_dir, name + suffix)
+
+
+def open_zarr_array(
+        path: str | MutableMapping,
+        storage_options: Optional[dict] = None) -> zarr.Array:
+    """
+    Opens a zarr array from a directory, a zip file or a URL in read mode.
+
+    Consolidated metadata are used when present, so opening takes a single
+    metadata read. For zip files of a zarr directory, the array is looked up
+    inside the directory. The zip file stays open while the array is used,
+    call `close_zarr_array` to close it. URLs are read through a
+    `zarr.storage.FSStore`, which fetches the chunks of a selection with a
+    single batched request.
+    Zarr files with property columns are groups, their coordinates array
+    is returned, see `coordinates_array`.
+
+    Parameters
+    ----------
+    path: str | MutableMapping
+        The path or URL to the zarr file, or a zarr store like an fsspec mapper.
+    storage_options: Optional[dict], None
+        The options of the file system of URLs, like credentials.
+
+    Returns
+    -------
+    zarr.Array
+        The zarr array.
+    """
+    if not isinstance(path, str):
+        store = path
+        array_path = ''
+    elif is_url(path):
+        get_filesystem(path, storage_options)
+        store = zarr.storage.FSStore(path, mode='r', **(storage_options or {}))
+        array_path = ''
+    elif not is_zip_store(path):
+        store = zarr.DirectoryStore(path)
+        array_path = ''
+    else:
+        store = zarr.ZipStore(path, mode='r')
+        array_path = _zip_array_path(store)
+
+    if not array_path and '.zmetadata' in store:
+        return coordinates_array(zarr.open_consolidated(store, mode='r'))
+
+    return coordinates_array(zarr.open(store, mode='r', path=array_path))
+
+
+def coordinates_array(node: zarr.Array | zarr.Group) -> zarr.Array:
+    """
+    Gets the coordinates of a zarr file, an array or a group with property columns.
+
+    Parameters
+    ----------
+    node: zarr.Array | zarr.Group
+        The root of the zarr file.
+
+    Returns
+    -------
+    zarr.Array
+        The array itself, or the COORDINATES_KEY array of the group.
+
+    Raises
+    ------
+    ValueError
+        If the group has no coordinates array.
+    """
+    if isinstance(node, zarr.Array):
+        return node
+
+    if COORDINATES_KEY not in node.array_keys():
+        err_message = f'Zarr group <{node.name}> has no <{COORDINATES_KEY}> array.'
+        logging.error(err_message)
+        raise ValueError(err_message)
+
+    return node[COORDINATES_KEY]
+
+
+def close_zarr_array(array: zarr.Array) -> None:
+    """
+    Closes the zip file of a zarr array opened with `open_zarr_array`.
+
+    Parameters
+    ----------
+    array: zarr.Array
+        The zarr array. Arrays of directory stores are left as they are.
+    """
+    # Consolidated metadata stores wrap the underlying store.
+    store = getattr(array.store, 'store', array.store)
+    if isinstance(store, zarr.ZipStore):
+        store.close()
+
+
+def create_store(
+        path: str,
+        store_format: str,
+        storage_options: Optional[dict] = None) -> MutableMapping:
+    """
+    Creates the store of a new zarr file.
+
+    Parameters
+    ----------
+    path: str
+        The path or URL to the zarr file.
+    store_format: str
+        The store format, either 'directory' or 'zip'. URLs are always
+        written as directories of chunks.
+    storage_options: Optional[dict], None
+        The options of the file system of URLs, like credentials.
+
+    Returns
+    -------
+    MutableMapping
+        The zarr store. Zip stores must be closed with `close_store`.
+    """
+    if is_url(path):
+        get_filesystem(path, storage_options)
+        return zarr.storage.FSStore(path, **(storage_options or {}))
+    if store_format == 'zip':
+        return zarr.ZipStore(path, mode='w')
+    return zarr.DirectoryStore(path)
+
+
+def close_store(store: MutableMapping, consolidated: bool = False) -> None:
+    """
+    Finishes writing a zarr store.
+
+    Parameters
+    ----------
+    store: MutableMapping
+        The zarr store.
+    consolidated: bool, False
+        If True, the metadata are consolidated in a single '.zmetadata' key.
+    """
+    if consolidated:
+        zarr.consolidate_metadata(store)
+
+    if isinstance(store, zarr.ZipStore):
+        store.close()
+
+
+def pack_store(directory_path: str, path: str, consolidated: bool = False) -> None:
+    """
+    Packs a zarr directory in a zip file and removes the directory.
+
+    Parameters
+    ----------
+    directory_path: str
+        The path to the zarr directory.
+    path: str
+        The path to the zip file.
+    consolidated: bool, False
+        If True, the metadata are consolidated in a single '.zmetadata' key.
+    """
+    store = zarr.ZipStore(path, mode='w')
+    try:
+        zarr.copy_store(zarr.DirectoryStore(directory_path), store)
+    finally:
+        close_store(store, consolidated)
+
+    shutil.rmtree(directory_path)
+
+
+def _zip_array_path(store: zarr.ZipStore) -> str:
+    """Finds the path of the array, or of the group, in a zip store."""
+    if '.zarray' in store or '.zgroup' in store:
+        return ''
+
+    groups = [key[:-len('/.zgroup')] for key in store.keys() if key.endswith('/.zgroup')]
+    if groups:
+        return min(groups, key=len)
+
+    paths = [key[:-len('/.zarray')] for key in store.keys() if key.endswith('/.zarray')]
+    return paths[0] if len(paths) == 1 else ''
@@ -0,0 +1,115 @@
+"""Re-chunked view module."""
+
+import itertools
+import logging
+import math
+from typing import Iterator
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.stores import close_zarr_array
+
+
+class RechunkedView:
+    """
+    Lazy view of a zarr or numpy array split in target chunks.
+
+    Nothing is read until a chunk is requested, and each request reads only
+    the source chunks it overlaps, so batches are available without writing
+    a re-chunked copy or loading the whole array.
+
+    Indexing is in target chunk units: `view[i]` is the i-th row of chunks,
+    spanning all chunks of the other axes, `view[i:j]` the rows of chunks
+    i to j and `view[i, k]` the chunk at index `(i, k)`. Iterating yields
+    the rows of chunks in order, for example batches of `data_per_chunk`
+    points.
+
+    Parameters
+    ----------
+    array: zarr.Array | np.ndarray
+        The source array, an array reading through a chunk cache or an
+        uncompressed array, see `rechunk_zarr_ds.main.re_chunk_zarr_file`.
+    chunks: tuple[int, ...]
+        The target chunk shape, see `rechunk_zarr_ds.utils.chunks.normalize_chunks`.
+    """
+
+    def __init__(self, array: zarr.Array | np.ndarray, chunks: tuple[int, ...]):
+        self.array = array
+        self.chunks = tuple(chunks)
+        self.shape = tuple(array.shape)
+        self.dtype = array.dtype
+
+    def __enter__(self) -> 'RechunkedView':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.chunk_grid[0]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, key: int | slice | tuple[int | slice, ...]) -> np.ndarray:
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if len(key) > len(self.shape):
+            err_message = f'Too many chunk indices {key} for {len(self.shape)} axes.'
+            logging.error(err_message)
+            raise IndexError(err_message)
+
+        selection = []
+        for axis, n_chunks in enumerate(self.chunk_grid):
+            item = key[axis] if axis < len(key) else slice(None)
+            if isinstance(item, slice):
+                start, stop, step = item.indices(n_chunks)
+                if step != 1:
+                    err_message = 'Chunk slices must have a step of 1.'
+                    logging.error(err_message)
+                    raise IndexError(err_message)
+                stop = max(start, stop)
+            else:
+                start = item + n_chunks if item < 0 else item
+                if not 0 <= start < n_chunks:
+                    err_message = f'Chunk index {item} out of range for axis ' + \
+                        f'{axis} with {n_chunks} chunks.'
+                    logging.error(err_message)
+                    raise IndexError(err_message)
+                stop = start + 1
+
+            size = self.chunks[axis]
+            selection.append(
+                slice(start * size, min(stop * size, self.shape[axis])))
+
+        return self.array[tuple(selection)]
+
+    @property
+    def chunk_grid(self) -> tuple[int, ...]:
+        """The number of target chunks along each axis."""
+        return tuple(math.ceil(s / c) for s, c in zip(self.shape, self.chunks))
+
+    @property
+    def nchunks(self) -> int:
+        """The total number of target chunks."""
+        return math.prod(self.chunk_grid)
+
+    def iter_chunks(self) -> Iterator[tuple[tuple[int, ...], np.ndarray]]:
+        """
+        Iterates over every target chunk in order.
+
+        Yields
+        ------
+        tuple[tuple[int, ...], np.ndarray]
+            The index of the chunk and its data.
+        """
+        for index in itertools.product(*[range(n) for n in self.chunk_grid]):
+            yield index, self[index]
+
+    def close(self) -> None:
+        """Closes the zip file of the source array, if any."""
+        if not isinstance(self.array, np.ndarray):
+            close_zarr_array(self.array)
@@ -0,0 +1,203 @@
+"""Test cli module."""
+
+import io
+import os
+import shutil
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import zarr
+
+from rechunk_zarr_ds.cli import find_files, main, parse_chunks
+from rechunk_zarr_ds.utils.properties import property_columns
+from rechunk_zarr_ds.utils.stores import open_zarr_array
+
+
+class TestCli(unittest.TestCase):
+    """
+    Test cli module.
+
+    This class contains tests for the `rechunk-zarr-ds` command.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method copies the test GeoJSON file twice to a directory of
+        source files, next to an invalid one.
+        """
+        parent_dir = os.path.dirname(__file__)
+        test_data_dir = os.path.join(parent_dir, 'data/json_files')
+        self.test_results_dir = os.path.join(parent_dir, 'results')
+        self.sources_dir = os.path.join(self.test_results_dir, 'sources')
+        Path(self.sources_dir).mkdir(parents=True, exist_ok=True)
+
+        for name in ('potsdam.json', 'berlin.json'):
+            shutil.copy(
+                os.path.join(test_data_dir, 'potsdam_supermarkets.json'),
+                os.path.join(self.sources_dir, name))
+        self.polygon_file = os.path.join(test_data_dir, 'potsdam_supermarkets_polygon.json')
+
+    def tearDown(self):
+        """
+        Tear down the test environment.
+
+        This method removes the test results directory.
+        """
+        shutil.rmtree(self.test_results_dir)
+
+    def run_command(self, *argv: str) -> tuple[int, list[str]]:
+        """Runs the command and returns its exit status and output lines."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = main(list(argv))
+        return status, output.getvalue().splitlines()
+
+    def test_find_files___succeed(self):
+        """Test find_files and parse_chunks :: succeed."""
+        assert find_files([self.sources_dir], ('.json',)) == [
+            os.path.join(self.sources_dir, 'berlin.json'),
+            os.path.join(self.sources_dir, 'potsdam.json')]
+        assert find_files(
+            [os.path.join(self.sources_dir, 'p*.json'), self.sources_dir], ('.json',)) == [
+                os.path.join(self.sources_dir, 'potsdam.json'),
+                os.path.join(self.sources_dir, 'berlin.json')]
+        assert not find_files([os.path.join(self.sources_dir, '*.zarr')], ('.zarr',))
+
+        assert parse_chunks('13') == 13
+        assert parse_chunks('13,1') == (13, 1)
+        assert parse_chunks('16MiB') == '16MiB'
+
+    def test_ingest_and_rechunk___succeed(self):
+        """Test ingest and rechunk :: succeed :: process pool and completed files skipped."""
+        zarr_dir = os.path.join(self.test_results_dir, 'zarr')
+        re_chunked_dir = os.path.join(self.test_results_dir, 're_chunked')
+
+        status, lines = self.run_command(
+            'ingest', self.sources_dir, '--output-dir', zarr_dir, '--workers', '2',
+            '--chunks', '10', '--sort', 'hilbert')
+        assert status == 0
+        assert sorted(line.split()[0] for line in lines[:-1]) == ['done', 'done']
+        assert lines[-1].startswith('2 done, 0 skipped, 0 failed')
+        assert '126 points' in lines[-1]
+        assert zarr.open(os.path.join(zarr_dir, 'berlin.zarr'), mode='r').chunks == (10, 2)
+
+        # The partial directory left behind by an interrupted run is written again
+        partial_dir = os.path.join(zarr_dir, 'potsdam.zarr.partial')
+        os.mkdir(partial_dir)
+        os.replace(
+            os.path.join(zarr_dir, 'potsdam.zarr'), os.path.join(partial_dir, 'potsdam.zarr'))
+        manifest = os.path.join(zarr_dir, 'potsdam.zarr', '.zattrs')
+        status, lines = self.run_command(
+            'ingest', os.path.join(self.sources_dir, '*.json'), '--output-dir', zarr_dir,
+            '--workers', '1')
+        assert lines[-1].startswith('1 done, 1 skipped, 0 failed')
+        assert os.path.exists(manifest)
+        assert not os.path.exists(partial_dir)
+
+        status, lines = self.run_command(
+            'rechunk', zarr_dir, '--chunks', '13', '7,1', '--output-dir', re_chunked_dir,
+            '--workers', '2', '--max-mem', '1KiB')
+        assert status == 0
+        assert lines[-1].startswith('2 done, 0 skipped, 0 failed')
+        assert sorted(os.listdir(re_chunked_dir)) == [
+            'berlin_re_chunked__to__13.zarr', 'berlin_re_chunked__to__7x1.zarr',
+            'potsdam_re_chunked__to__13.zarr', 'potsdam_re_chunked__to__7x1.zarr']
+
+        status, lines = self.run_command(
+            'rechunk', zarr_dir, '--chunks', '13', '21', '--output-dir', re_chunked_dir,
+            '--workers', '1')
+        assert lines[-1].startswith('2 done, 0 skipped, 0 failed')
+        assert len(os.listdir(re_chunked_dir)) == 6
+
+        status, lines = self.run_command(
+            'rechunk', zarr_dir, '--chunks', '21', '--output-dir', re_chunked_dir)
+        assert lines[-1].startswith('0 done, 2 skipped, 0 failed')
+
+    def test_ingest_and_rechunk___succeed_properties(self):
+        """Test ingest and rechunk :: succeed :: property columns kept."""
+        zarr_dir = os.path.join(self.test_results_dir, 'zarr')
+        re_chunked_dir = os.path.join(self.test_results_dir, 're_chunked')
+
+        for _ in range(2):
+            status, lines = self.run_command(
+                'ingest', self.sources_dir, '--output-dir', zarr_dir, '--workers', '1',
+                '--properties', 'name', 'brand')
+        assert status == 0
+        assert lines[-1].startswith('0 done, 2 skipped, 0 failed')
+
+        status, lines = self.run_command(
+            'rechunk', zarr_dir, '--chunks', '13', '--output-dir', re_chunked_dir,
+            '--workers', '1')
+        assert status == 0
+        columns = property_columns(open_zarr_array(
+            os.path.join(re_chunked_dir, 'berlin_re_chunked__to__13.zarr')))
+        assert list(columns) == ['name', 'brand']
+        assert columns['name'].chunks == (13,)
+
+    def test_ingest_and_rechunk___failed_same_output(self):
+        """Test ingest and rechunk :: failed :: files with the same name in one output directory."""
+        zarr_dir = os.path.join(self.test_results_dir, 'zarr')
+        for name in ('a', 'b'):
+            Path(self.sources_dir, name).mkdir()
+            shutil.copy(
+                os.path.join(self.sources_dir, 'potsdam.json'),
+                os.path.join(self.sources_dir, name, 'potsdam.json'))
+
+        pattern = os.path.join(self.sources_dir, '*', 'potsdam.json')
+        with self.assertLogs(level='ERROR') as logs:
+            status, lines = self.run_command(
+                'ingest', pattern, '--output-dir', zarr_dir, '--workers', '1')
+        assert status == 1
+        assert not lines
+        assert os.path.join(zarr_dir, 'potsdam.zarr') in logs.output[0]
+        assert not os.path.exists(zarr_dir)
+
+        # Next to each source, the outputs do not collide
+        status, lines = self.run_command('ingest', pattern, '--workers', '1')
+        assert status == 0
+
+        with self.assertLogs(level='ERROR'):
+            status, lines = self.run_command(
+                'rechunk', os.path.join(self.sources_dir, '*', 'potsdam.zarr'), '--chunks', '13',
+                '--output-dir', os.path.join(self.test_results_dir, 're_chunked'))
+        assert status == 1
+        assert not lines
+
+        # Equivalent layouts of one file would be written to the same output too
+        with self.assertLogs(level='ERROR'):
+            status, lines = self.run_command(
+                'rechunk', os.path.join(self.sources_dir, 'a', 'potsdam.zarr'),
+                '--chunks', '13', '13,2',
+                '--output-dir', os.path.join(self.test_results_dir, 're_chunked'))
+        assert status == 1
+
+    def test_ingest___failed_output_exists(self):
+        """Test ingest :: failed :: outputs that do not record the source are kept."""
+        zarr_dir = os.path.join(self.test_results_dir, 'zarr')
+        status, _ = self.run_command('ingest', self.sources_dir, '--output-dir', zarr_dir)
+        assert status == 0
+
+        # The output of another source, or one without manifest, is not removed
+        output = os.path.join(zarr_dir, 'potsdam.zarr')
+        os.remove(os.path.join(output, '.zattrs'))
+        with self.assertLogs(level='ERROR'):
+            status, lines = self.run_command('ingest', self.sources_dir, '--output-dir', zarr_dir)
+        assert status == 1
+        assert lines[-1].startswith('0 done, 1 skipped, 1 failed')
+        assert any(line.startswith(' failed') and 'exists' in line for line in lines)
+        assert (zarr.open(output, mode='r')[:] == zarr.open(
+            os.path.join(zarr_dir, 'berlin.zarr'), mode='r')[:]).all()
+
+    def test_ingest___failed_invalid_file(self):
+        """Test ingest :: failed :: the other files are converted."""
+        shutil.copy(self.polygon_file, self.sources_dir)
+
+        status, lines = self.run_command('ingest', self.sources_dir, '--workers', '2')
+        assert status == 1
+        assert lines[-1].startswith('2 done, 0 skipped, 1 failed')
+        assert any(
+            line.startswith(' failed') and 'potsdam_supermarkets_polygon.json' in line
+            for line in lines)
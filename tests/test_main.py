@@ -1,17 +1,42 @@
 """Test main module."""
 
+import importlib.util
 import math
 import os
 import shutil
+import threading
+import tracemalloc
 import unittest
+import zipfile
 from pathlib import Path
+from unittest import mock
 
+import numpy as np
+import pandas as pd
 import zarr
-
-from rechunk_zarr_ds.main import re_chunk_zarr_file
-
-
-class TestMain(unittest.TestCase):
+from numcodecs import Delta
+
+from rechunk_zarr_ds import main
+from rechunk_zarr_ds.main import (
+    open_re_chunked_view, query_zarr_file, re_chunk_zarr_file,
+    re_chunk_zarr_file_multi)
+from rechunk_zarr_ds.utils import encoding, pipeline
+from rechunk_zarr_ds.utils.cache import ChunkCache
+from rechunk_zarr_ds.utils.metrics import Metrics
+from rechunk_zarr_ds.utils.pipeline import pipeline_blocks
+from rechunk_zarr_ds.utils.properties import (
+    property_columns, read_properties, write_properties)
+from rechunk_zarr_ds.utils.spatial import (
+    BBOX_INDEX_KEY, bbox_index, chunk_bboxes, sort_points)
+from rechunk_zarr_ds.utils.stores import (
+    COORDINATES_KEY, close_zarr_array, create_store, open_zarr_array, path_exists,
+    remove_path)
+from rechunk_zarr_ds.utils.view import RechunkedView
+
+HAS_FSSPEC = importlib.util.find_spec('fsspec') is not None
+
+
+class TestMain(unittest.TestCase):  # pylint: disable=too-many-public-methods
     """
     Test main module.
 
@@ -129,7 +154,7 @@ class TestMain(unittest.TestCase):
         """Test re_chunk_zarr_file :: failed :: input file is not valid."""
         input_file = \
             os.path.join(
-                self.test_data_dir, 'potsdam_supermarkets.zarr.zip')
+                self.test_data_dir, 'potsdam_supermarkets.zarr', '.zarray')
         try:
             re_chunk_zarr_file(file_path=input_file, data_per_chunk=13)
         except FileNotFoundError as e:
@@ -180,3 +205,709 @@ class TestMain(unittest.TestCase):
         except FileExistsError as e:
             assert str(e) == f'Re-chunked zarr file for source file <{input_file}> ' + \
                 f'and chunk size <{data_per_chunk}> already exists.'
+
+    def test_re_chunk_zarr_file___succeed_streaming_with_max_mem(self):
+        """Test re_chunk_zarr_file :: succeed :: streaming with memory budget."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        data_per_chunk = 13
+
+        zarr_ds = zarr.open(input_file, mode='r')
+
+        # Budget of two target chunks of 13 float64 points
+        re_chunked_zarr_array, output_file = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=data_per_chunk,
+            output_dir=self.test_results_dir,
+            max_mem=2 * data_per_chunk * 2 * 8)
+
+        assert os.path.exists(output_file)
+        assert re_chunked_zarr_array.chunks == (data_per_chunk, 2)
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+        re_chunked_zarr_array = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=data_per_chunk,
+            max_mem='1KiB')
+
+        assert re_chunked_zarr_array.chunks == (data_per_chunk, 2)
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+    def test_re_chunk_zarr_file___failed_max_mem_smaller_than_chunk(self):
+        """Test re_chunk_zarr_file :: failed :: memory budget too small."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        with self.assertRaises(ValueError):
+            re_chunk_zarr_file(
+                file_path=input_file,
+                data_per_chunk=13,
+                max_mem=100)
+
+    def test_re_chunk_zarr_file___succeed_parallel_executors(self):
+        """Test re_chunk_zarr_file :: succeed :: thread, process and async executors."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+
+        re_chunked_zarr_array = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=5,
+            executor='thread',
+            workers=4)
+
+        assert re_chunked_zarr_array.chunks == (5, 2)
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+        _, output_file = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=7,
+            output_dir=self.test_results_dir,
+            executor='process',
+            workers=2)
+
+        re_chunked_zarr_array = zarr.open(output_file, mode='r')
+        assert re_chunked_zarr_array.chunks == (7, 2)
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+        re_chunked_zarr_array, _ = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=9,
+            output_dir=self.test_results_dir,
+            max_mem=9 * 2 * 8 * pipeline_blocks(3),
+            executor='async',
+            workers=3)
+
+        assert re_chunked_zarr_array.chunks == (9, 2)
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+    def test_re_chunk_zarr_file___succeed_async_max_mem(self):
+        """Test re_chunk_zarr_file :: succeed :: async blocks in flight fit in max_mem."""
+        input_file = os.path.join(self.test_results_dir, 'points.zarr')
+        data = np.arange(2000, dtype='float64').reshape(1000, 2)
+        zarr.save_array(input_file, data, chunks=(10, 2))
+        max_mem = 20 * 2 * 8 * pipeline_blocks(2) * 2
+
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+        read_chunks = pipeline._read_chunks  # pylint: disable=protected-access
+        write_chunks = pipeline._write_chunks  # pylint: disable=protected-access
+
+        def counted_read(array, meta, selection):
+            with lock:
+                in_flight.append(math.prod(s.stop - s.start for s in selection) * 8)
+                peak.append(sum(in_flight))
+            return read_chunks(array, meta, selection)
+
+        def counted_write(store, encoded):
+            write_chunks(store, encoded)
+            with lock:
+                in_flight.pop()
+
+        with mock.patch.object(pipeline, '_read_chunks', counted_read), \
+                mock.patch.object(pipeline, '_write_chunks', counted_write):
+            re_chunked_zarr_array, _ = re_chunk_zarr_file(
+                file_path=input_file,
+                data_per_chunk=20,
+                output_dir=self.test_results_dir,
+                max_mem=max_mem,
+                executor='async',
+                workers=2)
+
+        assert not in_flight
+        assert 0 < max(peak) <= max_mem
+        assert (re_chunked_zarr_array[:] == data).all()
+
+    def test_re_chunk_zarr_file___failed_invalid_executor(self):
+        """Test re_chunk_zarr_file :: failed :: invalid executor or workers."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        try:
+            re_chunk_zarr_file(
+                file_path=input_file, data_per_chunk=13, executor='gpu')
+        except ValueError as e:
+            assert str(e) == 'Executor <gpu> is not supported. ' + \
+                "Please use one of ['thread', 'process', 'async']."
+
+        try:
+            re_chunk_zarr_file(
+                file_path=input_file, data_per_chunk=13, workers=0)
+        except ValueError as e:
+            assert str(e) == 'Number of workers must be greater than 0.'
+
+        try:
+            re_chunk_zarr_file(
+                file_path=input_file, data_per_chunk=13, executor='process')
+        except ValueError as e:
+            assert str(e) == \
+                'Process executor needs an output directory to write to.'
+
+    def test_re_chunk_zarr_file___succeed_auto_chunks(self):
+        """Test re_chunk_zarr_file :: succeed :: planned chunks."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+
+        re_chunked_zarr_array = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk='auto')
+
+        # The 63 points fit in a single planned chunk
+        assert re_chunked_zarr_array.chunks == (63, 2)
+        assert re_chunked_zarr_array.nchunks == 1
+
+        re_chunked_zarr_array, output_file = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk='320B',
+            output_dir=self.test_results_dir)
+
+        assert os.path.basename(output_file) == \
+            'potsdam_supermarkets_re_chunked__to__20.zarr'
+        assert re_chunked_zarr_array.chunks == (20, 2)
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+    def test_re_chunk_zarr_file___succeed_multi_dimensional_chunks(self):
+        """Test re_chunk_zarr_file :: succeed :: chunk shapes and mappings."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+
+        re_chunked_zarr_array, output_file = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=(-1, 1),
+            output_dir=self.test_results_dir,
+            max_mem=63 * 8)
+
+        assert os.path.basename(output_file) == \
+            'potsdam_supermarkets_re_chunked__to__63x1.zarr'
+        assert re_chunked_zarr_array.chunks == (63, 1)
+        assert re_chunked_zarr_array.nchunks == 2
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+        re_chunked_zarr_array = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk={0: 20, 1: 1})
+
+        assert re_chunked_zarr_array.chunks == (20, 1)
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+    def test_re_chunk_zarr_file___succeed_through_intermediate_array(self):
+        """Test re_chunk_zarr_file :: succeed :: row to column chunks."""
+        source_file = os.path.join(self.test_results_dir, 'rows.zarr')
+        source = zarr.create(
+            shape=(200, 100), dtype='float64', chunks=(1, 100), store=source_file)
+        source[:] = np.arange(200 * 100).reshape(200, 100)
+
+        for output_dir in (self.test_results_dir, None):
+            result = re_chunk_zarr_file(
+                file_path=source_file,
+                data_per_chunk=(-1, 1),
+                output_dir=output_dir,
+                max_mem=200 * 10 * 8)
+            re_chunked_zarr_array = result[0] if output_dir else result
+
+            assert re_chunked_zarr_array.chunks == (200, 1)
+            assert (re_chunked_zarr_array[:] == source[:]).all()
+
+        # The intermediate array is removed
+        assert sorted(os.listdir(self.test_results_dir)) == \
+            ['rows.zarr', 'rows_re_chunked__to__200x1.zarr']
+
+    def test_re_chunk_zarr_file___succeed_compressor_and_filters(self):
+        """Test re_chunk_zarr_file :: succeed :: compressor and filters."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+
+        _, output_file = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=(-1, 1),
+            output_dir=self.test_results_dir,
+            compressor='blosc-zstd-bitshuffle',
+            filters=['delta'])
+
+        re_chunked_zarr_array = zarr.open(output_file, mode='r')
+        assert re_chunked_zarr_array.compressor.cname == 'zstd'
+        assert re_chunked_zarr_array.filters == [Delta(dtype='<i8')]
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+        re_chunked_zarr_array = re_chunk_zarr_file(
+            file_path=input_file, data_per_chunk=13, compressor=None)
+        assert re_chunked_zarr_array.compressor is None
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+    def test_re_chunk_zarr_file___succeed_zip_input_and_output(self):
+        """Test re_chunk_zarr_file :: succeed :: zip files and consolidated metadata."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr.zip')
+        zarr_ds = zarr.open(
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr'), mode='r')
+
+        re_chunked_zarr_array, output_file = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=13,
+            output_dir=self.test_results_dir,
+            store_format='zip',
+            consolidated=True)
+
+        assert os.path.basename(output_file) == \
+            'potsdam_supermarkets_re_chunked__to__13.zarr.zip'
+        assert os.path.isfile(output_file)
+        assert re_chunked_zarr_array.chunks == (13, 2)
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+        close_zarr_array(re_chunked_zarr_array)
+
+        # All the chunks and the metadata are packed in a single file
+        with zipfile.ZipFile(output_file) as zip_file:
+            assert sorted(zip_file.namelist()) == \
+                ['.zarray', '.zmetadata', '0.0', '1.0', '2.0', '3.0', '4.0']
+
+        # Re-chunk the zip file again
+        re_chunked_zarr_array, _ = re_chunk_zarr_file(
+            file_path=output_file,
+            data_per_chunk=63,
+            output_dir=self.test_results_dir)
+
+        assert re_chunked_zarr_array.nchunks == 1
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+    def test_re_chunk_zarr_file___failed_store_format_not_supported(self):
+        """Test re_chunk_zarr_file :: failed :: store format not supported."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        try:
+            re_chunk_zarr_file(
+                file_path=input_file,
+                data_per_chunk=13,
+                output_dir=self.test_results_dir,
+                store_format='tar')
+        except ValueError as e:
+            assert str(e) == 'Store format <tar> is not supported. ' + \
+                "Please use one of ['directory', 'zip']."
+
+    def test_re_chunk_zarr_file___succeed_resume_interrupted_job(self):
+        """Test re_chunk_zarr_file :: succeed :: resume after an interruption."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+        output_file = os.path.join(
+            self.test_results_dir, 'potsdam_supermarkets_re_chunked__to__5.zarr')
+        copy_block = main.copy_block
+        calls = []
+
+        def interrupted_copy_block(source, target, selection):
+            if len(calls) == 5:
+                raise KeyboardInterrupt
+            calls.append(selection)
+            copy_block(source, target, selection)
+
+        # 13 blocks of one target chunk, interrupted after 5 of them
+        with mock.patch.object(main, 'copy_block', interrupted_copy_block):
+            with self.assertRaises(KeyboardInterrupt):
+                re_chunk_zarr_file(
+                    file_path=input_file,
+                    data_per_chunk=5,
+                    output_dir=self.test_results_dir,
+                    max_mem=5 * 2 * 8)
+
+        assert not os.path.exists(output_file)
+        assert os.path.isdir(output_file + '.partial')
+
+        calls.clear()
+        with mock.patch.object(main, 'copy_block', side_effect=copy_block) as patched:
+            re_chunked_zarr_array, _ = re_chunk_zarr_file(
+                file_path=input_file,
+                data_per_chunk=5,
+                output_dir=self.test_results_dir,
+                max_mem=5 * 2 * 8)
+
+        # Only the remaining blocks are copied
+        assert patched.call_count == 8
+        assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+        assert not os.path.exists(output_file + '.partial')
+        assert '.checkpoint' not in os.listdir(output_file)
+
+    @unittest.skipUnless(HAS_FSSPEC, 'fsspec is not installed')
+    def test_re_chunk_zarr_file___succeed_remote_input_and_output(self):
+        """Test re_chunk_zarr_file :: succeed :: URL input and output."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+        input_url = 'memory://test_main/potsdam_supermarkets.zarr'
+        output_url = 'memory://test_main/output'
+        zarr.copy_store(zarr_ds.store, create_store(input_url, 'directory'))
+
+        try:
+            re_chunked_zarr_array, output_file = re_chunk_zarr_file(
+                file_path=input_url,
+                data_per_chunk=5,
+                output_dir=output_url,
+                max_mem=5 * 2 * 8 * 2,
+                workers=2,
+                consolidated=True)
+
+            assert output_file == \
+                output_url + '/potsdam_supermarkets_re_chunked__to__5.zarr'
+            assert path_exists(output_file + '/.zmetadata')
+            assert re_chunked_zarr_array.chunks == (5, 2)
+            assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+
+            with self.assertRaises(FileExistsError):
+                re_chunk_zarr_file(
+                    file_path=input_url, data_per_chunk=5, output_dir=output_url)
+
+            with self.assertRaises(ValueError):
+                re_chunk_zarr_file(
+                    file_path=input_url, data_per_chunk=7,
+                    output_dir=output_url, store_format='zip')
+        finally:
+            remove_path('memory://test_main')
+
+    def test_re_chunk_zarr_file___succeed_shared_chunk_cache(self):
+        """Test re_chunk_zarr_file :: succeed :: several layouts share a chunk cache."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+        cache = ChunkCache('1MiB')
+
+        re_chunk_zarr_file(
+            file_path=input_file, data_per_chunk=13, max_mem=13 * 2 * 8, cache=cache)
+        assert cache.misses == zarr_ds.nchunks
+        hits = cache.hits
+
+        # The second layout is read from the cache only
+        for executor in (None, 'async'):
+            re_chunked_zarr_array, output_file = re_chunk_zarr_file(
+                file_path=input_file,
+                data_per_chunk=21,
+                output_dir=self.test_results_dir,
+                executor=executor,
+                workers=2 if executor else None,
+                cache=cache)
+
+            assert cache.misses == zarr_ds.nchunks
+            assert cache.hits > hits
+            assert (re_chunked_zarr_array[:] == zarr_ds[:]).all()
+            shutil.rmtree(output_file)
+
+        # Readers of the output share the cache too
+        re_chunked_zarr_array = re_chunk_zarr_file(
+            file_path=input_file, data_per_chunk=21, cache=cache)
+        assert (cache.wrap(re_chunked_zarr_array)[:] == zarr_ds[:]).all()
+
+    def test_re_chunk_zarr_file_multi___succeed_single_pass(self):
+        """Test re_chunk_zarr_file_multi :: succeed :: several layouts from one read."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+
+        reads = []
+        getitem = zarr.Array.__getitem__
+
+        def counted_getitem(array, selection):
+            if array.chunks == zarr_ds.chunks:
+                reads.append(selection)
+            return getitem(array, selection)
+
+        for executor in (None, 'thread', 'async'):
+            reads.clear()
+            with mock.patch.object(zarr.Array, '__getitem__', counted_getitem):
+                re_chunked = re_chunk_zarr_file_multi(
+                    file_path=input_file,
+                    data_per_chunk=[3, (7, 1)],
+                    output_dir=self.test_results_dir,
+                    max_mem=21 * 2 * 8 * (pipeline_blocks(2) if executor == 'async' else 2),
+                    executor=executor,
+                    workers=2 if executor else None)
+
+            # Blocks of 21 points cover whole chunks of both layouts and
+            # every point of the source is read once
+            if executor != 'async':
+                assert len(reads) > 1
+                assert sum(s[0].stop - s[0].start for s in reads) == 63
+
+            assert [array.chunks for array, _ in re_chunked] == [(3, 2), (7, 1)]
+            assert [os.path.basename(path) for _, path in re_chunked] == [
+                'potsdam_supermarkets_re_chunked__to__3.zarr',
+                'potsdam_supermarkets_re_chunked__to__7x1.zarr']
+            for array, path in re_chunked:
+                assert (array[:] == zarr_ds[:]).all()
+                shutil.rmtree(path)
+
+        assert os.listdir(self.test_results_dir) == []
+
+        in_memory = re_chunk_zarr_file_multi(
+            file_path=input_file, data_per_chunk=[13, 'auto'])
+        assert [array.chunks for array in in_memory] == [(13, 2), (63, 2)]
+        assert (in_memory[0][:] == zarr_ds[:]).all()
+
+    def test_re_chunk_zarr_file_multi___failed_invalid_layouts(self):
+        """Test re_chunk_zarr_file_multi :: failed :: duplicated or oversized layouts."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+
+        with self.assertRaises(ValueError):
+            re_chunk_zarr_file_multi(
+                file_path=input_file, data_per_chunk=[5, (5, 2)])
+
+        # The least common multiple of 5 and 7 points does not fit in 300 bytes
+        with self.assertRaises(ValueError) as context:
+            re_chunk_zarr_file_multi(
+                file_path=input_file, data_per_chunk=[5, 7], max_mem=300)
+        assert str(context.exception).startswith(
+            'Chunk layouts [(5, 2), (7, 2)] only share whole chunks in blocks of (35, 2)')
+
+    def test_re_chunk_zarr_file___succeed_uncompressed_memory_formats(self):
+        """Test re_chunk_zarr_file :: succeed :: numpy and memmap results in target chunks."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zarr_ds = zarr.open(input_file, mode='r')
+
+        for memory_format, array_type in (('numpy', np.ndarray), ('memmap', np.memmap)):
+            for executor in (None, 'thread', 'async'):
+                re_chunked = re_chunk_zarr_file(
+                    file_path=input_file,
+                    data_per_chunk=13,
+                    max_mem=10 * 2 * 8 * 2,
+                    executor=executor,
+                    workers=2 if executor else None,
+                    memory_format=memory_format)
+
+                assert isinstance(re_chunked, RechunkedView)
+                assert isinstance(re_chunked.array, array_type)
+                assert re_chunked.dtype == zarr_ds.dtype
+                assert (re_chunked.array == zarr_ds[:]).all()
+
+                # Batches follow the requested chunks, not the source chunks
+                assert re_chunked.chunks == (13, 2)
+                assert len(re_chunked) == -(-zarr_ds.shape[0] // 13)
+                assert (re_chunked[1] == zarr_ds[13:26]).all()
+                assert (np.concatenate(list(re_chunked)) == zarr_ds[:]).all()
+                re_chunked.close()
+
+        with self.assertRaises(ValueError):
+            re_chunk_zarr_file(
+                file_path=input_file, data_per_chunk=13, memory_format='gpu')
+
+    def test_re_chunk_zarr_file___succeed_uncompressed_without_copy(self):
+        """Test re_chunk_zarr_file :: succeed :: uncompressed results hold the only copy."""
+        input_file = os.path.join(self.test_results_dir, 'points.zarr')
+        data = np.arange(200_000, dtype='float64').reshape(100_000, 2)
+        zarr.save_array(input_file, data, chunks=(2_000, 2))
+
+        for memory_format, limit in (('numpy', 1.25), ('memmap', 0.25)):
+            tracemalloc.start()
+            try:
+                re_chunked = re_chunk_zarr_file(
+                    file_path=input_file, data_per_chunk=10_000, memory_format=memory_format)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            assert peak < limit * data.nbytes, memory_format
+            assert (re_chunked.array == data).all()
+            re_chunked.close()
+
+    def test_open_re_chunked_view___succeed(self):
+        """Test open_re_chunked_view :: succeed :: lazy batches of a zarr file."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zip_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr.zip')
+        zarr_ds = zarr.open(input_file, mode='r')
+        cache = ChunkCache('1MiB')
+
+        with open_re_chunked_view(input_file, 13, cache=cache) as view:
+            assert view.chunks == (13, 2)
+            assert (np.concatenate(list(view)) == zarr_ds[:]).all()
+            assert cache.misses == zarr_ds.nchunks
+
+        with open_re_chunked_view(zip_file, 'auto') as view:
+            assert len(view) == 1
+            assert (view[0] == zarr_ds[:]).all()
+
+        with self.assertRaises(FileNotFoundError):
+            open_re_chunked_view(os.path.join(self.test_data_dir, 'missing.zarr'), 13)
+
+        with self.assertRaises(ValueError):
+            open_re_chunked_view(input_file, 0)
+
+    def test_re_chunk_zarr_file___succeed_metrics(self):
+        """Test re_chunk_zarr_file :: succeed :: stages, counters and progress."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+
+        fractions = []
+        for executor, stages in (
+                (None, {'read', 'write', 'finalize'}),
+                ('thread', {'read', 'write', 'finalize'}),
+                ('async', {'read', 'transcode', 'write', 'finalize'}),
+                ('process', {'copy', 'finalize'})):
+            fractions.clear()
+            metrics = Metrics(progress=lambda m: fractions.append(m.fraction))
+            output = os.path.join(self.test_results_dir, f'{executor}')
+            os.mkdir(output)
+            re_chunk_zarr_file(
+                file_path=input_file,
+                data_per_chunk=13,
+                output_dir=output,
+                max_mem=13 * 2 * 8 * 2 * (pipeline_blocks(2) if executor == 'async' else 2),
+                executor=executor,
+                workers=2 if executor else None,
+                metrics=metrics)
+
+            assert set(metrics.stages) == stages, executor
+            assert metrics.points == 63
+            assert metrics.blocks == metrics.blocks_total > 1
+            assert metrics.bytes_written == 63 * 2 * 8
+            assert metrics.chunks_written == 5
+            assert len(fractions) == metrics.blocks and max(fractions) == 1.0
+            assert metrics.error is None
+
+    def test_query_zarr_file___succeed_bbox_index_kept(self):
+        """Test query_zarr_file :: succeed :: re-chunked copies keep the bounding-box index."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        points = sort_points(zarr.open(input_file, mode='r')[:], 'zorder')
+        sorted_file = os.path.join(self.test_results_dir, 'sorted.zarr')
+        zarr_ds = zarr.open_array(sorted_file, mode='w', shape=points.shape, chunks=(7, 2))
+        zarr_ds[:] = points
+        zarr_ds.attrs[BBOX_INDEX_KEY] = bbox_index('zorder', 7, chunk_bboxes(points, 7))
+
+        bbox = (13.0, 52.35, 13.1, 52.42)
+        inside = points[
+            (points[:, 0] >= bbox[0]) & (points[:, 0] <= bbox[2]) &
+            (points[:, 1] >= bbox[1]) & (points[:, 1] <= bbox[3])]
+        assert len(inside)
+        assert (query_zarr_file(sorted_file, bbox) == inside).all()
+
+        for data_per_chunk in (14, 13):
+            re_chunked, output = re_chunk_zarr_file(
+                file_path=sorted_file,
+                data_per_chunk=data_per_chunk,
+                output_dir=self.test_results_dir,
+                store_format='zip')
+            close_zarr_array(re_chunked)
+
+            zarr_ds = open_zarr_array(output)
+            assert zarr_ds.attrs[BBOX_INDEX_KEY]['bboxes'] == \
+                chunk_bboxes(points, data_per_chunk).tolist()
+            close_zarr_array(zarr_ds)
+            assert (query_zarr_file(output, bbox, cache=ChunkCache('1MiB')) == inside).all()
+
+        in_memory = re_chunk_zarr_file(file_path=sorted_file, data_per_chunk=21)
+        assert in_memory.attrs[BBOX_INDEX_KEY]['chunk_rows'] == 21
+
+    def test_query_zarr_file___succeed_encoded_bbox_index(self):
+        """Test query_zarr_file :: succeed :: re-chunked boxes bound the encoded points."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        points = sort_points(zarr.open(input_file, mode='r')[:], 'hilbert')
+        sorted_file = os.path.join(self.test_results_dir, 'sorted.zarr')
+        zarr_ds = zarr.open_array(sorted_file, mode='w', shape=points.shape, chunks=(10, 2))
+        zarr_ds[:] = points
+        zarr_ds.attrs[BBOX_INDEX_KEY] = bbox_index('hilbert', 10, chunk_bboxes(points, 10))
+
+        # Boxes merged from the source index and read from the source
+        for data_per_chunk, store_format in ((20, 'zip'), (13, 'directory')):
+            for encoding_name, max_error in (('float32', None), ('int32', 1e-3)):
+                re_chunked, output = re_chunk_zarr_file(
+                    file_path=sorted_file,
+                    data_per_chunk=data_per_chunk,
+                    output_dir=self.test_results_dir,
+                    store_format=store_format,
+                    encoding=encoding_name,
+                    max_error=max_error)
+                close_zarr_array(re_chunked)
+
+                zarr_ds = open_zarr_array(output)
+                stored = zarr_ds[:]
+                assert zarr_ds.attrs[BBOX_INDEX_KEY]['bboxes'] == \
+                    chunk_bboxes(stored, data_per_chunk).tolist()
+                close_zarr_array(zarr_ds)
+                for x, y in stored:
+                    assert len(query_zarr_file(output, (x, y, x, y))) > 0
+                remove_path(output)
+
+    def test_re_chunk_zarr_file___succeed_property_columns(self):
+        """Test re_chunk_zarr_file :: succeed :: property columns re-chunked with the points."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        points = zarr.open(input_file, mode='r')[:]
+        frame = pd.DataFrame({
+            'name': [f'shop {i % 5}' for i in range(len(points))],
+            'rank': np.arange(len(points), dtype=np.int32)})
+        group_file = os.path.join(self.test_results_dir, 'group.zarr')
+        zarr_ds = zarr.open_array(
+            group_file, mode='w', path=COORDINATES_KEY, shape=points.shape, chunks=(10, 2))
+        zarr_ds[:] = points
+        write_properties(zarr_ds, frame, zarr_ds.compressor)
+
+        outputs = [
+            re_chunk_zarr_file(
+                file_path=group_file, data_per_chunk=7, output_dir=self.test_results_dir,
+                max_mem=7 * 2 * 8),
+            re_chunk_zarr_file(
+                file_path=group_file, data_per_chunk=9, output_dir=self.test_results_dir,
+                store_format='zip'),
+            *re_chunk_zarr_file_multi(
+                file_path=group_file, data_per_chunk=[3, 5],
+                output_dir=self.test_results_dir)]
+        targets = [re_chunked for re_chunked, _ in outputs] + [
+            re_chunk_zarr_file(file_path=group_file, data_per_chunk=11)]
+
+        for target in targets:
+            assert target.path == COORDINATES_KEY
+            assert (target[:] == points).all()
+            columns = property_columns(target)
+            assert {column.chunks for column in columns.values()} == {(target.chunks[0],)}
+            assert columns['name'].dtype == property_columns(zarr_ds)['name'].dtype
+            assert read_properties(target).equals(frame)
+            close_zarr_array(target)
+
+        uncompressed = re_chunk_zarr_file(
+            file_path=group_file, data_per_chunk=11, memory_format='numpy')
+        assert (uncompressed.array == points).all()
+
+    def test_re_chunk_zarr_file___succeed_encoding(self):
+        """Test re_chunk_zarr_file :: succeed :: encodings set or kept, decoded on read."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        points = zarr.open(input_file, mode='r')[:]
+
+        re_chunked, output = re_chunk_zarr_file(
+            file_path=input_file,
+            data_per_chunk=7,
+            output_dir=self.test_results_dir,
+            filters=['delta'],
+            encoding='int32',
+            max_error=1e-5)
+        assert re_chunked.dtype == points.dtype
+        assert [codec.codec_id for codec in re_chunked.filters] == ['fixedscaleoffset', 'delta']
+        assert abs(re_chunked[:] - points).max() <= 1e-5
+        assert re_chunked.nbytes_stored < zarr.open(input_file, mode='r').nbytes_stored
+
+        # The encoding of the source is kept unless another is given
+        kept, float32 = re_chunk_zarr_file_multi(
+            file_path=output, data_per_chunk=[3, 9])
+        assert kept.filters == re_chunked.filters[:1]
+        assert (kept[:] == re_chunked[:]).all()
+        float32 = re_chunk_zarr_file(file_path=output, data_per_chunk=9, encoding='float32')
+        assert float32.filters[0].codec_id == 'astype'
+        assert re_chunk_zarr_file(
+            file_path=output, data_per_chunk=9, encoding='float64').filters is None
+
+        # The range of an indexed source comes from its index
+        sorted_file = os.path.join(self.test_results_dir, 'sorted.zarr')
+        zarr_ds = zarr.open_array(sorted_file, mode='w', shape=points.shape, chunks=(7, 2))
+        zarr_ds[:] = points
+        zarr_ds.attrs[BBOX_INDEX_KEY] = bbox_index(None, 7, chunk_bboxes(points, 7))
+        with mock.patch.object(encoding, 'coordinate_range') as coordinate_range:
+            in_memory = re_chunk_zarr_file(
+                file_path=sorted_file, data_per_chunk=21, encoding='int32')
+        coordinate_range.assert_not_called()
+        assert in_memory.filters[0].offset == 33
+
+        with self.assertRaises(ValueError):
+            re_chunk_zarr_file(
+                file_path=input_file, data_per_chunk=7, encoding='int32', max_error=1e-9)
@@ -0,0 +1,120 @@
+"""Test utils.cache module."""
+
+import gc
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.cache import ChunkCache
+
+
+class TestUtilsCache(unittest.TestCase):
+    """
+    Test utils.cache module.
+
+    This class contains tests for the functions in the utils.cache module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method creates a zarr array of 63 points in chunks of 10.
+        """
+        self.data = np.arange(126, dtype='float64').reshape(63, 2)
+        self.array = zarr.array(self.data, chunks=(10, 2))
+
+    def test_chunk_cache___succeed_read(self):
+        """Test ChunkCache :: succeed :: read selections through the cache."""
+        cache = ChunkCache('1KiB')
+        cached = cache.wrap(self.array)
+
+        assert (cached[5:25] == self.data[5:25]).all()
+        assert (cached[:] == self.data).all()
+        assert (cached[62] == self.data[62]).all()
+        assert (cached[-3:, 1] == self.data[-3:, 1]).all()
+        assert cached[3, 1] == self.data[3, 1]
+        assert cached[30:30].shape == (0, 2)
+        assert (cached[::2] == self.data[::2]).all()
+        assert cached.shape == (63, 2) and cached.chunks == (10, 2)
+
+        # 3 chunks first, then the 4 others
+        assert cache.misses == 7
+        assert cache.hits == 3 + 1 + 1 + 1
+        assert len(cache) == 7
+        assert cache.nbytes == self.data.nbytes
+
+    def test_chunk_cache___succeed_lru_eviction(self):
+        """Test ChunkCache :: succeed :: least recently used chunks are evicted."""
+        # Room for two chunks of 160 bytes
+        cache = ChunkCache(400)
+
+        cache.read(self.array, slice(0, 10))
+        cache.read(self.array, slice(10, 20))
+        cache.read(self.array, slice(0, 10))
+        cache.read(self.array, slice(20, 30))
+
+        assert len(cache) == 2
+        assert cache.nbytes == 320
+
+        # The second chunk was the least recently used
+        cache.read(self.array, slice(0, 10))
+        assert cache.hits == 2
+        cache.read(self.array, slice(10, 20))
+        assert cache.misses == 4
+
+        cache.clear()
+        assert len(cache) == cache.hits == cache.misses == cache.nbytes == 0
+
+    def test_chunk_cache___succeed_runs_of_missing_chunks(self):
+        """Test ChunkCache :: succeed :: only runs of missing chunks are read."""
+        cache = ChunkCache('1MiB')
+        cache.read(self.array, slice(10, 20))
+        cache.read(self.array, slice(40, 50))
+
+        reads = []
+        getitem = zarr.Array.__getitem__
+
+        def counted_getitem(array, selection):
+            reads.append(selection[0])
+            return getitem(array, selection)
+
+        with mock.patch.object(zarr.Array, '__getitem__', counted_getitem):
+            assert (cache.read(self.array, slice(None)) == self.data).all()
+
+        assert reads == [slice(0, 10), slice(20, 40), slice(50, 63)]
+        assert cache.hits == 2
+        assert cache.misses == 2 + 5
+
+    def test_chunk_cache___succeed_in_memory_stores(self):
+        """Test ChunkCache :: succeed :: collected stores never share chunks."""
+        cache = ChunkCache('1MiB')
+        for value in range(20):
+            array = zarr.array(np.full((63, 2), value), chunks=(10, 2))
+            assert (cache.read(array, slice(None)) == value).all()
+            del array
+            gc.collect()
+
+        assert cache.hits == 0
+        assert cache.misses == 20 * 7
+
+    def test_chunk_cache___succeed_threads(self):
+        """Test ChunkCache :: succeed :: concurrent reads."""
+        cache = ChunkCache('1MiB')
+        selections = [slice(i, i + 7) for i in range(0, 63, 7)] * 4
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda s: cache.read(self.array, s), selections))
+
+        for selection, result in zip(selections, results):
+            assert (result == self.data[selection]).all()
+        assert cache.hits + cache.misses == 4 * 15
+        assert cache.nbytes == self.data.nbytes
+
+    def test_chunk_cache___failed_invalid_size(self):
+        """Test ChunkCache :: failed :: invalid size."""
+        with self.assertRaises(ValueError):
+            ChunkCache('a lot')
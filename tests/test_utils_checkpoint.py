@@ -0,0 +1,69 @@
+"""Test utils.checkpoint module."""
+
+import os
+import shutil
+import unittest
+from pathlib import Path
+
+from rechunk_zarr_ds.utils.checkpoint import Checkpoint
+
+
+class TestUtilsCheckpoint(unittest.TestCase):
+    """
+    Test utils.checkpoint module.
+
+    This class contains tests for the functions in the utils.checkpoint module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method creates the directory for test results.
+        """
+        parent_dir = os.path.dirname(__file__)
+        test_results_dir = os.path.join(parent_dir, 'results')
+        Path(test_results_dir).mkdir(parents=True, exist_ok=True)
+        self.test_results_dir = test_results_dir
+
+    def tearDown(self):
+        """
+        Tear down the test environment.
+
+        This method removes the test results directory.
+        """
+        shutil.rmtree(self.test_results_dir)
+
+    def test_checkpoint___succeed_resume(self):
+        """Test Checkpoint :: succeed :: resume the same job."""
+        path = os.path.join(self.test_results_dir, '.checkpoint')
+        job = {'chunks': (13, 2)}
+
+        checkpoint = Checkpoint(path, job)
+        assert not checkpoint.resumed
+        with checkpoint:
+            checkpoint.commit('0:0')
+            checkpoint.commit('0:1')
+
+        checkpoint = Checkpoint(path, job)
+        assert checkpoint.resumed
+        assert checkpoint.is_done('0:1')
+        assert not checkpoint.is_done('0:2')
+        with checkpoint:
+            checkpoint.commit('0:2')
+
+        assert Checkpoint(path, job).done == {'0:0', '0:1', '0:2'}
+
+        checkpoint.remove()
+        assert not os.path.exists(path)
+
+    def test_checkpoint___succeed_start_over_other_job(self):
+        """Test Checkpoint :: succeed :: start over for another job."""
+        path = os.path.join(self.test_results_dir, '.checkpoint')
+
+        with Checkpoint(path, {'chunks': (13, 2)}) as checkpoint:
+            checkpoint.commit('0:0')
+
+        checkpoint = Checkpoint(path, {'chunks': (17, 2)})
+        assert not checkpoint.resumed
+        assert not checkpoint.is_done('0:0')
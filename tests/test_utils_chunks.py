@@ -0,0 +1,138 @@
+"""Test utils.chunks module."""
+
+import unittest
+
+from rechunk_zarr_ds.utils.chunks import (
+    block_shape, chunks_label, common_chunks, iter_blocks, normalize_chunks, parse_size,
+    plan_chunks)
+
+
+class TestUtilsChunks(unittest.TestCase):
+    """
+    Test utils.chunks module.
+
+    This class contains tests for the functions in the utils.chunks module.
+    """
+
+    def test_parse_size___succeed(self):
+        """Test parse_size :: succeed."""
+        assert parse_size(1024) == 1024
+        assert parse_size('1KiB') == 1024
+        assert parse_size('1.5 MB') == 1_500_000
+        assert parse_size('64') == 64
+
+    def test_parse_size___failed_invalid_size(self):
+        """Test parse_size :: failed :: invalid size."""
+        try:
+            parse_size('a lot')
+        except ValueError as e:
+            assert str(e) == 'Unable to parse memory size <a lot>.'
+
+        try:
+            parse_size(0)
+        except ValueError as e:
+            assert str(e) == 'Memory size must be greater than 0.'
+
+    def test_block_shape___succeed(self):
+        """Test block_shape :: succeed."""
+        # Without budget the block is the whole array
+        assert block_shape((63, 2), (13, 2), 8) == (63, 2)
+        # Blocks are made of whole target chunks
+        assert block_shape((63, 2), (13, 2), 8, max_mem=500) == (26, 2)
+        # Blocks are aligned with source chunks when the budget allows it
+        assert block_shape(
+            (1000, 2), (10, 2), 8, max_mem=16 * 45, source_chunks=(15, 2)) == (30, 2)
+        # Outer axes only grow once inner axes span the array
+        assert block_shape((100, 100), (10, 10), 1, max_mem=500) == (10, 50)
+
+    def test_block_shape___failed_budget_smaller_than_chunk(self):
+        """Test block_shape :: failed :: budget smaller than a chunk."""
+        try:
+            block_shape((63, 2), (13, 2), 8, max_mem=100)
+        except ValueError as e:
+            assert str(e) == 'Memory budget <100> bytes is smaller than ' + \
+                'a single target chunk <208> bytes.'
+
+    def test_common_chunks___succeed(self):
+        """Test common_chunks :: succeed."""
+        assert common_chunks((1000, 2), [(10, 2), (100, 1)], 8) == (100, 2)
+        assert common_chunks((1000, 2), [(10, 2), (4, 2)], 8, max_mem=320) == (20, 2)
+        # Coprime chunk sizes span the whole axis
+        assert common_chunks((5000, 2), [(333, 2), (1000, 2), (7, 2)], 8) == (5000, 2)
+
+    def test_common_chunks___failed_budget_smaller_than_block(self):
+        """Test common_chunks :: failed :: coprime layouts over the budget."""
+        with self.assertRaises(ValueError) as context:
+            common_chunks((5000, 2), [(333, 2), (1000, 2), (7, 2)], 8, max_mem=10 ** 4)
+
+        assert str(context.exception) == \
+            'Chunk layouts [(333, 2), (1000, 2), (7, 2)] only share whole chunks ' + \
+            'in blocks of (5000, 2) that take <80000> bytes, more than the ' + \
+            'memory budget <10000> bytes. Please use chunk sizes that are ' + \
+            'multiples of each other or re-chunk the layouts separately.'
+
+    def test_iter_blocks___succeed(self):
+        """Test iter_blocks :: succeed."""
+        blocks = list(iter_blocks((63, 2), (26, 2)))
+        assert blocks == [
+            (slice(0, 26), slice(0, 2)),
+            (slice(26, 52), slice(0, 2)),
+            (slice(52, 63), slice(0, 2))]
+
+        assert not list(iter_blocks((0, 2), (26, 2)))
+
+    def test_plan_chunks___succeed(self):
+        """Test plan_chunks :: succeed."""
+        # Rows of two float64 coordinates in chunks of 1 MiB
+        assert plan_chunks((10 ** 6, 2), 'float64', '1MiB') == (65536, 2)
+        assert plan_chunks(
+            (10 ** 6, 2), 'float64', '1MiB', access='column') == (131072, 1)
+        # Chunks are clipped to the array but not to a growable axis
+        assert plan_chunks((63, 2), 'float64') == (63, 2)
+        assert plan_chunks((0, 2), 'float64', '1MiB') == (65536, 2)
+
+    def test_plan_chunks___failed_access_pattern_not_supported(self):
+        """Test plan_chunks :: failed :: access pattern not supported."""
+        try:
+            plan_chunks((63, 2), 'float64', access='diagonal')
+        except ValueError as e:
+            assert str(e) == 'Access pattern <diagonal> is not supported. ' + \
+                "Please use one of ['row', 'column']."
+
+    def test_normalize_chunks___succeed(self):
+        """Test normalize_chunks :: succeed."""
+        assert normalize_chunks(13, (63, 2), 'float64') == (13, 2)
+        assert normalize_chunks((13, 1), (63, 2), 'float64') == (13, 1)
+        assert normalize_chunks('auto', (63, 2), 'float64') == (63, 2)
+        assert normalize_chunks('160B', (63, 2), 'float64') == (10, 2)
+
+        try:
+            normalize_chunks(0, (63, 2), 'float64')
+        except ValueError as e:
+            assert str(e) == 'Chunk size must be greater than 0.'
+
+    def test_normalize_chunks___succeed_multi_dimensional(self):
+        """Test normalize_chunks :: succeed :: multi-dimensional specs."""
+        assert normalize_chunks((1000, 1), (10 ** 6, 2), 'float64') == (1000, 1)
+        assert normalize_chunks((-1, 1), (10 ** 6, 2), 'float64') == (10 ** 6, 1)
+        assert normalize_chunks({1: 1}, (10 ** 6, 2), 'float64') == (10 ** 6, 1)
+        assert normalize_chunks(
+            {0: 10, 2: 4}, (100, 20, 8), 'float64') == (10, 20, 4)
+
+    def test_normalize_chunks___failed_axes_not_in_array(self):
+        """Test normalize_chunks :: failed :: axes not in array."""
+        try:
+            normalize_chunks((10, 1, 1), (63, 2), 'float64')
+        except ValueError as e:
+            assert str(e) == \
+                'Chunk specification has axes [0, 1, 2] but the array has 2 axes.'
+
+        try:
+            normalize_chunks({0: -2}, (63, 2), 'float64')
+        except ValueError as e:
+            assert str(e) == 'Chunk size must be greater than 0.'
+
+    def test_chunks_label___succeed(self):
+        """Test chunks_label :: succeed."""
+        assert chunks_label((13, 2), (63, 2)) == '13'
+        assert chunks_label((1000, 1), (10 ** 6, 2)) == '1000x1'
@@ -0,0 +1,60 @@
+"""Test utils.codecs module."""
+
+import unittest
+
+import numpy as np
+from numcodecs import Blosc, Delta, Shuffle, Zstd
+
+from rechunk_zarr_ds.utils.codecs import (
+    benchmark_codecs, get_compressor, get_filters)
+
+
+class TestUtilsCodecs(unittest.TestCase):
+    """
+    Test utils.codecs module.
+
+    This class contains tests for the functions in the utils.codecs module.
+    """
+
+    def test_get_compressor___succeed(self):
+        """Test get_compressor :: succeed."""
+        assert get_compressor('default') == 'default'
+        assert get_compressor('none') is None
+        assert get_compressor(None) is None
+        assert get_compressor('zstd') == Zstd(level=5)
+        assert get_compressor('blosc-zstd-bitshuffle') == \
+            Blosc(cname='zstd', clevel=5, shuffle=Blosc.BITSHUFFLE)
+
+    def test_get_compressor___failed_not_supported(self):
+        """Test get_compressor :: failed :: compressor not supported."""
+        try:
+            get_compressor('rar')
+        except ValueError as e:
+            assert str(e).startswith('Compressor <rar> is not supported.')
+
+    def test_get_filters___succeed(self):
+        """Test get_filters :: succeed."""
+        assert get_filters(None, 'float64') is None
+        assert get_filters(['delta', 'shuffle'], 'float64') == \
+            [Delta(dtype='<i8'), Shuffle(elementsize=8)]
+
+        try:
+            get_filters(['sort'], 'float64')
+        except ValueError as e:
+            assert str(e) == \
+                "Filter <sort> is not supported. Please use one of ['delta', 'shuffle']."
+
+    def test_benchmark_codecs___succeed(self):
+        """Test benchmark_codecs :: succeed."""
+        data = np.sort(np.random.default_rng(0).uniform(13, 14, 10_000))
+
+        results = benchmark_codecs(
+            data, compressors=['none', 'zstd'], filters=[(), ('delta',)], repeat=1)
+
+        assert len(results) == 4
+        assert {result['compressor'] for result in results} == {'none', 'zstd'}
+        assert results[-1]['ratio'] == 1.0
+        assert all(result['encode_mb_s'] > 0 for result in results)
+        # Delta on sorted coordinates compresses better than the raw values
+        ratios = {(r['compressor'], r['filters']): r['ratio'] for r in results}
+        assert ratios[('zstd', 'delta')] > ratios[('zstd', 'none')]
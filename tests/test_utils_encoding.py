@@ -0,0 +1,96 @@
+"""Test utils.encoding module."""
+
+import math
+import unittest
+
+import numpy as np
+import zarr
+from numcodecs import AsType, Delta, FixedScaleOffset
+
+from rechunk_zarr_ds.utils.encoding import (
+    MAX_ERROR, center_encoding, check_encoding, combine_filters, coordinate_range,
+    decoded_values, encoding_error, encoding_filters, get_encoding)
+
+
+class TestUtilsEncoding(unittest.TestCase):
+    """
+    Test utils.encoding module.
+
+    This class contains tests for the functions in the utils.encoding module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method creates random points with full precision.
+        """
+        rng = np.random.default_rng(0)
+        self.points = np.column_stack([
+            rng.uniform(12.9, 13.2, 1000), rng.uniform(52.3, 52.5, 1000)])
+
+    def test_get_encoding___succeed(self):
+        """Test get_encoding :: succeed :: filters of each encoding."""
+        assert not get_encoding('float64')
+
+        (codec,) = get_encoding('float32')
+        assert isinstance(codec, AsType)
+        assert codec.encode_dtype == np.dtype('<f4')
+
+        (codec,) = get_encoding('int32')
+        assert isinstance(codec, FixedScaleOffset)
+        assert 0.5 / codec.scale <= MAX_ERROR
+        assert get_encoding('int32', max_error=2e-7)[0].scale == 1e7
+
+        filters = combine_filters(get_encoding('int32'), ['delta'], 'float64')
+        assert filters[1] == Delta(dtype='<i4')
+        assert encoding_filters(filters) == filters[:1]
+        assert combine_filters([], None, 'float64') is None
+
+        for encoding, max_error in (('float16', None), ('int32', 0)):
+            with self.assertRaises(ValueError):
+                get_encoding(encoding, max_error=max_error)
+
+    def test_encoding___succeed_round_trip(self):
+        """Test encoding :: succeed :: zarr arrays decode within the maximum error."""
+        low, high = coordinate_range(self.points)
+
+        for encoding, max_error in (('float32', 1e-5), ('int32', 1e-6), ('int32', 1e-7)):
+            filters = center_encoding(get_encoding(encoding, max_error=max_error), low, high)
+            check_encoding(filters, low, high, max_error)
+
+            z = zarr.array(self.points, chunks=(100, 2), filters=filters)
+            assert z.dtype == np.float64
+            assert (decoded_values(z.filters, self.points) == z[:]).all()
+            error = np.abs(z[:] - self.points).max()
+            assert error <= encoding_error(filters, low, high) <= max_error
+            assert z.nbytes_stored < zarr.array(self.points, chunks=(100, 2)).nbytes_stored
+
+    def test_check_encoding___failed(self):
+        """Test check_encoding :: failed :: errors and overflows beyond the encoding."""
+        filters = get_encoding('int32', max_error=1e-9)
+        assert math.isinf(encoding_error(filters, 12.9, 52.5))
+        assert encoding_error(center_encoding(filters, 52.3, 52.5), 52.3, 52.5) == 5e-10
+
+        with self.assertRaises(ValueError):
+            check_encoding(filters, 12.9, 52.5)
+        with self.assertRaises(ValueError):
+            check_encoding(get_encoding('float32'), 12.9, 52.5, max_error=1e-6)
+        check_encoding(get_encoding('float32'), 12.9, 52.5)
+        check_encoding(filters, math.nan, math.nan)
+
+    def test_coordinate_range___succeed(self):
+        """Test coordinate_range :: succeed :: zarr arrays read in blocks."""
+        z = zarr.array(self.points, chunks=(7, 2))
+
+        assert coordinate_range(z) == coordinate_range(self.points) == \
+            (self.points.min(), self.points.max())
+        assert all(math.isnan(value) for value in coordinate_range(np.empty((0, 2))))
+
+    def test_decoded_values___succeed(self):
+        """Test decoded_values :: succeed :: missing values and plain arrays kept."""
+        filters = center_encoding(get_encoding('int32', max_error=1e-3), 13.0, 13.2)
+        decoded = decoded_values(filters, np.array([[13.12345, math.nan]]))
+        assert decoded[0, 0] == 13.123
+        assert math.isnan(decoded[0, 1])
+        assert decoded_values(None, self.points) is self.points
@@ -0,0 +1,67 @@
+"""Test utils.geojson module."""
+
+import json
+import os
+import unittest
+
+import geopandas as gp
+import numpy as np
+
+from rechunk_zarr_ds.utils.geojson import (
+    iter_features, iter_point_blocks, points_to_array)
+
+
+class TestUtilsGeojson(unittest.TestCase):
+    """
+    Test utils.geojson module.
+
+    This class contains tests for the functions in the utils.geojson module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method sets the directory of the test data.
+        """
+        parent_dir = os.path.dirname(__file__)
+        self.test_data_dir = os.path.join(parent_dir, 'data/json_files')
+
+    def test_points_to_array___succeed(self):
+        """Test points_to_array :: succeed."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+        gdf = gp.read_file(input_file)
+
+        points_np = points_to_array(gdf.geometry)
+
+        assert points_np.shape == (63, 2)
+        assert points_np.dtype == 'float64'
+        assert np.array_equal(
+            points_np,
+            np.array([[geom.x, geom.y] for geom in gdf.geometry]))
+
+    def test_iter_features___succeed(self):
+        """Test iter_features :: succeed :: small read buffer."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+        with open(input_file, encoding='utf-8') as file:
+            expected = json.load(file)['features']
+
+        assert list(iter_features(input_file, read_size=7)) == expected
+
+    def test_iter_point_blocks___succeed(self):
+        """Test iter_point_blocks :: succeed."""
+        features = [
+            {'geometry': {'type': 'Point', 'coordinates': [i, -i]}}
+            for i in range(5)]
+        features.append({'geometry': None})
+        features.append({'geometry': {'type': 'Point', 'coordinates': []}})
+
+        with self.assertLogs(level='WARNING') as logs:
+            blocks = list(iter_point_blocks(features, block_size=2))
+        assert 'Skipped 2 features without geometry.' in logs.output[0]
+        assert [len(block) for block in blocks] == [2, 2, 1]
+        assert np.array_equal(
+            np.concatenate(blocks),
+            np.array([[i, -i] for i in range(5)], dtype=np.float64))
@@ -1,16 +1,26 @@
 """Test utils.main module."""
 
+import json
 import os
 import shutil
 import unittest
+import zipfile
 from pathlib import Path
 
+import geopandas as gp
 import zarr
 
+from rechunk_zarr_ds.utils.geojson import points_to_array
 from rechunk_zarr_ds.utils.main import create_zarr_file
+from rechunk_zarr_ds.utils.metrics import Metrics
+from rechunk_zarr_ds.utils.properties import property_columns, read_properties
+from rechunk_zarr_ds.utils.spatial import (
+    BBOX_INDEX_KEY, chunk_bboxes, query_bbox, sort_order, sort_points)
+from rechunk_zarr_ds.utils.stores import (
+    COORDINATES_KEY, close_zarr_array, open_zarr_array)
 
 
-class TestUtilsMain(unittest.TestCase):
+class TestUtilsMain(unittest.TestCase):  # pylint: disable=too-many-public-methods
     """
     Test utils.main module.
 
@@ -183,3 +193,415 @@ class TestUtilsMain(unittest.TestCase):
                 output_dir=self.test_results_dir)
         except ValueError as e:
             assert 'Geometry of type <Polygon> is not supported.' in str(e)
+
+    def test_generate_zarr_file___succeed_streaming(self):
+        """Test generating zarr file :: succeed :: streaming mode."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+
+        output = create_zarr_file(
+            source_path=input_file,
+            output_dir=self.test_results_dir,
+            streaming=True,
+            block_size=10)
+
+        zarr_ds = zarr.open(output, mode='r')
+        assert zarr_ds.shape == (63, 2)
+        assert zarr_ds.chunks == (1, 2)
+        assert zarr_ds.dtype == 'float64'
+
+        expected = points_to_array(gp.read_file(input_file).geometry)
+        assert (zarr_ds[:] == expected).all()
+
+    def test_generate_zarr_file___succeed_streaming_whole_chunks_and_null_geometries(self):
+        """Test generating zarr file :: succeed :: whole chunks, null geometries skipped."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+        with open(input_file, encoding='utf-8') as file:
+            feature_collection = json.load(file)
+        for index in (3, 5):
+            feature_collection['features'][index]['geometry'] = None
+        null_file = os.path.join(self.test_results_dir, 'null_geometries.json')
+        with open(null_file, 'w', encoding='utf-8') as file:
+            json.dump(feature_collection, file)
+
+        outputs = []
+        points = []
+        for streaming in (False, True):
+            points.clear()
+            with self.assertLogs(level='WARNING') as logs:
+                output = create_zarr_file(
+                    source_path=null_file,
+                    output_dir=self.test_results_dir,
+                    streaming=streaming,
+                    block_size=15,
+                    chunks=10,
+                    metrics=Metrics(progress=lambda m: points.append(m.points)))
+            assert 'Skipped 2 features without geometry.' in logs.output[0]
+            outputs.append(zarr.open(output, mode='r')[:])
+            shutil.rmtree(output)
+
+        # Blocks are rounded up from 15 to 20 points, two whole chunks
+        assert points == [20, 40, 60, 61]
+        assert outputs[0].shape == (61, 2)
+        assert (outputs[0] == outputs[1]).all()
+
+    def test_generate_zarr_file___failed_streaming_invalid_input(self):
+        """Test generating zarr file :: failed :: streaming invalid inputs."""
+        for file_name, error, message in [
+                ('potsdam_supermarkets_invalid.json', IOError,
+                 'Failed to read source file.'),
+                ('potsdam_supermarkets_no_geom.json', ValueError,
+                 'There is no point geometry in the source file.'),
+                ('potsdam_supermarkets_point_line.json', ValueError,
+                 'Multiple geometry types found in file.'),
+                ('potsdam_supermarkets_polygon.json', ValueError,
+                 'Geometry of type <Polygon> is not supported.')]:
+            input_file = os.path.join(self.test_data_dir, file_name)
+            with self.assertRaises(error) as context:
+                create_zarr_file(
+                    source_path=input_file,
+                    output_dir=self.test_results_dir,
+                    streaming=True)
+
+            assert message in str(context.exception)
+            # No partial output is left behind
+            assert not os.listdir(self.test_results_dir)
+
+    def test_generate_zarr_file___succeed_auto_chunks(self):
+        """Test generating zarr file :: succeed :: planned chunks."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+
+        output = create_zarr_file(
+            source_path=input_file,
+            output_dir=self.test_results_dir,
+            chunks='auto')
+
+        zarr_ds = zarr.open(output, mode='r')
+        assert zarr_ds.shape == (63, 2)
+        assert zarr_ds.chunks == (63, 2)
+        assert zarr_ds.nchunks == 1
+
+        shutil.rmtree(output)
+
+        output = create_zarr_file(
+            source_path=input_file,
+            output_dir=self.test_results_dir,
+            streaming=True,
+            chunks='1KiB')
+
+        zarr_ds = zarr.open(output, mode='r')
+        assert zarr_ds.shape == (63, 2)
+        assert zarr_ds.chunks == (64, 2)
+
+    def test_generate_zarr_file___succeed_compressor_and_filters(self):
+        """Test generating zarr file :: succeed :: compressor and filters."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+
+        for streaming in (False, True):
+            output = create_zarr_file(
+                source_path=input_file,
+                output_dir=self.test_results_dir,
+                streaming=streaming,
+                chunks='auto',
+                compressor='zstd',
+                filters=['shuffle'])
+
+            zarr_ds = zarr.open(output, mode='r')
+            assert zarr_ds.compressor.codec_id == 'zstd'
+            assert zarr_ds.filters[0].codec_id == 'shuffle'
+            assert zarr_ds.shape == (63, 2)
+
+            shutil.rmtree(output)
+
+        try:
+            create_zarr_file(
+                source_path=input_file,
+                output_dir=self.test_results_dir,
+                compressor='rar')
+        except ValueError as e:
+            assert str(e).startswith('Compressor <rar> is not supported.')
+
+    def test_generate_zarr_file___succeed_zip_and_consolidated(self):
+        """Test generating zarr file :: succeed :: zip file with consolidated metadata."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+
+        for streaming in (False, True):
+            output = create_zarr_file(
+                source_path=input_file,
+                output_dir=self.test_results_dir,
+                streaming=streaming,
+                chunks=16,
+                store_format='zip',
+                consolidated=True)
+
+            assert os.path.basename(output) == 'potsdam_supermarkets.zarr.zip'
+            # The temporary directory of the streaming mode is removed
+            assert os.listdir(self.test_results_dir) == \
+                ['potsdam_supermarkets.zarr.zip']
+
+            zarr_ds = open_zarr_array(output)
+            assert zarr_ds.shape == (63, 2)
+            assert zarr_ds.chunks == (16, 2)
+            close_zarr_array(zarr_ds)
+
+            # Metadata, ingestion manifest and 4 chunks
+            with zipfile.ZipFile(output) as zip_file:
+                assert len(zip_file.namelist()) == 7
+
+            os.remove(output)
+
+    def test_generate_zarr_file___succeed_append(self):
+        """Test generating zarr file :: succeed :: append new batches."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+        output = create_zarr_file(
+            source_path=input_file,
+            output_dir=self.test_results_dir,
+            chunks=50,
+            consolidated=True)
+
+        # A new batch with the points in reverse order
+        with open(input_file, encoding='utf-8') as file:
+            feature_collection = json.load(file)
+        feature_collection['features'].reverse()
+        batch_file = os.path.join(self.test_results_dir, 'batch.json')
+        with open(batch_file, 'w', encoding='utf-8') as file:
+            json.dump(feature_collection, file)
+
+        for streaming in (False, True):
+            assert create_zarr_file(
+                source_path=batch_file,
+                streaming=streaming,
+                append_to=output) == output
+
+            zarr_ds = zarr.open_consolidated(output, mode='r')
+            # Running the same batch again does not append anything
+            assert zarr_ds.shape == (126, 2)
+            assert zarr_ds.chunks == (50, 2)
+            assert (zarr_ds[63:] == zarr_ds[:63][::-1]).all()
+
+        assert [
+            (entry['source'], entry['start'], entry['stop'])
+            for entry in zarr_ds.attrs['ingested']] == [
+                ('potsdam_supermarkets.json', 0, 63), ('batch.json', 63, 126)]
+
+    def test_generate_zarr_file___failed_append_invalid_batch(self):
+        """Test generating zarr file :: failed :: append invalid batch."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+        output = create_zarr_file(
+            source_path=input_file, output_dir=self.test_results_dir)
+
+        with self.assertRaises(ValueError):
+            create_zarr_file(
+                source_path=os.path.join(
+                    self.test_data_dir, 'potsdam_supermarkets_point_line.json'),
+                streaming=True,
+                block_size=10,
+                append_to=output)
+
+        # The points of the partial batch are dropped
+        zarr_ds = zarr.open(output, mode='r')
+        assert zarr_ds.shape == (63, 2)
+        assert len(zarr_ds.attrs['ingested']) == 1
+
+        not_found = os.path.join(self.test_results_dir, 'NOT_FOUND.zarr')
+        try:
+            create_zarr_file(source_path=input_file, append_to=not_found)
+        except FileNotFoundError as e:
+            assert str(e) == f'Zarr file <{not_found}> not found.'
+
+    def test_generate_zarr_file___succeed_metrics(self):
+        """Test generating zarr file :: succeed :: stages, counters and progress."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+
+        points = []
+        for streaming in (False, True):
+            points.clear()
+            metrics = Metrics(progress=lambda m: points.append(m.points))
+            output = create_zarr_file(
+                source_path=input_file,
+                output_dir=self.test_results_dir,
+                streaming=streaming,
+                block_size=20,
+                chunks=10,
+                metrics=metrics)
+
+            assert set(metrics.stages) == \
+                {'parse', 'write', 'finalize'} | (set() if streaming else {'extract'})
+            assert metrics.function == 'create_zarr_file'
+            assert metrics.points == 63
+            assert metrics.bytes_written == 63 * 2 * 8
+            assert metrics.bytes_read == os.path.getsize(input_file)
+            assert metrics.chunks_written == 7
+            assert points == ([20, 40, 60, 63] if streaming else [63])
+            shutil.rmtree(output)
+
+    def test_generate_zarr_file___succeed_sorted_with_bbox_index(self):
+        """Test generating zarr file :: succeed :: points sorted along a curve."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+        points = points_to_array(gp.read_file(input_file).geometry)
+
+        output = create_zarr_file(
+            source_path=input_file,
+            output_dir=self.test_results_dir,
+            chunks=10,
+            sort='hilbert')
+
+        zarr_ds = zarr.open(output, mode='r')
+        index = zarr_ds.attrs[BBOX_INDEX_KEY]
+        assert sorted(map(tuple, zarr_ds[:])) == sorted(map(tuple, points))
+        assert index['curve'] == 'hilbert'
+        assert index['chunk_rows'] == 10
+        assert index['bboxes'] == chunk_bboxes(zarr_ds[:], 10).tolist()
+
+        # Appended batches are sorted and indexed as well
+        with open(input_file, encoding='utf-8') as file:
+            feature_collection = json.load(file)
+        feature_collection['features'].reverse()
+        batch_file = os.path.join(self.test_results_dir, 'batch.json')
+        with open(batch_file, 'w', encoding='utf-8') as file:
+            json.dump(feature_collection, file)
+
+        create_zarr_file(source_path=batch_file, append_to=output)
+        zarr_ds = zarr.open(output, mode='r')
+        assert zarr_ds.shape == (126, 2)
+        assert (zarr_ds[63:] == sort_points(points[::-1], 'hilbert')).all()
+        assert zarr_ds.attrs[BBOX_INDEX_KEY]['bboxes'] == \
+            chunk_bboxes(zarr_ds[:], 10).tolist()
+
+        for kwargs in ({'sort': 'peano'}, {'sort': 'zorder', 'streaming': True}):
+            with self.assertRaises(ValueError):
+                create_zarr_file(
+                    source_path=input_file, output_dir=self.test_results_dir, **kwargs)
+
+    def test_generate_zarr_file___succeed_properties(self):
+        """Test generating zarr file :: succeed :: properties as columns of a group."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+        gdf = gp.read_file(input_file)
+        points = points_to_array(gdf.geometry)
+
+        for store_format in ('directory', 'zip'):
+            output = create_zarr_file(
+                source_path=input_file,
+                output_dir=self.test_results_dir,
+                chunks=10,
+                store_format=store_format,
+                sort='hilbert',
+                properties=True)
+
+            zarr_ds = open_zarr_array(output)
+            assert zarr_ds.path == COORDINATES_KEY
+            assert BBOX_INDEX_KEY in zarr_ds.attrs
+
+            # Properties follow the points along the curve
+            columns = property_columns(zarr_ds)
+            assert list(columns) == [name for name in gdf.columns if name != 'geometry']
+            assert {column.chunks for column in columns.values()} == {(10,)}
+            assert columns['brand'].dtype.kind == 'u'
+            order = sort_order(points, 'hilbert')
+            assert (zarr_ds[:] == points[order]).all()
+            properties = read_properties(zarr_ds, columns=['name', 'check_date'])
+            assert (properties['name'].to_numpy() ==
+                    gdf['name'].fillna('').to_numpy()[order]).all()
+            assert properties['check_date'].dtype == gdf['check_date'].dtype
+            close_zarr_array(zarr_ds)
+
+        # The coordinates of a group can not be appended to
+        with self.assertRaises(ValueError):
+            create_zarr_file(source_path=input_file, append_to=output.removesuffix('.zip'))
+
+        shutil.rmtree(output.removesuffix('.zip'))
+        output = create_zarr_file(
+            source_path=input_file,
+            output_dir=self.test_results_dir,
+            properties=['name'])
+        assert list(property_columns(open_zarr_array(output))) == ['name']
+
+        os.makedirs(os.path.join(self.test_results_dir, 'failed'))
+        for kwargs in ({'properties': ['shop', 'price']},
+                       {'properties': True, 'streaming': True}):
+            with self.assertRaises(ValueError):
+                create_zarr_file(
+                    source_path=input_file,
+                    output_dir=os.path.join(self.test_results_dir, 'failed'),
+                    **kwargs)
+
+    def test_generate_zarr_file___succeed_encoded_bbox_index(self):
+        """Test generating zarr file :: succeed :: boxes bound the encoded points."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+
+        for encoding, max_error in (('float32', None), ('int32', 1e-3)):
+            output = create_zarr_file(
+                source_path=input_file,
+                output_dir=self.test_results_dir,
+                chunks=10,
+                sort='hilbert',
+                encoding=encoding,
+                max_error=max_error)
+
+            zarr_ds = zarr.open(output, mode='r')
+            assert zarr_ds.attrs[BBOX_INDEX_KEY]['bboxes'] == \
+                chunk_bboxes(zarr_ds[:], 10).tolist()
+            for x, y in zarr_ds[:]:
+                assert len(query_bbox(zarr_ds, (x, y, x, y))) > 0
+            shutil.rmtree(output)
+
+    def test_generate_zarr_file___succeed_encoding(self):
+        """Test generating zarr file :: succeed :: coordinates encoded within the maximum error."""
+        input_file = \
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.json')
+        points = points_to_array(gp.read_file(input_file).geometry)
+
+        for encoding, max_error, streaming in (
+                ('float32', None, False), ('int32', 1e-6, False), ('int32', 1e-5, True)):
+            output = create_zarr_file(
+                source_path=input_file,
+                output_dir=self.test_results_dir,
+                streaming=streaming,
+                chunks=10,
+                filters=['delta'],
+                encoding=encoding,
+                max_error=max_error)
+
+            zarr_ds = zarr.open(output, mode='r')
+            assert zarr_ds.dtype == 'float64'
+            assert zarr_ds.filters[1].codec_id == 'delta'
+            assert abs(zarr_ds[:] - points).max() <= (max_error or 2e-6)
+            if encoding == 'int32':
+                assert zarr_ds.filters[0].offset == (0 if streaming else 33)
+            shutil.rmtree(output)
+
+        # Appended batches must fit in the range of the integers
+        output = create_zarr_file(
+            source_path=input_file,
+            output_dir=self.test_results_dir,
+            encoding='int32',
+            max_error=5e-8)
+        with open(input_file, encoding='utf-8') as file:
+            feature_collection = json.load(file)
+        for feature in feature_collection['features']:
+            feature['geometry']['coordinates'][0] += 500
+        batch_file = os.path.join(self.test_results_dir, 'batch.json')
+        with open(batch_file, 'w', encoding='utf-8') as file:
+            json.dump(feature_collection, file)
+
+        with self.assertRaises(ValueError):
+            create_zarr_file(source_path=batch_file, append_to=output)
+        assert zarr.open(output, mode='r').shape == (63, 2)
+        shutil.rmtree(output)
+
+        for kwargs in ({'encoding': 'float16'}, {'encoding': 'int32', 'max_error': 1e-9},
+                       {'encoding': 'float32', 'max_error': 1e-7}):
+            with self.assertRaises(ValueError):
+                create_zarr_file(
+                    source_path=input_file, output_dir=self.test_results_dir, **kwargs)
+            assert not os.path.exists(output)
@@ -0,0 +1,96 @@
+"""Test utils.metrics module."""
+
+import json
+import math
+import os
+import shutil
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from rechunk_zarr_ds.utils.metrics import COUNTERS, Metrics
+
+
+class TestUtilsMetrics(unittest.TestCase):
+    """
+    Test utils.metrics module.
+
+    This class contains tests for the Metrics class.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method creates the directory of the test results.
+        """
+        parent_dir = os.path.dirname(__file__)
+        self.test_results_dir = os.path.join(parent_dir, 'results')
+        Path(self.test_results_dir).mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self):
+        """
+        Tear down the test environment.
+
+        This method removes the test results directory.
+        """
+        shutil.rmtree(self.test_results_dir)
+
+    def test_stage___succeed_exclusive(self):
+        """Test stage :: succeed :: nested stages are not counted twice."""
+        metrics = Metrics()
+
+        start = time.perf_counter()
+        with metrics.stage('extract'):
+            time.sleep(0.01)
+            with metrics.stage('parse'):
+                time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+        # The nested stage is subtracted from the outer one, not added to it
+        assert metrics.stages['parse'] >= 0.05
+        assert metrics.stages['extract'] >= 0.01
+        assert metrics.stages['extract'] < metrics.stages['parse']
+        assert math.isclose(
+            metrics.stages['extract'] + metrics.stages['parse'], elapsed, abs_tol=0.005)
+
+        items = list(metrics.iterate('produce', iter(range(3))))
+        assert items == [0, 1, 2]
+        assert 'produce' in metrics.stages
+
+    def test_run___succeed_record_and_export(self):
+        """Test run :: succeed :: counters, progress and exported record."""
+        export_path = os.path.join(self.test_results_dir, 'metrics.jsonl')
+        fractions = []
+        metrics = Metrics(
+            progress=lambda m: fractions.append(m.fraction), export_path=export_path)
+
+        with metrics.run('copy', 'source.zarr'):
+            metrics.blocks_total = 2
+            array = metrics.wrap(np.zeros((4, 2)))
+            for start in (0, 2):
+                array[start:start + 2] = array[start:start + 2] + 1
+                metrics.commit_block(points=2, bytes_written=32)
+
+        assert fractions == [0.5, 1.0]
+        assert metrics.bytes_read == 64
+        assert set(metrics.stages) == {'read', 'write'}
+        assert metrics.mb_s > 0
+
+        # Runs reset the metrics
+        with self.assertRaises(ValueError):
+            with metrics.run('copy', 'other.zarr'):
+                raise ValueError('Broken block.')
+
+        assert metrics.blocks == 0
+
+        with open(export_path, encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+
+        assert [record['source'] for record in records] == ['source.zarr', 'other.zarr']
+        assert all(name in records[0] for name in COUNTERS)
+        assert records[0]['points'] == 4
+        assert records[0]['error'] is None
+        assert records[1]['error'] == 'ValueError: Broken block.'
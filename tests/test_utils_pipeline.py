@@ -0,0 +1,93 @@
+"""Test utils.pipeline module."""
+
+import asyncio
+import time
+import unittest
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.chunks import iter_blocks
+from rechunk_zarr_ds.utils.pipeline import copy_blocks_async
+
+
+class SlowStore(zarr.storage.KVStore):
+    """Store counting the chunks read and delaying the chunks written."""
+
+    def __init__(self, mutable_mapping, log: list):
+        super().__init__(mutable_mapping)
+        self.log = log
+
+    def __getitem__(self, key):
+        if not key.endswith('.zarray'):
+            self.log.append('read')
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        time.sleep(0.01)
+        self.log.append('write')
+        super().__setitem__(key, value)
+
+
+class TestUtilsPipeline(unittest.TestCase):
+    """
+    Test utils.pipeline module.
+
+    This class contains tests for the functions in the utils.pipeline module.
+    """
+
+    def test_copy_blocks_async___succeed(self):
+        """Test copy_blocks_async :: succeed :: copy blocks to new chunks."""
+        data = np.arange(126, dtype='float64').reshape(63, 2)
+        source = zarr.array(data, chunks=(1, 2))
+        target = zarr.create(
+            shape=data.shape, dtype=data.dtype, chunks=(13, 1),
+            compressor=zarr.Zlib(level=1))
+        blocks = {
+            f'0:{index}': selection
+            for index, selection in enumerate(iter_blocks(data.shape, (26, 2)))}
+        committed = []
+
+        asyncio.run(copy_blocks_async(
+            source, target, blocks.items(), workers=3, on_commit=committed.append))
+
+        assert (target[:] == data).all()
+        assert sorted(committed) == sorted(blocks)
+        assert len(target.store) == 1 + 5 * 2
+
+    def test_copy_blocks_async___succeed_backpressure(self):
+        """Test copy_blocks_async :: succeed :: reads wait for slow writes."""
+        data = np.arange(40, dtype='int64').reshape(40, 1)
+        source = zarr.array(data, chunks=(1, 1))
+        log = []
+        source = zarr.open_array(SlowStore(source.store, log), mode='r')
+        target = zarr.create(
+            store=SlowStore({}, log), shape=data.shape, dtype=data.dtype,
+            chunks=(1, 1))
+        blocks = enumerate(iter_blocks(data.shape, (1, 1)))
+
+        asyncio.run(copy_blocks_async(
+            source, target, ((str(i), s) for i, s in blocks),
+            workers=1, queue_size=1))
+
+        # One block in each stage and in each queue at most
+        ahead = max(
+            log[:i].count('read') - log[:i].count('write')
+            for i in range(len(log)))
+        assert ahead <= 5
+        assert (target[:] == data).all()
+
+    def test_copy_blocks_async___failed_read_error(self):
+        """Test copy_blocks_async :: failed :: errors of a stage propagate."""
+        source = zarr.array(np.arange(10), chunks=(2,))
+        source.store['3'] = b'not a chunk'
+        target = zarr.create(shape=(10,), dtype=source.dtype, chunks=(5,))
+
+        with self.assertRaises(Exception):
+            asyncio.run(copy_blocks_async(
+                source, target, [('0', (slice(0, 5),)), ('1', (slice(5, 10),))],
+                workers=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
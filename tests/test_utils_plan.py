@@ -0,0 +1,69 @@
+"""Test utils.plan module."""
+
+import unittest
+
+from rechunk_zarr_ds.utils.plan import (
+    consolidate_chunks, count_chunks, plan_rechunk)
+
+
+class TestUtilsPlan(unittest.TestCase):
+    """
+    Test utils.plan module.
+
+    This class contains tests for the functions in the utils.plan module.
+    """
+
+    def test_plan_rechunk___succeed_direct_copy(self):
+        """Test plan_rechunk :: succeed :: direct copy."""
+        plan = plan_rechunk((63, 2), 8, (1, 2), (13, 2), max_mem=500)
+
+        assert plan.intermediate_chunks is None
+        assert plan.blocks == ((26, 2),)
+        assert plan.reads == 63
+        assert plan.writes == 5
+
+        # Without budget, the whole array is copied at once
+        plan = plan_rechunk((63, 2), 8, (1, 2), (13, 2))
+        assert plan.blocks == ((63, 2),)
+
+    def test_plan_rechunk___succeed_intermediate_copy(self):
+        """Test plan_rechunk :: succeed :: copy through intermediate array."""
+        # Row chunks to column chunks of a 1000 x 1000 float64 array
+        direct = plan_rechunk((1000, 1000), 8, (1, 1000), (1000, 1))
+        plan = plan_rechunk((1000, 1000), 8, (1, 1000), (1000, 1), max_mem=80_000)
+
+        assert direct.intermediate_chunks is None
+        assert plan.intermediate_chunks == (10, 10)
+        assert plan.blocks == ((10, 1000), (1000, 10))
+        assert plan.reads == 11_000
+        assert plan.writes == 11_000
+        # The direct copy would read every source row once per block
+        assert count_chunks((1000, 1000), (1, 1000), (1000, 10)) == 100_000
+
+    def test_plan_rechunk___succeed_intermediate_copy_by_bytes(self):
+        """Test plan_rechunk :: succeed :: staged copy reading each source chunk once."""
+        # Column chunks to row chunks, the direct copy decodes each source chunk 50 times
+        plan = plan_rechunk((1000, 1000), 8, (1000, 10), (10, 1000), max_mem=200_000)
+        direct = plan_rechunk((1000, 1000), 8, (1000, 10), (10, 1000))
+
+        assert plan.intermediate_chunks == (20, 20)
+        assert plan.blocks == ((1000, 20), (20, 1000))
+        assert count_chunks((1000, 1000), (1000, 10), plan.blocks[0]) == 100
+        assert count_chunks((1000, 1000), (1000, 10), (20, 1000)) == 5000
+        assert plan.bytes_read == plan.bytes_written == 2 * 1000 * 1000 * 8
+        assert plan.cost < 5000 * 1000 * 10 * 8
+        assert direct.cost == 2 * 1000 * 1000 * 8
+
+    def test_consolidate_chunks___succeed(self):
+        """Test consolidate_chunks :: succeed."""
+        assert consolidate_chunks(
+            (1000, 1000), (1, 1000), 8, 80_000, limits=(1000, 1)) == (10, 1000)
+        assert consolidate_chunks(
+            (1000, 1000), (1000, 1), 8, 80_000, limits=(1, 1000)) == (1000, 10)
+
+    def test_count_chunks___succeed(self):
+        """Test count_chunks :: succeed."""
+        assert count_chunks((63, 2), (13, 2), (26, 2)) == 5
+        # Blocks not aligned with chunks read some chunks twice
+        assert count_chunks((63, 2), (10, 2), (26, 2)) == 9
+        assert count_chunks((0, 2), (10, 2), (26, 2)) == 0
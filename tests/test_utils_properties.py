@@ -0,0 +1,159 @@
+"""Test utils.properties module."""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+import zarr
+
+from rechunk_zarr_ds.utils.properties import (
+    PROPERTIES_KEY, encode_column, parent_group, property_columns, re_chunk_properties,
+    read_properties, select_properties, write_properties)
+from rechunk_zarr_ds.utils.stores import COORDINATES_KEY
+
+
+class TestUtilsProperties(unittest.TestCase):
+    """
+    Test utils.properties module.
+
+    This class contains tests for the functions in the utils.properties module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method creates the properties of 100 points and a coordinates
+        array in an in-memory zarr group.
+        """
+        self.frame = pd.DataFrame({
+            'shop': ['bakery', 'butcher', None, 'bäckerei'] * 25,
+            'addr:street': [f'Street {i}' for i in range(100)],
+            'levels': np.arange(100, dtype=np.int16),
+            'open': [True, False] * 50,
+        })
+        self.z = zarr.zeros(
+            (100, 2), chunks=(10, 2), store=zarr.MemoryStore(), path=COORDINATES_KEY)
+
+    def test_encode_column___succeed(self):
+        """Test encode_column :: succeed :: UTF-8 bytes and codes of repeated strings."""
+        data, encoding, decoding = encode_column(self.frame['shop'])
+        assert encoding == 'categorical'
+        assert data.dtype == np.uint8
+        labels = decoding['labels']
+        assert labels == ['', 'bakery', 'butcher', 'bäckerei']
+        assert [labels[code] for code in data[:4]] == ['bakery', 'butcher', '', 'bäckerei']
+
+        # Strings take a byte per ASCII character, not four
+        data, encoding, decoding = encode_column(self.frame['addr:street'])
+        assert (encoding, data.dtype, decoding) == ('fixed', np.dtype('S9'), {})
+        assert data[0] == b'Street 0'
+
+        data, encoding, _ = encode_column(pd.Series(['ä', 'b', 'c']))
+        assert (encoding, data.dtype, data[0]) == ('fixed', np.dtype('S2'), 'ä'.encode())
+
+        for name in ('levels', 'open'):
+            data, encoding, decoding = encode_column(self.frame[name])
+            assert (encoding, data.dtype, decoding) == ('raw', self.frame[name].dtype, {})
+
+    def test_encode_column___succeed_nullable_and_time_zones(self):
+        """Test encode_column :: succeed :: nullable pandas types and dates with a time zone."""
+        data, encoding, decoding = encode_column(pd.Series([1, None, -3], dtype='Int64'))
+        assert (encoding, data.dtype) == ('masked', np.int64)
+        assert decoding == {'dtype': 'Int64', 'fill_value': np.iinfo(np.int64).min}
+        assert data.tolist() == [1, np.iinfo(np.int64).min, -3]
+
+        # The fill value is one that no value takes, in a wider type if needed
+        values = pd.Series(list(range(-128, 128)) + [None], dtype='Int8')
+        data, encoding, decoding = encode_column(values)
+        assert (data.dtype, decoding['fill_value']) == (np.int16, -2 ** 15)
+
+        data, encoding, decoding = encode_column(pd.Series([True, None, False], dtype='boolean'))
+        assert (encoding, data.dtype, decoding['dtype']) == ('masked', np.int8, 'boolean')
+        assert data.tolist() == [1, decoding['fill_value'], 0]
+
+        dates = pd.Series(pd.to_datetime(['2024-03-31 02:30', None])).dt.tz_localize(
+            'Europe/Berlin', nonexistent='shift_forward')
+        data, encoding, decoding = encode_column(dates)
+        assert (encoding, data.dtype, decoding) == (
+            'datetime', np.dtype('datetime64[ns]'), {'timezone': 'Europe/Berlin'})
+        assert str(data[0]) == '2024-03-31T01:00:00.000000000'
+        assert np.isnat(data[1])
+
+        # Other pandas types are encoded as strings
+        data, encoding, _ = encode_column(
+            pd.Series(pd.period_range('2024-01', periods=3, freq='M')))
+        assert (encoding, data[0]) == ('fixed', b'2024-01')
+
+    def test_write_and_read_properties___succeed_nullable_and_time_zones(self):
+        """Test write_properties and read_properties :: succeed :: pandas types round-trip."""
+        frame = pd.DataFrame({
+            'floors': pd.Series([1, None] * 50, dtype='Int64'),
+            'open': pd.Series([True, None, False, True] * 25, dtype='boolean'),
+            'area': pd.Series([1.5, None] * 50, dtype='Float64'),
+            'opened': pd.Series(pd.date_range(
+                '2024-01-01', periods=100, freq='D', tz='Europe/Berlin')).where(
+                    lambda dates: dates.dt.day != 1),
+        })
+
+        write_properties(self.z, frame, None)
+        properties = read_properties(self.z)
+
+        assert properties.dtypes.tolist() == frame.dtypes.tolist()[:3] + [
+            pd.DatetimeTZDtype('ns', 'Europe/Berlin')]
+        for name in frame.columns:
+            assert properties[name].isna().tolist() == frame[name].isna().tolist()
+            assert properties[name].dropna().tolist() == frame[name].dropna().tolist()
+
+        target = zarr.zeros(
+            (100, 2), chunks=(7, 2), store=zarr.MemoryStore(), path=COORDINATES_KEY)
+        re_chunk_properties(self.z, target)
+        assert read_properties(target).equals(properties)
+
+    def test_write_and_read_properties___succeed(self):
+        """Test write_properties and read_properties :: succeed :: columns aligned with chunks."""
+        nbytes = write_properties(self.z, self.frame, None)
+
+        group = parent_group(self.z)
+        assert nbytes == sum(group[column['array']].nbytes
+                             for column in group.attrs[PROPERTIES_KEY])
+        assert [column['array'] for column in group.attrs[PROPERTIES_KEY]] == [
+            'shop', 'addr_street', 'levels', 'open']
+
+        columns = property_columns(self.z)
+        assert list(columns) == list(self.frame.columns)
+        assert {column.chunks for column in columns.values()} == {(10,)}
+        assert columns['shop'].dtype == np.uint8
+        assert columns['addr:street'].dtype == np.dtype('S9')
+
+        expected = self.frame.fillna({'shop': ''})
+        properties = read_properties(self.z)
+        assert (properties.to_numpy() == expected.to_numpy()).all()
+        assert properties['addr:street'].dtype == expected['addr:street'].dtype
+
+        rows = read_properties(self.z, slice(95, 200), ['levels'])
+        assert rows.index.tolist() == list(range(95, 100))
+        assert rows['levels'].tolist() == list(range(95, 100))
+
+        with self.assertRaises(ValueError):
+            read_properties(self.z, columns=['name'])
+        with self.assertRaises(ValueError):
+            select_properties(self.frame, ['name'])
+        assert list(select_properties(self.frame, ['open'])) == ['open']
+        assert select_properties(self.frame, False).empty
+
+    def test_re_chunk_properties___succeed(self):
+        """Test re_chunk_properties :: succeed :: columns follow the target chunks."""
+        write_properties(self.z, self.frame, None)
+        target = zarr.zeros(
+            (100, 2), chunks=(7, 2), store=zarr.MemoryStore(), path=COORDINATES_KEY)
+
+        re_chunk_properties(self.z, target)
+
+        columns = property_columns(target)
+        assert {column.chunks for column in columns.values()} == {(7,)}
+        assert read_properties(target).equals(read_properties(self.z))
+
+        # Arrays without a group have no property columns
+        assert parent_group(zarr.zeros((10, 2))) is None
+        assert not property_columns(zarr.zeros((10, 2)))
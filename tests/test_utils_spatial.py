@@ -0,0 +1,104 @@
+"""Test utils.spatial module."""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.spatial import (
+    BBOX_INDEX_KEY, bbox_index, check_curve, chunk_bboxes, curve_keys,
+    query_bbox, re_chunk_bbox_index, sort_points, update_bbox_index)
+
+
+class TestUtilsSpatial(unittest.TestCase):
+    """
+    Test utils.spatial module.
+
+    This class contains tests for the functions in the utils.spatial module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method creates random points and a zarr array of them sorted
+        along a Hilbert curve.
+        """
+        rng = np.random.default_rng(0)
+        self.points = np.column_stack([
+            rng.uniform(12.9, 13.2, 1000), rng.uniform(52.3, 52.5, 1000)])
+        self.sorted_points = sort_points(self.points, 'hilbert')
+        self.z = zarr.array(self.sorted_points, chunks=(50, 2))
+        self.z.attrs[BBOX_INDEX_KEY] = bbox_index(
+            'hilbert', 50, chunk_bboxes(self.sorted_points, 50))
+
+    def test_curve_keys___succeed(self):
+        """Test curve_keys :: succeed :: every cell once, neighbours on the Hilbert curve."""
+        grid = np.array([(x, y) for x in range(8) for y in range(8)], dtype=np.float64)
+
+        for curve in ('hilbert', 'zorder'):
+            keys = curve_keys(grid, curve, bits=3)
+            assert sorted(keys.tolist()) == list(range(64))
+
+        steps = np.abs(np.diff(sort_points(grid, 'hilbert'), axis=0)).sum(axis=1)
+        assert (steps == 1).all()
+
+        assert curve_keys(np.empty((0, 2)), 'zorder').shape == (0,)
+
+        with self.assertRaises(ValueError):
+            check_curve('peano')
+
+    def test_chunk_bboxes___succeed(self):
+        """Test chunk_bboxes :: succeed :: sorted chunks cover small areas."""
+        bboxes = chunk_bboxes(self.points, 50)
+        sorted_bboxes = np.asarray(self.z.attrs[BBOX_INDEX_KEY]['bboxes'])
+
+        assert bboxes.shape == sorted_bboxes.shape == (20, 4)
+        assert (bboxes[0] == [*self.points[:50].min(axis=0), *self.points[:50].max(axis=0)]).all()
+
+        def area(b):
+            return ((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])).sum()
+
+        assert area(sorted_bboxes) < area(bboxes) / 5
+
+    def test_query_bbox___succeed(self):
+        """Test query_bbox :: succeed :: only intersecting chunks are read."""
+        bbox = (13.0, 52.35, 13.05, 52.4)
+        inside = self.points[
+            (self.points[:, 0] >= 13.0) & (self.points[:, 0] <= 13.05) &
+            (self.points[:, 1] >= 52.35) & (self.points[:, 1] <= 52.4)]
+
+        reads = []
+        getitem = self.z.__getitem__
+        with mock.patch.object(
+                zarr.Array, '__getitem__',
+                lambda z, key: reads.append(key) or getitem(key)):
+            selected = query_bbox(self.z, bbox)
+
+        assert sorted(map(tuple, selected)) == sorted(map(tuple, inside))
+        assert sum(key.stop - key.start for key in reads) < len(self.points) / 2
+
+        # Without an index every chunk is read
+        unindexed = zarr.array(self.points, chunks=(50, 2))
+        assert sorted(map(tuple, query_bbox(unindexed, bbox))) == \
+            sorted(map(tuple, inside))
+
+        with self.assertRaises(ValueError):
+            query_bbox(self.z, (13.05, 52.35, 13.0, 52.4))
+
+    def test_update_bbox_index___succeed(self):
+        """Test update_bbox_index and re_chunk_bbox_index :: succeed."""
+        self.z.append(self.points[:30])
+        update_bbox_index(self.z, 1000)
+
+        index = self.z.attrs[BBOX_INDEX_KEY]
+        assert len(index['bboxes']) == 21
+        assert index['bboxes'][:20] == chunk_bboxes(self.sorted_points, 50).tolist()
+        assert index['bboxes'][20] == chunk_bboxes(self.points[:30], 50).tolist()[0]
+
+        expected = chunk_bboxes(self.z[:], 100).tolist()
+        assert re_chunk_bbox_index(self.z, 100)['bboxes'] == expected
+        assert re_chunk_bbox_index(self.z, 70)['bboxes'] == \
+            chunk_bboxes(self.z[:], 70).tolist()
+        assert re_chunk_bbox_index(zarr.array(self.points), 100) is None
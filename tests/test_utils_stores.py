@@ -0,0 +1,108 @@
+"""Test utils.stores module."""
+
+import importlib.util
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.stores import (
+    check_memory_format, close_zarr_array, create_memory_array, create_store,
+    get_filesystem, is_url, is_zip_store, open_zarr_array, path_exists, remove_path, store_path,
+    zarr_name)
+
+HAS_FSSPEC = importlib.util.find_spec('fsspec') is not None
+
+
+class TestUtilsStores(unittest.TestCase):
+    """
+    Test utils.stores module.
+
+    This class contains tests for the functions in the utils.stores module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method sets the directory of the test data.
+        """
+        parent_dir = os.path.dirname(__file__)
+        self.test_data_dir = os.path.join(parent_dir, 'data/zarr_files')
+
+    def test_zarr_name___succeed(self):
+        """Test zarr_name :: succeed."""
+        assert zarr_name('/data/potsdam.zarr') == 'potsdam'
+        assert zarr_name('/data/potsdam.zarr/') == 'potsdam'
+        assert zarr_name('/data/potsdam.zarr.zip') == 'potsdam'
+        assert zarr_name('s3://bucket/data/potsdam.zarr/') == 'potsdam'
+
+    def test_store_path___succeed(self):
+        """Test store_path :: succeed."""
+        assert store_path('/data', 'potsdam', 'directory') == '/data/potsdam.zarr'
+        assert store_path('/data', 'potsdam', 'zip') == '/data/potsdam.zarr.zip'
+        assert store_path('s3://bucket/', 'potsdam', 'directory') == \
+            's3://bucket/potsdam.zarr'
+        assert is_url('s3://bucket/potsdam.zarr')
+        assert not is_url('/data/potsdam.zarr')
+
+    def test_open_zarr_array___succeed(self):
+        """Test open_zarr_array :: succeed :: directory and zip of a directory."""
+        directory = os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr')
+        zip_file = os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr.zip')
+
+        assert not is_zip_store(directory)
+        assert is_zip_store(zip_file)
+
+        zarr_ds = open_zarr_array(directory)
+        zipped_zarr_ds = open_zarr_array(zip_file)
+
+        assert zipped_zarr_ds.shape == zarr_ds.shape == (63, 2)
+        assert (zipped_zarr_ds[:] == zarr_ds[:]).all()
+
+        close_zarr_array(zipped_zarr_ds)
+        close_zarr_array(zarr_ds)
+
+    @unittest.skipUnless(HAS_FSSPEC, 'fsspec is not installed')
+    def test_open_zarr_array___succeed_url(self):
+        """Test open_zarr_array :: succeed :: URL and fsspec mapper."""
+        import fsspec  # pylint: disable=import-outside-toplevel
+
+        url = 'memory://test_utils_stores/potsdam.zarr'
+        zarr_ds = open_zarr_array(
+            os.path.join(self.test_data_dir, 'potsdam_supermarkets.zarr'))
+        zarr.copy_store(zarr_ds.store, create_store(url, 'directory'))
+
+        try:
+            assert path_exists(url)
+            assert (open_zarr_array(url)[:] == zarr_ds[:]).all()
+            assert (open_zarr_array(fsspec.get_mapper(url))[:] == zarr_ds[:]).all()
+            assert zarr_name(fsspec.get_mapper(url)) == 'potsdam'
+        finally:
+            remove_path(url)
+
+        assert not path_exists(url)
+
+    def test_get_filesystem___failed_missing_fsspec(self):
+        """Test get_filesystem :: failed :: fsspec is not installed."""
+        with mock.patch.dict(sys.modules, {'fsspec': None}), \
+                self.assertRaises(ImportError) as context:
+            get_filesystem('s3://bucket/potsdam.zarr')
+
+        assert 'rechunk-zarr-ds[remote]' in str(context.exception)
+
+    def test_create_memory_array___succeed(self):
+        """Test create_memory_array :: succeed :: numpy and memory-mapped arrays."""
+        array = create_memory_array((10, 2), 'float64', 'memmap')
+        array[:] = 1
+        assert isinstance(array, np.memmap)
+        assert array.sum() == 20
+
+        assert not isinstance(create_memory_array((10, 2), 'int32', 'numpy'), np.memmap)
+        assert create_memory_array((0, 2), 'float64', 'memmap').shape == (0, 2)
+
+        with self.assertRaises(ValueError):
+            check_memory_format('gpu')
@@ -0,0 +1,77 @@
+"""Test utils.view module."""
+
+import unittest
+
+import numpy as np
+import zarr
+
+from rechunk_zarr_ds.utils.view import RechunkedView
+
+
+class TestUtilsView(unittest.TestCase):
+    """
+    Test utils.view module.
+
+    This class contains tests for the functions in the utils.view module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment.
+
+        This method creates a zarr array of 63 points in chunks of 10.
+        """
+        self.data = np.arange(126, dtype='float64').reshape(63, 2)
+        self.array = zarr.array(self.data, chunks=(10, 2))
+
+    def test_rechunked_view___succeed_rows(self):
+        """Test RechunkedView :: succeed :: iterate and slice rows of chunks."""
+        view = RechunkedView(self.array, (13, 2))
+
+        assert len(view) == 5
+        assert view.chunk_grid == (5, 1)
+        assert view.nchunks == 5
+        assert [len(batch) for batch in view] == [13, 13, 13, 13, 11]
+        assert (np.concatenate(list(view)) == self.data).all()
+        assert (view[1] == self.data[13:26]).all()
+        assert (view[-1] == self.data[52:]).all()
+        assert (view[1:3] == self.data[13:39]).all()
+        assert view[4:2].shape == (0, 2)
+
+    def test_rechunked_view___succeed_chunks(self):
+        """Test RechunkedView :: succeed :: iterate over chunks of columns."""
+        view = RechunkedView(self.array, (20, 1))
+        chunks = list(view.iter_chunks())
+
+        assert view.chunk_grid == (4, 2)
+        assert [index for index, _ in chunks][:3] == [(0, 0), (0, 1), (1, 0)]
+        assert (chunks[1][1] == self.data[:20, 1:]).all()
+        assert (view[3, 0] == self.data[60:, :1]).all()
+        assert (view[:, 1] == self.data[:, 1:]).all()
+
+    def test_rechunked_view___succeed_reads_overlapping_chunks(self):
+        """Test RechunkedView :: succeed :: only overlapping source chunks are read."""
+        reads = []
+
+        class CountingStore(zarr.storage.KVStore):
+            """Store counting the chunks read."""
+
+            def __getitem__(self, key):
+                if not key.startswith('.'):
+                    reads.append(key)
+                return super().__getitem__(key)
+
+        view = RechunkedView(
+            zarr.open_array(CountingStore(self.array.store), mode='r'), (13, 2))
+        assert not reads
+
+        assert (view[2] == self.data[26:39]).all()
+        assert sorted(reads) == ['2.0', '3.0']
+
+    def test_rechunked_view___failed_invalid_index(self):
+        """Test RechunkedView :: failed :: invalid chunk indices."""
+        view = RechunkedView(self.array, (13, 2))
+
+        for key in (5, -6, (0, 0, 0), slice(0, 4, 2)):
+            with self.assertRaises(IndexError):
+                _ = view[key]